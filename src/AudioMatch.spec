@@ -9,6 +9,10 @@ def get_version():
 
 block_cipher = None
 
+# One-dir build (set by build.py --onedir): the app launches from an unpacked
+# folder instead of extracting the one-file archive to a temp dir every launch
+onedir = os.environ.get('AUDIOMATCH_ONEDIR') == '1'
+
 files = [
     ('img/*.png', 'img'),
     ('version.txt', '.')
@@ -34,10 +38,9 @@ pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
+    *([] if onedir else [a.binaries, a.zipfiles, a.datas]),
     [],
+    exclude_binaries=onedir,
     name=f'AudioMatch_{get_version()}',
     debug=False,
     bootloader_ignore_signals=False,
@@ -52,4 +55,16 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
     timestamp=None,
-)
\ No newline at end of file
+)
+
+if onedir:
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.zipfiles,
+        a.datas,
+        strip=False,
+        upx=True,
+        upx_exclude=[],
+        name=f'AudioMatch_{get_version()}',
+    )
@@ -0,0 +1,26 @@
+import os
+import sys
+
+
+def user_cache_dir(*parts):
+    """
+    Persistent per-user cache directory (created if missing).
+    Lives outside the PyInstaller bundle, which is unpacked to a fresh temp
+    dir (one-file) or may be read-only, so caches survive between launches.
+
+    Args:
+        *parts (str): Sub directories inside the app cache dir.
+
+    Returns:
+        str: The directory path.
+    """
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    elif sys.platform == 'darwin':
+        base = os.path.expanduser('~/Library/Caches')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+
+    path = os.path.join(base, 'AudioMatch', *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
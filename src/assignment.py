@@ -0,0 +1,64 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+
+
+def solve_assignment(candidate_lists, threshold=0.0):
+    """
+    Global one-to-one matching of remasters to references.
+    Solves a maximum-weight bipartite matching on the pruned candidate lists
+    (top-K per remaster) as a sparse matrix, so 5k x 5k catalogs never build
+    the dense similarity matrix.
+
+    Every remaster also gets a private "no match" column weighted at the
+    threshold, so a full matching always exists and a remaster is only
+    given a reference when that beats leaving it unmatched.
+
+    Args:
+        candidate_lists (list): One list per remaster of (reference, similarity)
+            pairs, reference being any hashable key.
+        threshold (float): Minimum similarity worth matching.
+
+    Returns:
+        list: The assigned reference (or None) for each remaster, in order.
+    """
+    n_rows = len(candidate_lists)
+    if n_rows == 0:
+        return []
+
+    ref_columns = {}
+    rows, cols, weights = [], [], []
+    for row, candidates in enumerate(candidate_lists):
+        # Best similarity per reference (a repeated entry would get summed)
+        row_best = {}
+        for reference, similarity in candidates:
+            if similarity >= threshold and similarity > row_best.get(reference, -np.inf):
+                row_best[reference] = similarity
+        for reference, similarity in row_best.items():
+            rows.append(row)
+            cols.append(ref_columns.setdefault(reference, len(ref_columns)))
+            weights.append(similarity)
+
+    # Dummy "no match" columns after the real references
+    n_refs = len(ref_columns)
+    rows.extend(range(n_rows))
+    cols.extend(range(n_refs, n_refs + n_rows))
+    weights.extend([threshold] * n_rows)
+
+    # +1 keeps every weight strictly positive (zeros would count as missing edges),
+    # every row is matched exactly once so the optimum doesn't change
+    graph = csr_matrix((np.asarray(weights, dtype=np.float64) + 1.0, (rows, cols)),
+                       shape=(n_rows, n_refs + n_rows))
+
+    matched_rows, matched_cols = min_weight_full_bipartite_matching(graph, maximize=True)
+
+    references = [None] * n_refs
+    for reference, col in ref_columns.items():
+        references[col] = reference
+
+    assignment = [None] * n_rows
+    for row, col in zip(matched_rows, matched_cols):
+        if col < n_refs:
+            assignment[row] = references[col]
+    return assignment
+
@@ -11,53 +11,98 @@ class AudioProcessor:
     """
     
     @staticmethod
-    def process_batch(file_paths, batch_size=5, callback=None):
+    def process_batch(file_paths, batch_size=None, callback=None, memory_limit_mb=None):
         """
         Process audio files in batches to manage memory usage.
         
         Args:
             file_paths: List of audio file paths
-            batch_size: Number of files to process at once
+            batch_size: Number of files between cleanups, None to size the
+                batches from the observed memory (AdaptiveScheduler)
             callback: Function to call with progress updates
+            memory_limit_mb: Memory ceiling for adaptive batches
             
         Returns:
             results: Dictionary mapping filenames to tghe features
         """
+        from scheduler import AdaptiveScheduler
+        scheduler = AdaptiveScheduler(memory_limit_mb, batch_size, workers=1)
         results = {}
         
-        for i in range(0, len(file_paths), batch_size):
-            batch = file_paths[i:i+batch_size]
-            
-            for idx, path in enumerate(batch):
-                try:
-                    # Load and extract features
-                    y, sr = AudioLoader.load_audio(path)
-                    features = FeatureExtractor.extract_features(y, sr)
-                    
-                    # Store results
-                    filename = os.path.basename(path)
-                    results[filename] = {
-                        'features': features,
-                        'duration': librosa.get_duration(y=y, sr=sr),
-                        'path': path
-                    }
-                    
-                    # Report progress
-                    if callback:
-                        progress = (i + idx + 1) / len(file_paths)
-                        callback(progress, f"Processed {i + idx + 1}/{len(file_paths)}: {filename}")
-                        
-                except Exception as e:
-                    print(f"Error processing {path}: {str(e)}")
+        for i, path in enumerate(file_paths):
+            try:
+                # Load and extract features
+                y, sr = AudioLoader.load_audio(path)
+                features = FeatureExtractor.extract_features(y, sr)
                 
-                # Clear memory after each file
-                gc.collect()
+                # Store results
+                filename = os.path.basename(path)
+                results[filename] = {
+                    'features': features,
+                    'duration': librosa.get_duration(y=y, sr=sr),
+                    'path': path
+                }
+                
+                # Report progress
+                if callback:
+                    progress = (i + 1) / len(file_paths)
+                    callback(progress, f"Processed {i + 1}/{len(file_paths)}: {filename}")
+                    
+            except Exception as e:
+                print(f"Error processing {path}: {str(e)}")
             
-            # More aggressive cleanup between batches
-            gc.collect()
+            # Cleanup between batches (sooner when memory gets tight)
+            if scheduler.file_done():
+                gc.collect()
+                scheduler.after_collect()
             
         return results
 
+    @staticmethod
+    def decode(file_path, source=None, full_track=False, quality=False):
+        """
+        Decode stage of the analysis: header duration + decoded/trimmed audio.
+        In full track mode decoding happens block by block during extraction,
+        so the source is passed along instead.
+
+        Args:
+            file_path (str): The path to the audio file.
+            source (file-like, optional): Prefetched file contents.
+            full_track (bool): Stream the whole track instead of the first minute.
+            quality (bool): Also measure the bandwidth at the native rate
+                (before resampling), must match the extract() call.
+
+        Returns:
+            tuple: The payload for extract() and the full duration in seconds.
+        """
+        full_duration = AudioLoader.get_full_duration(file_path, source)
+        if full_track:
+            return source, full_duration
+        return AudioLoader.load_audio(file_path, source, with_energy=True, with_gain=True,
+                                      with_bandwidth=quality), full_duration
+
+    @staticmethod
+    def extract(file_path, payload, full_track=False, beat_sync=False, quality=False):
+        """
+        Compute stage of the analysis: feature extraction from a decode() payload.
+
+        Args:
+            file_path (str): The path to the audio file.
+            payload: What decode() returned for the file.
+            full_track (bool): Must match the decode() call.
+            beat_sync (bool): Beat-synchronous features (first minute mode only).
+            quality (bool): Also measure loudness/dynamics/bandwidth ('quality').
+
+        Returns:
+            dict: A dictionary of features.
+        """
+        if full_track:
+            return StreamingFeatureExtractor.extract_features(file_path, payload, quality=quality)
+        y, sr, energy, gain = payload[:4]
+        return FeatureExtractor.extract_features(y, sr, energy=energy, beat_sync=beat_sync,
+                                                 quality=quality, gain=gain,
+                                                 bandwidth=payload[4] if quality else None)
+
     @staticmethod
     def get_audio_duration(file_path):
         """
@@ -81,45 +126,159 @@ class AudioProcessor:
 class AudioLoader:
 
     @staticmethod
-    def load_audio(file_path):
+    def load_audio(file_path, source=None, with_energy=False, with_gain=False, with_bandwidth=False):
         """
         Load and preprocess audio with memory optimization.
         Reduces file size with lower sample rate/duration and trimming silence.
 
         Args:
             file_path (str): The path to the audio file.
+            source (file-like, optional): Prefetched file contents. Falls back
+                to file_path when the format can't be decoded from memory (m4a).
+            with_energy (bool): Also return the frame RMS of the trimmed audio
+                (hop 1024, same frames as the extracted features).
+            with_gain (bool): Also return the peak normalization gain that
+                was applied (original level = y / gain).
+            with_bandwidth (bool): Also return the upper band edge (Hz) of
+                the minute at the file's native rate.
 
         Returns:
-            tuple: A tuple of the audio data and sample rate.
+            tuple: A tuple of the audio data and sample rate (then the frame
+            RMS, the gain and the bandwidth when requested).
         """
+        native_bandwidth = None
         try:
             # Lower sample rate and duration for memory efficiency (MAY NEED TO INCREASE SAMPLE DURATION FOR ACCURACY LATER)
-            y, sr = librosa.load(file_path, sr=16000, mono=True, duration=60)  # 1 minute, 16kHz
+            if with_bandwidth:
+                # Same decode + resampler librosa.load(sr=16000) uses, the
+                # native buffer is only kept long enough to measure the spectrum
+                from quality import BandwidthMeter
+                y, native_sr = AudioLoader._load(file_path, source, sr=None, mono=True, duration=60)
+                meter = BandwidthMeter(native_sr)
+                meter.feed(y)
+                native_bandwidth = meter.bandwidth()
+                y, sr = librosa.resample(y, orig_sr=native_sr, target_sr=16000, res_type='soxr_hq'), 16000
+            else:
+                y, sr = AudioLoader._load(file_path, source, sr=16000, mono=True, duration=60)  # 1 minute, 16kHz
             
-            # Trim silence to reduce data size
-            y_trimmed, _ = librosa.effects.trim(y, top_db=25)
+            # Trim silence + normalize in one pass (view into y, no copies)
+            y_trimmed, rms, gain = AudioLoader.preprocess(y, top_db=25)
             
-            # Normalize then return trimmed
-            return librosa.util.normalize(y_trimmed), sr
+            loaded = (y_trimmed, sr)
+            if with_energy:
+                loaded += (rms,)
+            if with_gain:
+                loaded += (gain,)
+            if with_bandwidth:
+                loaded += (native_bandwidth,)
+            return loaded
         except Exception as e:
             raise RuntimeError(f"Failed to load {file_path}: {str(e)}")
         finally:  # Guarantee memory cleanup
             gc.collect()
+
+    @staticmethod
+    def preprocess(y, top_db=25, frame_length=2048, hop_length=512):
+        """
+        Silence trim + peak normalization sharing one frame energy computation.
+        Same bounds as librosa.effects.trim and same scaling as
+        librosa.util.normalize, but the result is a view into y that is
+        normalized in place instead of two full copies.
+
+        Args:
+            y (np.ndarray): The audio data (modified in place).
+            top_db (float): Frames quieter than this below the loudest frame are silence.
+            frame_length (int): Frame size of the energy computation.
+            hop_length (int): Hop of the energy computation.
+
+        Returns:
+            tuple: The trimmed/normalized view, its frame RMS every
+            2 * hop_length samples (the feature hop) and the applied gain.
+        """
+        energy = AudioLoader.frame_energy(y, frame_length, hop_length)
+
+        # Same as amplitude_to_db(rms, ref=np.max) > -top_db
+        amin = 1e-10
+        db = 10 * np.log10(np.maximum(energy, amin)) - 10 * np.log10(max(energy.max(), amin))
+        nonzero = np.flatnonzero(db > -top_db)
+        if nonzero.size == 0:
+            return y[:0], energy[:0], 1.0
+        start = int(nonzero[0] * hop_length)
+        end = min(len(y), int((nonzero[-1] + 1) * hop_length))
+        y_trimmed = y[start:end]
+
+        # Peak normalize in place (max/min avoid an abs() copy)
+        peak = max(float(y_trimmed.max()), -float(y_trimmed.min())) if y_trimmed.size else 0.0
+        gain = 1.0 / peak if peak >= np.finfo(y.dtype).tiny else 1.0
+        y_trimmed *= gain
+
+        # Every other frame lines up with the feature frames of the trimmed audio
+        n_feature_frames = 1 + len(y_trimmed) // (2 * hop_length)
+        rms = np.sqrt(energy[nonzero[0]::2][:n_feature_frames]) * gain
+        return y_trimmed, rms, gain
+
+    @staticmethod
+    def frame_energy(y, frame_length=2048, hop_length=512):
+        """
+        Mean square per centered frame (what librosa.feature.rms squares),
+        summed over strided views instead of a padded/framed copy.
+
+        Returns:
+            np.ndarray: Mean square energy of each frame.
+        """
+        n = len(y)
+        half = frame_length // 2
+        n_frames = 1 + n // hop_length
+        energy = np.empty(n_frames, dtype=np.float64)
+
+        # Frames fully inside the signal
+        first = -(-half // hop_length)
+        last = min((n - half) // hop_length, n_frames - 1)
+        if last >= first:
+            frames = np.lib.stride_tricks.sliding_window_view(y, frame_length)[
+                first * hop_length - half::hop_length][:last - first + 1]
+            energy[first:last + 1] = np.einsum('ij,ij->i', frames, frames)
+        else:
+            first, last = n_frames, n_frames - 1
+
+        # Edge frames overlap the (zero) centre padding
+        for t in list(range(0, min(first, n_frames))) + list(range(max(last + 1, first), n_frames)):
+            seg = y[max(0, t * hop_length - half):min(n, t * hop_length + half)]
+            energy[t] = np.dot(seg, seg)
+
+        return energy / frame_length
+
+    @staticmethod
+    def _load(file_path, source, **kwargs):
+        """
+        librosa.load from prefetched bytes when given, otherwise from the path.
+        """
+        if source is not None:
+            try:
+                source.seek(0)
+                return librosa.load(source, **kwargs)
+            except Exception:
+                # Only soundfile can decode file-likes, audioread needs the path
+                pass
+        return librosa.load(file_path, **kwargs)
     
     @staticmethod
-    def get_full_duration(file_path):
+    def get_full_duration(file_path, source=None):
         """
         Get total file duration with better error handling.
 
         Args:
             file_path (str): The path to the audio file.
+            source (file-like, optional): Prefetched file contents.
 
         Returns:
             float: The duration of the audio file in seconds.
         """
         try:
             # Use soundfile for more reliable duration calculation (length was being calced wrong for some)
-            with sf.SoundFile(file_path) as f:
+            if source is not None:
+                source.seek(0)
+            with sf.SoundFile(source if source is not None else file_path) as f:
                 return f.frames / f.samplerate
         except Exception as e:
             print(f"Duration error {file_path}: {str(e)}")
@@ -131,7 +290,7 @@ class AudioLoader:
 
 class FeatureExtractor:
     @staticmethod
-    def extract_features(y, sr):
+    def extract_features(y, sr, energy=None, beat_sync=False, quality=False, gain=1.0, bandwidth=None):
         """
         Memory-optimized feature extraction.
         Focus on essential features for comparison to minimize memory usage.
@@ -139,14 +298,23 @@ class FeatureExtractor:
         Args:
             y (np.ndarray): The audio data.
             sr (int): The sample rate of the audio data.
+            energy (np.ndarray, optional): Frame RMS from AudioLoader.load_audio,
+                kept as the 'rms' energy feature instead of recomputing it.
+            beat_sync (bool): Aggregate chroma/MFCC/RMS per beat instead of per frame.
+            quality (bool): Also measure loudness/dynamics from the same
+                buffer ('quality', see quality_metrics).
+            gain (float): Peak normalization gain already applied to y.
+            bandwidth (float, optional): Native rate bandwidth from
+                AudioLoader.load_audio, reported with the quality measurements.
 
         Returns:
-            dict: A dictionary of features.
+            dict: A dictionary of features, 'sync' tells whether the
+            sequences are per 'frame' or per 'beat'.
         """
         if y.size == 0:
             raise ValueError("Empty audio data")
             
-        features = {}
+        features = {'sync': 'frame'}
         
         # params
         hop_length = 1024  # increase hop length to reduce feature size (or vice ver)
@@ -161,23 +329,35 @@ class FeatureExtractor:
                 bins_per_octave=24
             )
             
-            # MFCC with minimal coefficients
+            # Power spectrogram of the MFCC
+            S = np.abs(librosa.stft(y, n_fft=n_fft, hop_length=hop_length)) ** 2
+
+            # MFCC with minimal coefficients (same as mfcc(y=...) with this STFT)
             features['mfcc'] = np.nan_to_num(librosa.feature.mfcc(
-                y=y, sr=sr, 
-                n_mfcc=8,  # Reduced from 13
-                hop_length=hop_length,
-                n_fft=n_fft
+                S=librosa.power_to_db(librosa.feature.melspectrogram(S=S, sr=sr)),
+                n_mfcc=8  # Reduced from 13
             ))
+
+            if quality:
+                features['quality'] = FeatureExtractor.quality_metrics(y, sr, gain, bandwidth)
+            S = None
+
+            # Frame energy is reused from the loader's trim pass
+            if energy is not None:
+                features['rms'] = energy
             
+            # Beats from the onset envelope (same hop as the features)
+            if beat_sync:
+                onset_env = librosa.onset.onset_strength(
+                    y=y, sr=sr,
+                    hop_length=hop_length
+                )
+                FeatureExtractor.beat_synchronize(features, onset_env, sr, hop_length)
+
             # tempogram
             # uncomment when wanting to visualize (more intensive processing)
-            # add a toggle option before running comparison?
             # https://librosa.org/doc/main/generated/librosa.feature.tempogram.html
             """
-            onset_env = librosa.onset.onset_strength(
-                y=y, sr=sr,
-                hop_length=hop_length
-            )
             features['tempogram'] = librosa.feature.tempogram(
                 onset_envelope=onset_env, 
                 sr=sr,
@@ -192,6 +372,69 @@ class FeatureExtractor:
             y = None
             gc.collect()
 
+    @staticmethod
+    def quality_metrics(y, sr, gain=1.0, bandwidth=None):
+        """
+        Loudness and dynamics of the decoded excerpt, measured at the
+        original level (the normalization gain is undone).
+
+        Args:
+            y (np.ndarray): The (normalized) audio data.
+            sr (int): The sample rate of the audio data.
+            gain (float): Peak normalization gain applied to y.
+            bandwidth (float, optional): Bandwidth measured at the native
+                rate by the loader (y itself stops at sr / 2).
+
+        Returns:
+            dict: 'loudness' (LUFS), 'loudness_range' (LU), 'crest_factor'
+            (dB) and 'bandwidth' (Hz), None when unmeasurable.
+        """
+        from quality import LoudnessMeter
+        meter = LoudnessMeter(sr)
+        meter.feed(y / gain)
+        return {
+            'loudness': meter.loudness(),
+            'loudness_range': meter.loudness_range(),
+            'crest_factor': meter.crest_factor(),
+            'bandwidth': bandwidth
+        }
+
+    @staticmethod
+    def beat_synchronize(features, onset_env, sr, hop_length, min_beats=8):
+        """
+        Replaces the frame sequences with one column per beat (in place).
+        Sequences get much shorter (~2 per second instead of ~16) and a
+        sped up/slowed down transfer has the same number of beats, so DTW
+        doesn't have to absorb the tempo drift frame by frame.
+        Tracks without a usable beat (ambient, speech) keep their frames.
+
+        Args:
+            features (dict): Frame features ('chroma', 'mfcc', 'rms').
+            onset_env (np.ndarray): Onset strength at the same hop length.
+            sr (int): The sample rate of the audio data.
+            hop_length (int): Hop length of the features.
+            min_beats (int): Fewer beats than this -> left frame based.
+        """
+        _, beats = librosa.beat.beat_track(
+            onset_envelope=onset_env, sr=sr,
+            hop_length=hop_length
+        )
+        n_frames = features['chroma'].shape[1]
+        beats = librosa.util.fix_frames(beats, x_min=0, x_max=n_frames)
+        if len(beats) < min_beats + 2:  # +2 for the added start/end bounds
+            return
+
+        # Median is robust to the transient at the start of each beat
+        features['chroma'] = librosa.util.sync(features['chroma'], beats, aggregate=np.median)
+        features['mfcc'] = librosa.util.sync(features['mfcc'][:, :n_frames], beats, aggregate=np.mean)
+        if 'rms' in features:
+            # RMS of each beat (mean energy, not mean amplitude)
+            energy = np.asarray(features['rms'][:n_frames], dtype=np.float64) ** 2
+            features['rms'] = np.sqrt(librosa.util.sync(energy, beats, aggregate=np.mean)).astype(np.float32)
+        features['sync'] = 'beat'
+        # Frames per beat, the comparator scales DTW distances back to frame units
+        features['beat_scale'] = np.float32(n_frames / features['chroma'].shape[1])
+
     @staticmethod
     def extract_minimal_features(y, sr):
         """
@@ -233,3 +476,213 @@ class FeatureExtractor:
         finally:
             gc.collect()
 
+
+
+class StreamingFeatureExtractor:
+    """
+    Full-track feature extraction in fixed size blocks.
+    Memory for the audio stays constant in track length (long live recordings
+    and DJ mixes), only a downsampled chroma sequence and running MFCC
+    statistics are kept.
+
+    Uses STFT chroma (not CQT) so features are only comparable with other
+    streamed features, references and remasters must use the same mode.
+    """
+    SAMPLE_RATE = 16000
+    HOP_LENGTH = 1024
+    N_FFT = 2048
+    N_MFCC = 8
+    N_MELS = 128
+
+    @staticmethod
+    def extract_features(file_path, source=None, block_seconds=10, chroma_downsample=4,
+                         silence_db=-60, quality=False):
+        """
+        Stream the whole track and compute chroma/MFCC block by block.
+        Blocks overlap by N_FFT - HOP_LENGTH samples so frames match a
+        single STFT over the full signal.
+
+        Args:
+            file_path (str): The path to the audio file.
+            source (file-like, optional): Prefetched file contents.
+            block_seconds (int): Audio decoded per block.
+            chroma_downsample (int): Chroma frames averaged into one output frame.
+            silence_db (float): Frames under this level (dBFS) at the start/end are trimmed.
+            quality (bool): Also measure loudness/dynamics/bandwidth over the
+                whole track (same blocks, bandwidth before resampling).
+
+        Returns:
+            dict: A dictionary of features ('chroma' sequence, 'mfcc' as a
+            single mean column so it compares like the regular features).
+        """
+        state = {
+            'carry': np.zeros(0, dtype=np.float32),  # Samples overlapping the next block
+            'peak': 0.0,
+            'started': False,
+            'chroma_pending': np.zeros((12, 0), dtype=np.float32),
+            'chroma_out': [],
+            'chroma_frames': 0,  # Chroma frames kept since the first non silent one
+            'last_active': -1,
+            'mfcc_sum': np.zeros(StreamingFeatureExtractor.N_MFCC),
+            'mfcc_count': 0,
+            'pending_sum': np.zeros(StreamingFeatureExtractor.N_MFCC),
+            'pending_count': 0,
+            'meter': None,
+        }
+        bandwidth_meter = None
+        if quality:
+            from quality import LoudnessMeter
+            state['meter'] = LoudnessMeter(StreamingFeatureExtractor.SAMPLE_RATE)
+            bandwidth_meter = []  # Filled by _blocks once the native rate is known
+
+        try:
+            for block in StreamingFeatureExtractor._blocks(file_path, source, block_seconds,
+                                                           bandwidth_meter):
+                StreamingFeatureExtractor._process_block(block, state, chroma_downsample, silence_db)
+
+            if not state['started']:
+                raise ValueError("Empty audio data")
+
+            # Flush the partial chroma frame, then drop trailing silence
+            if state['chroma_pending'].shape[1]:
+                state['chroma_out'].append(state['chroma_pending'].mean(axis=1, keepdims=True))
+            chroma = np.concatenate(state['chroma_out'], axis=1)
+            chroma = chroma[:, :state['last_active'] // chroma_downsample + 1]
+
+            mfcc_mean = state['mfcc_sum'] / max(state['mfcc_count'], 1)
+            # Match the peak normalization of AudioLoader.load_audio: a gain only
+            # shifts the dB mel bands, so with an orthonormal DCT it only moves c0
+            if state['peak'] > 0:
+                mfcc_mean[0] -= 20 * np.log10(state['peak']) * np.sqrt(StreamingFeatureExtractor.N_MELS)
+
+            features = {
+                'chroma': chroma.astype(np.float32),
+                'mfcc': np.nan_to_num(mfcc_mean)[:, np.newaxis],
+                'sync': 'frame'
+            }
+            if quality:
+                meter = state['meter']
+                features['quality'] = {
+                    'loudness': meter.loudness(),
+                    'loudness_range': meter.loudness_range(),
+                    'crest_factor': meter.crest_factor(),
+                    'bandwidth': bandwidth_meter[0].bandwidth() if bandwidth_meter else None
+                }
+            return features
+        except ValueError:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Streaming feature extraction failed: {str(e)}")
+        finally:
+            state = None
+            gc.collect()
+
+    @staticmethod
+    def _blocks(file_path, source, block_seconds, bandwidth_meter=None):
+        """
+        Yields mono blocks at SAMPLE_RATE.
+        Uses soundfile blocks with a streaming resampler, formats soundfile
+        can't read (m4a) fall back to a full librosa.load cut into blocks.
+
+        Args:
+            bandwidth_meter (list, optional): Gets a quality.BandwidthMeter
+                appended, fed with the native rate blocks before resampling.
+        """
+        target_sr = StreamingFeatureExtractor.SAMPLE_RATE
+        try:
+            if source is not None:
+                source.seek(0)
+            f = sf.SoundFile(source if source is not None else file_path)
+        except Exception as e:
+            print(f"Streaming unavailable for {file_path}, loading fully: {str(e)}")
+            if bandwidth_meter is not None:
+                from quality import BandwidthMeter
+                y, native_sr = librosa.load(file_path, sr=None, mono=True)
+                bandwidth_meter.append(BandwidthMeter(native_sr))
+                bandwidth_meter[0].feed(y)
+                y = librosa.resample(y, orig_sr=native_sr, target_sr=target_sr, res_type='soxr_hq')
+            else:
+                y, _ = librosa.load(file_path, sr=target_sr, mono=True)
+            step = target_sr * block_seconds
+            for i in range(0, len(y), step):
+                yield y[i:i + step]
+            return
+
+        with f:
+            if bandwidth_meter is not None:
+                from quality import BandwidthMeter
+                bandwidth_meter.append(BandwidthMeter(f.samplerate))
+            resampler = None
+            if f.samplerate != target_sr:
+                import soxr  # librosa's default resampler
+                resampler = soxr.ResampleStream(f.samplerate, target_sr, 1, dtype='float32')
+            for block in f.blocks(blocksize=int(f.samplerate * block_seconds),
+                                  dtype='float32', always_2d=True):
+                mono = block.mean(axis=1)
+                if bandwidth_meter is not None:
+                    bandwidth_meter[0].feed(mono)
+                yield resampler.resample_chunk(mono) if resampler else mono
+            if resampler:
+                yield resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+
+    @staticmethod
+    def _process_block(y, state, chroma_downsample, silence_db):
+        """
+        Computes the frames that are complete in this block and updates the running state.
+        """
+        n_fft = StreamingFeatureExtractor.N_FFT
+        hop_length = StreamingFeatureExtractor.HOP_LENGTH
+        sr = StreamingFeatureExtractor.SAMPLE_RATE
+
+        if y.size:
+            state['peak'] = max(state['peak'], float(np.max(np.abs(y))))
+        if state['meter'] is not None:
+            state['meter'].feed(y)
+        buf = np.concatenate([state['carry'], y])
+        if len(buf) < n_fft:
+            state['carry'] = buf
+            return
+        n_frames = 1 + (len(buf) - n_fft) // hop_length
+        used = (n_frames - 1) * hop_length + n_fft
+        # Keep the overlap so the next block continues the same frame grid
+        state['carry'] = buf[n_frames * hop_length:]
+
+        S = np.abs(librosa.stft(buf[:used], n_fft=n_fft, hop_length=hop_length, center=False)) ** 2
+        rms = np.sqrt(np.sum(S, axis=0) * 2 / n_fft ** 2 / 0.375)  # Parseval for a hann window
+        active = 20 * np.log10(rms + 1e-10) > silence_db
+
+        start = 0
+        if not state['started']:
+            if not active.any():
+                return  # Still in leading silence
+            start = int(np.argmax(active))
+            state['started'] = True
+        S, active = S[:, start:], active[start:]
+
+        # Chroma: downsample by averaging groups of frames
+        chroma = librosa.feature.chroma_stft(S=S, sr=sr, n_fft=n_fft, tuning=0.0, n_chroma=12)
+        pending = np.concatenate([state['chroma_pending'], chroma.astype(np.float32)], axis=1)
+        n_full = pending.shape[1] // chroma_downsample * chroma_downsample
+        if n_full:
+            state['chroma_out'].append(
+                pending[:, :n_full].reshape(12, -1, chroma_downsample).mean(axis=2))
+        state['chroma_pending'] = pending[:, n_full:]
+        if active.any():
+            state['last_active'] = state['chroma_frames'] + int(np.nonzero(active)[0][-1])
+        state['chroma_frames'] += S.shape[1]
+
+        # MFCC running mean, silent frames only count once audio resumes after them
+        mfcc = librosa.feature.mfcc(
+            S=librosa.power_to_db(librosa.feature.melspectrogram(
+                S=S, sr=sr, n_mels=StreamingFeatureExtractor.N_MELS)),
+            n_mfcc=StreamingFeatureExtractor.N_MFCC
+        )
+        if active.any():
+            last = int(np.nonzero(active)[0][-1]) + 1
+            state['mfcc_sum'] += state['pending_sum'] + mfcc[:, :last].sum(axis=1)
+            state['mfcc_count'] += state['pending_count'] + last
+            state['pending_sum'] = mfcc[:, last:].sum(axis=1)
+            state['pending_count'] = mfcc.shape[1] - last
+        else:
+            state['pending_sum'] += mfcc.sum(axis=1)
+            state['pending_count'] += mfcc.shape[1]
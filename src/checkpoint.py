@@ -0,0 +1,154 @@
+import os
+import json
+import glob
+import pickle
+import shutil
+import hashlib
+
+# 2: references keyed by reference id instead of file name
+# 3: results appended in per-batch shards instead of one rewritten file
+# 4: references record their sequence mode (CompactFeatures.sync)
+FORMAT_VERSION = 4
+
+
+class JobCheckpoint:
+    """
+    Job manifest + resumable checkpoints for one comparison run.
+    Everything lives in a per-job directory (keyed by the file lists and the
+    options that change features) and every file is written atomically, so a
+    crash mid-write never corrupts what was saved before:
+
+        manifest.json       file lists/options the job was started with
+        refs-00001.pkl ...  one shard per batch of loaded references
+        results-00001.pkl   one shard per batch of completed remaster results
+    """
+
+    def __init__(self, original_files, remastered_files, options=None, root=None):
+        """
+        Args:
+            original_files (list): Reference file paths of the job.
+            remastered_files (list): Remastered file paths of the job.
+            options (dict, optional): Settings that change the features/scores.
+            root (str, optional): Jobs directory. Defaults to the user cache dir.
+        """
+        self.manifest = {
+            'format': FORMAT_VERSION,
+            'original_files': sorted(original_files),
+            'remastered_files': sorted(remastered_files),
+            'options': options or {}
+        }
+        self.job_id = hashlib.sha1(
+            json.dumps(self.manifest, sort_keys=True).encode()).hexdigest()[:16]
+        if root is None:
+            from app_paths import user_cache_dir
+            root = user_cache_dir('jobs')
+        self.path = os.path.join(root, self.job_id)
+
+    def exists(self):
+        """
+        Whether an earlier run of this exact job left a checkpoint.
+        """
+        return os.path.exists(os.path.join(self.path, 'manifest.json'))
+
+    def start(self):
+        """
+        Creates the job directory and writes the manifest (new runs only).
+        """
+        if os.path.exists(self.path):
+            shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(self.path, exist_ok=True)
+        self._write(os.path.join(self.path, 'manifest.json'),
+                    json.dumps(self.manifest, indent=2).encode())
+
+    def load(self):
+        """
+        Loads the saved state of the job.
+
+        Returns:
+            dict: 'references' (reference id -> record), 'failed_references' (paths)
+            and 'done' (processed remaster paths), or None if there is nothing
+            valid to resume. The results themselves are read with results().
+        """
+        try:
+            with open(os.path.join(self.path, 'manifest.json'), 'rb') as f:
+                if json.load(f) != self.manifest:
+                    return None
+
+            state = {'references': {}, 'failed_references': [], 'done': set()}
+            for shard in sorted(glob.glob(os.path.join(self.path, 'refs-*.pkl'))):
+                with open(shard, 'rb') as f:
+                    data = pickle.load(f)
+                state['references'].update(data['records'])
+                state['failed_references'].extend(data['failed'])
+
+            for data in self._result_shards():
+                state['done'].update(data['done'])
+            return state
+        except Exception as e:
+            print(f"Could not load checkpoint {self.path}: {str(e)}")
+            return None
+
+    def results(self):
+        """
+        Completed remaster results of the job, one batch (shard) at a time
+        so resuming never holds all of them in memory.
+
+        Yields:
+            list: Result entries of one batch.
+        """
+        for data in self._result_shards():
+            yield data['results']
+
+    def _result_shards(self):
+        for shard in sorted(glob.glob(os.path.join(self.path, 'results-*.pkl'))):
+            with open(shard, 'rb') as f:
+                yield pickle.load(f)
+
+    def save_references(self, records, failed):
+        """
+        Saves one batch of loaded references as a new shard.
+
+        Args:
+            records (dict): Reference id -> record loaded in this batch.
+            failed (list): Reference paths that failed in this batch.
+        """
+        if not records and not failed:
+            return
+        index = len(glob.glob(os.path.join(self.path, 'refs-*.pkl'))) + 1
+        self._write(os.path.join(self.path, f'refs-{index:05d}.pkl'),
+                    pickle.dumps({'records': records, 'failed': failed},
+                                 protocol=pickle.HIGHEST_PROTOCOL))
+
+    def save_results(self, results, done):
+        """
+        Saves one batch of completed remaster results as a new shard
+        (appended, earlier batches aren't written again).
+
+        Args:
+            results (list): Result entries completed in this batch.
+            done (list): Remaster paths processed in this batch (including failures).
+        """
+        if not results and not done:
+            return
+        index = len(glob.glob(os.path.join(self.path, 'results-*.pkl'))) + 1
+        self._write(os.path.join(self.path, f'results-{index:05d}.pkl'),
+                    pickle.dumps({'results': results, 'done': list(done)},
+                                 protocol=pickle.HIGHEST_PROTOCOL))
+
+    def delete(self):
+        """
+        Removes the job directory once the job completed.
+        """
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    @staticmethod
+    def _write(path, data):
+        """
+        Atomic write: temp file in the same directory, fsync, then rename over.
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
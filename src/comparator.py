@@ -1,15 +1,46 @@
 import os
+import heapq
 import librosa
 from audio_processor import AudioLoader, FeatureExtractor
 from scipy.spatial.distance import cosine
-from fastdtw import fastdtw
+from reference_index import ReferenceIndex
+import dtw
 import numpy as np
 
+# Time resolution (frames) of the key shift search, keeps it a small fraction of the DTW cost
+KEY_SHIFT_FRAMES = 128
+# Timeline segments whose mean path cost is below this count as matching
+# (same recording ~0.01, unrelated tracks ~0.4)
+SEGMENT_MATCH_COST = 0.1
+# Matches covering less of the query than this are flagged partial (edits, extended versions)
+PARTIAL_COVERAGE = 0.8
+# References top_matches_many() scores per block, the Nth best scores tighten between blocks
+REFERENCE_BLOCK = 32
+# Extra room on the DTW limits of block scoring, its matmul costs sum in another order
+BLOCK_COST_SLACK = 1e-5
+# Frames of a first minute query (60 s at 16 kHz, hop 1024). DTW distances
+# sum over the common length, they're scaled to this many frames so full
+# tracks (and beat columns) score like the first minute does
+FIRST_MINUTE_FRAMES = 60 * 16000 / 1024
+
 # Will need to tweak confidence for precision and also change color intervals (90-95 would be green/good)
 class AudioComparator:
-    def __init__(self, threshold=0.35):
-        self.reference_features = {}
+    # Bump whenever _safe_similarity changes so cached scores are invalidated
+    VERSION = 6
+
+    def __init__(self, threshold=0.35, top_n=5, ambiguous_margin=0.02, score_cache=None,
+                 key_invariant=False, prune=True, band_fraction=dtw.BAND_FRACTION):
+        self.references = ReferenceIndex()  # Reference id -> ReferenceRecord
         self.threshold = threshold
+        self.top_n = max(1, top_n)  # Candidates kept per query (for rematching)
+        self.ambiguous_margin = ambiguous_margin
+        self.score_cache = score_cache  # Optional ScoreCache shared across runs
+        self.key_invariant = key_invariant  # Also try the best semitone shift (pitch corrected remasters)
+        self.prune = prune  # Skip/abandon DTWs that can't make the top N (same results either way)
+        # Chroma DTW band half-width as a share of the length (wider = bigger tempo changes)
+        self.band_fraction = band_fraction
+        # DTW alignments needed by the scans: run to the end, abandoned early or skipped by the bound
+        self.dtw_stats = {'completed': 0, 'abandoned': 0, 'skipped': 0}
 
     def compare(self, query_path):
         """
@@ -32,34 +63,335 @@ class AudioComparator:
         except Exception as e:
             return None, str(e)
 
-        results = []
-        for ref_name, ref_data in self.reference_features.items():
-            try:
-                similarity = self._safe_similarity(query_features, ref_data['features'])
-                results.append({
-                    'reference': ref_name,
-                    'similarity': similarity,
-                    'orig_duration': ref_data['full_duration']
-            })
-            except Exception as e:
-                print(f"Comparison error: {str(e)}")
-                continue
+        return self.compare_features(query_features, query_duration)
+
+    def compare_features(self, query_features, query_duration=0):
+        """
+        Compare already extracted query features to the reference features.
+        Used by the runner pipeline where loading/extraction happen in
+        separate stages.
+
+        Args:
+            query_features (dict): Features from FeatureExtractor.
+            query_duration (float): Full duration of the query file.
+
+        Returns:
+            tuple: A tuple containing the best match and a dictionary of
+            the top N results with the margin between first and second.
+        """
+        results = self.top_matches(query_features)
 
         # Cleanup query features
         del query_features
-        
+
+        return self.summarize(results, query_duration)
+
+    def top_matches(self, query_features):
+        """
+        The best N references for the query, best first.
+
+        Returns:
+            list: Reference id/name, similarity, original duration and
+            similarity timeline per match.
+        """
+        # Heap keeps only the best N while scanning (no full sort over all references)
+        results = heapq.nlargest(self.top_n, self._score_references(query_features),
+                                 key=lambda x: x['similarity'])
+        for result in results:
+            # Scans are distance only, the winners get their path
+            self._add_timeline(result, self._timeline(
+                query_features, self.references[result['reference']].features))
+        return results
+
+    def top_matches_many(self, queries):
+        """
+        top_matches() of several queries at once (e.g. a batch of
+        remasters). The references are scored REFERENCE_BLOCK at a time
+        for all the queries together (score_block), pruned against each
+        query's Nth best score so far (the first block is N references, so
+        pruning starts as early as in top_matches). Same top N as
+        top_matches().
+
+        Args:
+            queries (list): Query features.
+
+        Returns:
+            list: top_matches() results of each query.
+        """
+        try:
+            return self._top_matches_block(queries)
+        except Exception as e:
+            print(f"Block comparison error, comparing one by one: {str(e)}")
+            return [self.top_matches(query) for query in queries]
+
+    def _top_matches_block(self, queries):
+        ref_ids = self.references.keys()
+        best = [[] for _ in queries]  # Min-heaps of (similarity, -reference order, result)
+        cached = [{} for _ in queries]
+        hashes = [None] * len(queries)
+        new_scores = [[] for _ in queries]
+        if self.score_cache is not None:
+            from score_cache import feature_hash
+            ref_hashes = [self._reference_hash(d) for d in self.references.values()]
+            for index, query in enumerate(queries):
+                hashes[index] = feature_hash(query)
+                cached[index] = self.score_cache.get_many(hashes[index], ref_hashes, self.score_params())
+
+        start = 0
+        while start < len(ref_ids):
+            block = ref_ids[start:start + (REFERENCE_BLOCK if start else self.top_n)]
+            records = [self.references[ref_id] for ref_id in block]
+            pairs = np.array([[record.hash not in known for record in records] for known in cached],
+                             dtype=bool).reshape(len(queries), len(block))
+            for index, known in enumerate(cached):
+                for order, record in enumerate(records, start):
+                    if record.hash in known:
+                        self._keep(best[index], known[record.hash], order, ref_ids[order], record)
+            min_scores = [heap[0][0] if self.prune and len(heap) == self.top_n else None
+                          for heap in best]
+            _, scores = self.score_block(queries, block, min_scores, pairs)
+            for index, row in enumerate(scores):
+                for order, (record, similarity) in enumerate(zip(records, row), start):
+                    if np.isnan(similarity):
+                        continue
+                    if hashes[index]:
+                        new_scores[index].append((record.hash, float(similarity)))
+                    self._keep(best[index], float(similarity), order, ref_ids[order], record)
+            start += len(block)
+
+        results = []
+        for index, query in enumerate(queries):
+            top = [item[2] for item in sorted(best[index], key=lambda item: (-item[0], -item[1]))]
+            for result in top:
+                # Block DTWs have no path, only the winners need theirs
+                self._add_timeline(result, self._timeline(
+                    query, self.references[result['reference']].features))
+            if new_scores[index]:
+                self.score_cache.put_many(hashes[index], new_scores[index], self.score_params())
+            results.append(top)
+        return results
+
+    def _keep(self, heap, similarity, order, ref_id, record):
+        """
+        Puts a scored reference on a query's top N heap if it makes it
+        (ties go to the earlier reference, like heapq.nlargest).
+        """
+        if len(heap) == self.top_n and (similarity, -order) <= heap[0][:2]:
+            return
+        result = {
+            'reference': ref_id,
+            'name': record.name,
+            'similarity': similarity,
+            'orig_duration': record.full_duration
+        }
+        if len(heap) < self.top_n:
+            heapq.heappush(heap, (similarity, -order, result))
+        else:
+            heapq.heapreplace(heap, (similarity, -order, result))
+
+    def score_block(self, queries, ref_ids=None, min_scores=None, pairs=None):
+        """
+        Similarities of several queries against several references at once,
+        the scores of _similarity() pair by pair up to float64 rounding
+        (~1e-12, so both share the score cache). Every reference is
+        prepared once for the whole block instead of once per query, the
+        MFCC means are compared with one matmul and the chroma DTWs run on
+        shared reference tiles (dtw.dtw_block). Pairs without MFCC or
+        chroma are scored one at a time, frame vs beat pairs get 0.
+
+        Args:
+            queries (list): Query features.
+            ref_ids (list, optional): References to score, defaults to all.
+            min_scores (list, optional): Score each query has to beat (None:
+                anything), pairs that can't are left out like in _similarity().
+            pairs (np.ndarray, optional): Queries x references mask of the
+                pairs to score (e.g. not cached), defaults to all.
+
+        Returns:
+            tuple: (reference ids, queries x references similarities, nan
+            for the pairs left out).
+        """
+        ref_ids = self.references.keys() if ref_ids is None else list(ref_ids)
+        refs = [self.references[ref_id].features for ref_id in ref_ids]
+        min_scores = [None] * len(queries) if min_scores is None else list(min_scores)
+        shape = (len(queries), len(refs))
+        scores = np.full(shape, np.nan)
+        pairs = np.ones(shape, dtype=bool) if pairs is None else np.asarray(pairs, dtype=bool)
+
+        # Frame vs beat sequences can't be aligned (see _same_sync)
+        q_sync = np.array([self._sync(q) for q in queries], dtype=object).reshape(-1)
+        r_sync = np.array([self._sync(r) for r in refs], dtype=object).reshape(-1)
+        mixed = pairs & (q_sync[:, np.newaxis] != r_sync[np.newaxis, :])
+        scores[mixed] = 0.0
+        pairs = pairs & ~mixed
+
+        def complete(features):
+            return 'mfcc' in features and 'chroma' in features
+
+        q_rows = np.array([complete(q) for q in queries], dtype=bool).reshape(-1)
+        r_cols = np.array([complete(r) for r in refs], dtype=bool).reshape(-1)
+        for i, j in zip(*np.nonzero(pairs & ~(q_rows[:, np.newaxis] & r_cols[np.newaxis, :]))):
+            similarity = self._similarity(queries[i], refs[j], min_scores[i])[0]
+            scores[i, j] = np.nan if similarity is None else similarity
+
+        q_rows, r_cols = np.nonzero(q_rows)[0], np.nonzero(r_cols)[0]
+        wanted = pairs[np.ix_(q_rows, r_cols)]
+        if not wanted.any():
+            return ref_ids, scores
+        q_features = [queries[i] for i in q_rows]
+        r_features = [refs[j] for j in r_cols]
+
+        # MFCC: cosine of the means, 1 - cosine(q + 1e-9, r + 1e-9) as in _similarity,
+        # the references' unit means are kept stacked by the index
+        r_unit = self.references.unit_mfcc[self.references.slots([ref_ids[j] for j in r_cols])]
+        mfcc = np.clip(self._unit_mfcc(q_features) @ r_unit.T, 0.0, 1.0)
+        q_chroma = [self._chroma(q) for q in q_features]
+        r_chroma = [self._chroma(r) for r in r_features]
+        scale = self._length_scale(np.minimum.outer([c.shape[1] for c in q_chroma],
+                                                    [c.shape[1] for c in r_chroma]))
+
+        # DTW limits from each query's min score (see _max_distance), 0 = not aligned
+        limits = np.full(wanted.shape, np.inf)
+        for row, i in enumerate(q_rows):
+            if min_scores[i] is None:
+                continue
+            needed = 2 * min_scores[i] - mfcc[row]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                distance = (1 / needed - 1) * 100 / scale[row] * (1 + BLOCK_COST_SLACK)
+            limits[row] = np.where(needed <= 0, np.inf, np.where(needed >= 1, 0.0, distance))
+        limits[~wanted] = 0.0
+
+        q_frames = [dtw.normalize_frames(c) for c in q_chroma]
+        r_frames = [dtw.normalize_frames(c) for c in r_chroma]
+        distances, status = dtw.dtw_block(q_frames, r_frames, limits, fraction=self.band_fraction)
+        for name, code in (('completed', dtw.COMPLETED), ('abandoned', dtw.ABANDONED),
+                           ('skipped', dtw.SKIPPED)):
+            self.dtw_stats[name] += int(np.count_nonzero(wanted & (status == code)))
+
+        if self.key_invariant:
+            # Transposed remasters: DTW again for the most likely shift, as in _similarity
+            for row, col in zip(*np.nonzero(wanted & (limits > 0))):
+                k = min(len(q_frames[row]), len(r_frames[col]))
+                shift = self._best_key_shift(q_chroma[row][:, :k], r_chroma[col][:, :k])
+                if shift:
+                    bound = min(distances[row, col], limits[row, col])
+                    shifted = np.roll(r_frames[col][:k], shift, axis=1)
+                    distances[row, col] = min(distances[row, col],
+                                              self._align(q_frames[row][:k], shifted, bound)[0])
+
+        with np.errstate(invalid='ignore'):
+            chroma = 1 / (1 + distances * scale / 100)
+        similarities = np.where(wanted & np.isfinite(distances), (mfcc + chroma) / 2, np.nan)
+        scores[np.ix_(q_rows, r_cols)] = np.where(wanted, similarities, scores[np.ix_(q_rows, r_cols)])
+        return ref_ids, scores
+
+    @staticmethod
+    def _unit_mfcc(features):
+        """
+        Unit length MFCC means (+ 1e-9 like the pairwise cosine), one row per file.
+        """
+        means = np.array([np.mean(f['mfcc'], axis=1) for f in features], dtype=np.float64) + 1e-9
+        return means / np.linalg.norm(means, axis=1, keepdims=True)
+
+    def summarize(self, results, query_duration=0):
+        """
+        Best match + details from the top N results (best first), e.g. the
+        top N merged from several reference shards.
+
+        Returns:
+            tuple: Same as compare_features.
+        """
         if not results:
             return None, "No valid comparisons"
             
-        results.sort(key=lambda x: x['similarity'], reverse=True)
+        # Margin between first and second best, a small margin = ambiguous match
+        margin = float(results[0]['similarity'] - (results[1]['similarity'] if len(results) > 1 else 0.0))
         best = results[0] if results[0]['similarity'] >= self.threshold else None
+        coverage = best.get('coverage') if best else None
         return (best, 
         {
             'results': results,
+            'margin': margin,
+            'ambiguous': bool(best is not None and margin < self.ambiguous_margin),
+            'partial': bool(coverage is not None and coverage < PARTIAL_COVERAGE),
             'query_duration': query_duration
         }
     )
 
+    def _score_references(self, query_features):
+        """
+        Scores the query against every reference.
+        Pairs found in the score cache skip the DTW entirely. Once N
+        references have been scored, a reference whose lower bound can't
+        beat the Nth best skips its DTW and the others stop as soon as
+        their cost rules it out (same top N as a full scan).
+
+        Yields:
+            dict: Reference id/name, similarity, original duration (no
+            timeline, top_matches() aligns only the winners with a path).
+        """
+        cached, query_hash, new_scores = {}, None, []
+        best = []  # Min-heap of the N best similarities so far
+        if self.score_cache is not None:
+            from score_cache import feature_hash
+            query_hash = feature_hash(query_features)
+            cached = self.score_cache.get_many(
+                query_hash, [self._reference_hash(d) for d in self.references.values()],
+                self.score_params())
+
+        for ref_id, ref_data in self.references.items():
+            try:
+                ref_hash = ref_data.hash
+                if ref_hash in cached:
+                    similarity = cached[ref_hash]
+                else:
+                    min_score = best[0] if self.prune and len(best) == self.top_n else None
+                    similarity = self._similarity(query_features, ref_data.features, min_score)[0]
+                    if similarity is None:
+                        # Abandoned, can't make the top N (and its score isn't known to cache)
+                        continue
+                    if query_hash:
+                        new_scores.append((ref_hash, similarity))
+                if len(best) < self.top_n:
+                    heapq.heappush(best, similarity)
+                elif similarity > best[0]:
+                    heapq.heapreplace(best, similarity)
+                result = {
+                    'reference': ref_id,
+                    'name': ref_data.name,
+                    'similarity': similarity,
+                    'orig_duration': ref_data.full_duration
+                }
+                yield result
+            except Exception as e:
+                print(f"Comparison error: {str(e)}")
+                continue
+
+        if new_scores:
+            self.score_cache.put_many(query_hash, new_scores, self.score_params())
+
+    def score_params(self):
+        """
+        Cache key part for everything besides the features that changes scores.
+
+        Returns:
+            str: Comparator version/params key.
+        """
+        params = f"v{self.VERSION}" + ("-key" if self.key_invariant else "")
+        if self.band_fraction != dtw.BAND_FRACTION:
+            params += f"-band{self.band_fraction:g}"
+        return params
+
+    @staticmethod
+    def _reference_hash(ref_data):
+        """
+        Feature hash of a reference, computed once and kept on the entry.
+        """
+        if ref_data.hash is None:
+            from score_cache import feature_hash
+            ref_data.hash = feature_hash(ref_data.features)
+        return ref_data.hash
+
     def _safe_similarity(self, query, ref):
         """
         Thread-safe similarity calculation.
@@ -67,29 +399,222 @@ class AudioComparator:
         Returns:
             float: The similarity score between the query and reference features.
         """
+        return self._similarity(query, ref)[0]
+
+    def _similarity(self, query, ref, min_score=None, with_timeline=False):
+        """
+        Similarity + per-segment timeline of the chroma DTW path.
+
+        Args:
+            query (dict): Query features.
+            ref (dict): Reference features.
+            min_score (float, optional): Score the pair has to beat, the DTW is
+                skipped when the MFCC score or the lower bound rule that out
+                and abandoned once its cost does.
+            with_timeline (bool): Align with the path for the timeline, its
+                direction matrix is big for full tracks (see dtw.dtw).
+
+        Returns:
+            tuple: (similarity, timeline). Similarity is None when abandoned,
+            timeline is None without chroma or with_timeline.
+        """
         scores = []
-        
-        # Chroma comparison with size validation
-        if 'chroma' in query and 'chroma' in ref:
-            try:
-                min_frames = min(query['chroma'].shape[1], ref['chroma'].shape[1])
-                q_chroma = query['chroma'][:, :min_frames]
-                r_chroma = ref['chroma'][:, :min_frames]
-                # no div by 0 with epsilon
-                d, _ = fastdtw(q_chroma.T, r_chroma.T, dist=lambda x, y: cosine(x, y) + 1e-9)
-                scores.append(1 / (1 + d/100))
-            except Exception as e:
-                print(f"Chroma error: {str(e)}")
+        timeline = None
+        if self._sync(query) != self._sync(ref):
+            # Frame vs beat sequences (beat sync fell back to frames for
+            # one of them), their DTW would compare unrelated time bases
+            return 0.0, None
 
-        # MFCC comparison
+        # MFCC comparison (first, it's cheap and tightens the DTW bound)
         if 'mfcc' in query and 'mfcc' in ref:
             try:
-                q_mfcc = np.mean(query['mfcc'], axis=1)
-                r_mfcc = np.mean(ref['mfcc'], axis=1)
+                # float64 like the stacked means of score_block (scipy keeps float32)
+                q_mfcc = np.mean(query['mfcc'], axis=1).astype(np.float64)
+                r_mfcc = np.mean(ref['mfcc'], axis=1).astype(np.float64)
                 #no div by 0
                 similarity = 1 - cosine(q_mfcc + 1e-9, r_mfcc + 1e-9)
                 scores.append(max(min(similarity, 1.0), 0.0))
             except Exception as e:
                 print(f"MFCC error: {str(e)}")
 
-        return np.mean(scores) if scores else 0.0
\ No newline at end of file
+        # Chroma comparison with size validation
+        if 'chroma' in query and 'chroma' in ref:
+            try:
+                q_chroma, r_chroma = self._chroma(query), self._chroma(ref)
+                min_frames = min(q_chroma.shape[1], r_chroma.shape[1])
+                scale = self._length_scale(min_frames)
+                max_cost = self._max_distance(min_score, scores, scale)
+                if max_cost is not None and max_cost <= 0:
+                    # Even a perfect chroma score can't make it (MFCC bound)
+                    self.dtw_stats['skipped'] += 1
+                    return None, None
+                max_cost = np.inf if max_cost is None else max_cost
+
+                q_chroma = q_chroma[:, :min_frames]
+                r_chroma = r_chroma[:, :min_frames]
+                q = dtw.normalize_frames(q_chroma)
+                r = dtw.normalize_frames(r_chroma)
+                alignments = [r]
+                if self.key_invariant:
+                    # Transposed remaster: DTW again only for the most likely shift
+                    shift = self._best_key_shift(q_chroma, r_chroma)
+                    if shift:
+                        alignments.append(np.roll(r, shift, axis=1))
+
+                d, path, costs = np.inf, None, None
+                for r in alignments:
+                    # Only has to beat the threshold and the unshifted distance
+                    aligned = self._align(q, r, min(d, max_cost), with_timeline)
+                    if aligned[0] < d:
+                        d, path, costs = aligned
+                if not np.isfinite(d):
+                    return None, None
+                if with_timeline:
+                    timeline = dtw.cost_profile(path, costs, min_frames)
+                scores.append(1 / (1 + d * scale / 100))
+            except Exception as e:
+                print(f"Chroma error: {str(e)}")
+
+        return (np.mean(scores) if scores else 0.0), timeline
+
+    def _align(self, q, r, max_cost=np.inf, with_path=False):
+        """
+        One chroma alignment, skipped when its lower bound is above max_cost
+        and abandoned once its cost is (counted in dtw_stats).
+
+        Returns:
+            tuple: Same as _chroma_distance, distance inf when skipped/abandoned.
+        """
+        rows = None
+        if np.isfinite(max_cost):
+            rows = dtw.row_bounds(q, r, fraction=self.band_fraction)
+            if dtw.lower_bound(q, r, rows=rows, fraction=self.band_fraction) * (1 - 1e-6) > max_cost:
+                self.dtw_stats['skipped'] += 1
+                return np.inf, None, None
+        aligned = self._chroma_distance(q, r, max_cost, rows, with_path)
+        self.dtw_stats['completed' if np.isfinite(aligned[0]) else 'abandoned'] += 1
+        return aligned
+
+    @staticmethod
+    def _sync(features):
+        """
+        Whether the sequences are per 'frame' or per 'beat' (features from
+        before the mode was recorded: beat-synced ones have a beat_scale).
+        """
+        return features.get('sync') or ('beat' if 'beat_scale' in features else 'frame')
+
+    @staticmethod
+    def _chroma(features):
+        """
+        Chroma for the alignments: compact references as stored (quantized),
+        only scale invariant (normalized) frames are made from it, so no
+        dequantized copy per pair.
+        """
+        stored = getattr(features, 'stored_chroma', None)
+        return stored if stored is not None else features['chroma']
+
+    @staticmethod
+    def _length_scale(frames):
+        """
+        Factor from a DTW distance over `frames` common frames (or beat
+        columns) to one over FIRST_MINUTE_FRAMES, so the score reads the
+        mean cost per frame and a long true match isn't worth less than a
+        short one.
+        """
+        return FIRST_MINUTE_FRAMES / np.maximum(frames, 1)
+
+    @staticmethod
+    def _max_distance(min_score, other_scores, scale):
+        """
+        Largest chroma DTW distance that still lets the mean score beat
+        min_score given the other (MFCC) scores.
+
+        Returns:
+            float: The bound, None when anything can still win, 0 when
+            nothing can.
+        """
+        if min_score is None:
+            return None
+        # Chroma score the mean needs: (chroma + others) / n > min_score
+        needed = min_score * (len(other_scores) + 1) - sum(other_scores)
+        if needed <= 0:
+            return None
+        if needed >= 1:
+            return 0.0
+        # 1 / (1 + d * scale / 100) > needed, a hair looser against rounding
+        return (1 / needed - 1) * 100 / scale * (1 + 1e-9)
+
+    def _chroma_distance(self, q, r, max_cost=np.inf, row_bounds=None, with_path=False):
+        """
+        DTW distance between two sequences of normalized chroma frames
+        (cosine frame distance) + the path's query frames and local costs
+        (None without with_path).
+        """
+        if not with_path:
+            d = dtw.dtw_distance(q, r, max_cost, row_bounds=row_bounds, fraction=self.band_fraction)
+            return d, None, None
+        d, path_i, _, costs = dtw.dtw(q, r, max_cost, row_bounds=row_bounds,
+                                      fraction=self.band_fraction)
+        return d, path_i, costs
+
+    def _timeline(self, query, ref):
+        """
+        Timeline of a pair scored elsewhere (cached), same alignment as _similarity.
+        """
+        try:
+            return self._similarity(query, ref, with_timeline=True)[1]
+        except Exception as e:
+            print(f"Timeline error: {str(e)}")
+            return None
+
+    @staticmethod
+    def _add_timeline(result, timeline):
+        """
+        Puts the per-segment similarity timeline and the share of the query
+        it matches on a result.
+        """
+        if timeline is None:
+            return
+        result['timeline'] = [round(float(1 - cost), 4) for cost in timeline]
+        result['coverage'] = float(np.mean(timeline < SEGMENT_MATCH_COST))
+
+    @staticmethod
+    def _best_key_shift(q_chroma, r_chroma):
+        """
+        Finds the circular chroma shift that best aligns the reference with
+        the query. All 12 shifts are scored at once: one batched matmul gives
+        a (shift, query frame, reference frame) cosine cost tensor over
+        time-downsampled chroma, no DTW per shift.
+
+        Args:
+            q_chroma (np.ndarray): Query chroma (12 x frames).
+            r_chroma (np.ndarray): Reference chroma (12 x frames).
+
+        Returns:
+            int: Semitones to roll the reference by (0-11), for np.roll(axis=0).
+        """
+        q = AudioComparator._downsample_frames(q_chroma, KEY_SHIFT_FRAMES)
+        r = AudioComparator._downsample_frames(r_chroma, KEY_SHIFT_FRAMES)
+        q = q / (np.linalg.norm(q, axis=0, keepdims=True) + 1e-9)
+        r = r / (np.linalg.norm(r, axis=0, keepdims=True) + 1e-9)
+
+        # shifted[k] == np.roll(r, k, axis=0)
+        bins = np.arange(12)
+        shifted = r[(bins[None, :] - bins[:, None]) % 12]
+        cost = 1 - np.matmul(q.T[None], shifted)
+
+        # Alignment-free DTW stand-in: each frame's cheapest match, both directions
+        total = cost.min(axis=2).mean(axis=1) + cost.min(axis=1).mean(axis=1)
+        return int(np.argmin(total))
+
+    @staticmethod
+    def _downsample_frames(x, frames):
+        """
+        Averages the columns of x down to at most `frames` columns.
+        """
+        n = x.shape[1]
+        if n <= frames:
+            return np.asarray(x, dtype=np.float32)
+        starts = np.unique(np.linspace(0, n, frames, endpoint=False).astype(int))
+        sums = np.add.reduceat(np.asarray(x, dtype=np.float32), starts, axis=1)
+        return sums / np.diff(np.append(starts, n))
@@ -0,0 +1,441 @@
+import numpy as np
+from numba import njit
+from scipy.ndimage import maximum_filter1d
+
+# Default band half-width as a share of the sequence length (Sakoe-Chiba).
+# Over the common length a tempo ratio s drifts by up to |1 - s| of it, so
+# 0.5 still aligns 0.6x / 1.67x transfers (0.25 scored those below fastdtw)
+BAND_FRACTION = 0.5
+# Cost profile resolution (segments along the query)
+PROFILE_SEGMENTS = 32
+# Reference frames per tile of dtw_block(), stay in cache while every query
+# of the block is aligned against them
+TILE_FRAMES = 4096
+# Largest query x tile cost matrix (cells, float64) dtw_block() computes at
+# once, longer pairs (full tracks) fall back to costs on the fly
+MAX_TILE_CELLS = 1 << 23
+# Largest direction matrix (cells, one byte each) dtw() keeps for its path.
+# A band of half the length grows it with the square of the length (two 80
+# minute tracks: ~370 MB), longer pairs get a narrower band for the path
+MAX_PATH_CELLS = 1 << 25
+
+# Outcome of a pair in dtw_block()
+COMPLETED, ABANDONED, SKIPPED = 0, 1, 2
+
+# Backtracking directions
+_DIAGONAL, _UP, _LEFT = 0, 1, 2
+
+
+def normalize_frames(x):
+    """
+    Chroma (bins x frames) -> contiguous unit length frames (frames x bins)
+    for the cosine frame distance. Takes quantized chroma (e.g. uint8) as
+    is, the scale cancels out.
+    """
+    frames = np.ascontiguousarray(np.asarray(x).T, dtype=np.float32)
+    norms = np.sqrt(np.einsum('ij,ij->i', frames, frames))
+    return frames / np.maximum(norms, 1e-9)[:, np.newaxis]
+
+
+def dtw(q, r, max_cost=np.inf, band=None, row_bounds=None, fraction=BAND_FRACTION):
+    """
+    DTW between two sequences of unit length frames with the cosine frame
+    distance (1 - dot), with its path. The cost is computed on the fly and
+    two rows of accumulated costs are kept, but the path needs a direction
+    byte per cell of the band: frames x band, so with the default band it
+    grows with the square of the length. The band is narrowed to keep that
+    under MAX_PATH_CELLS (full tracks), dtw_distance() needs no directions.
+
+    Stops early once every cell of a row costs more than max_cost: the
+    accumulated cost only grows along a path and every path crosses every
+    row, so the final distance can't get back under it. With row_bounds
+    the rows still to come count too (their lower bounds).
+
+    Args:
+        q (np.ndarray): Query frames (n x bins), from normalize_frames.
+        r (np.ndarray): Reference frames (m x bins).
+        max_cost (float): Give up above this distance.
+        band (int, optional): Sakoe-Chiba band half-width in frames.
+            Defaults to `fraction` of the longer sequence.
+        row_bounds (np.ndarray, optional): Per query frame lower bounds
+            from row_bounds(), for abandoning sooner.
+        fraction (float): Band half-width as a share of the sequence
+            length when no band is given (1 = unconstrained).
+
+    Returns:
+        tuple: (distance, path query indices, path reference indices, local
+        cost per path step). Distance is inf and the path empty when abandoned.
+    """
+    n, m = len(q), len(r)
+    band = _band(n, m, band, fraction)
+    # Narrower band beats hundreds of MB per pair (bounds of the wider one still hold)
+    band = max(min(band, (MAX_PATH_CELLS // max(n, 1) - 1) // 2), _band(n, m, 1))
+    distance, steps, path_i, path_j, costs = _dtw(q, r, float(max_cost), band,
+                                                  _remaining(n, row_bounds))
+    if steps < 0:
+        return np.inf, path_i[:0], path_j[:0], costs[:0]
+    return distance, path_i[:steps][::-1], path_j[:steps][::-1], costs[:steps][::-1]
+
+
+def dtw_distance(q, r, max_cost=np.inf, band=None, row_bounds=None, fraction=BAND_FRACTION):
+    """
+    dtw() without the path: two rows of accumulated costs and nothing per
+    cell, so memory stays linear in the band size even for full tracks.
+    Same arguments, same distance as dtw() when it doesn't narrow the band.
+
+    Returns:
+        float: The DTW distance, inf when abandoned.
+    """
+    band = _band(len(q), len(r), band, fraction)
+    return _dtw_distance(q, r, float(max_cost), band, _remaining(len(q), row_bounds))
+
+
+def _remaining(n, row_bounds):
+    """
+    Lower bound of the rows after each row (slightly loosened against rounding).
+    """
+    remaining = np.zeros(n + 1)
+    if row_bounds is not None:
+        remaining[:-1] = np.cumsum(row_bounds[::-1])[::-1] * (1 - 1e-6)
+    return remaining
+
+
+def row_bounds(q, r, band=None, fraction=BAND_FRACTION):
+    """
+    LB_Keogh-style lower bound of each query frame's cost in
+    dtw(q, r, band=band), O(frames) instead of O(frames * band). The path
+    visits every query frame at some reference frame inside its band
+    window, and for non-negative unit frames (chroma) the dot with any of
+    them is at most the dot with the window's per-bin maximum (upper
+    envelope).
+
+    Returns:
+        np.ndarray: Lower bound per query frame, their sum bounds the distance.
+    """
+    n, m = len(q), len(r)
+    band = _band(n, m, band, fraction)
+    upper = maximum_filter1d(r, size=2 * band + 1, axis=0, mode='nearest')
+    centres = (np.arange(n) * (m - 1)) // (n - 1) if n > 1 else np.zeros(n, dtype=int)
+    dots = np.einsum('ij,ij->i', q, upper[centres])
+    return np.maximum(1.0 - dots.astype(np.float64), 0.0) + 1e-9
+
+
+def lower_bound(q, r, band=None, rows=None, fraction=BAND_FRACTION):
+    """
+    Lower bound of dtw(q, r, band=band) from row_bounds(). Same lengths: the
+    bound from the reference's side (every reference frame is visited too)
+    is also valid, the larger one is used.
+
+    Args:
+        rows (np.ndarray, optional): row_bounds(q, r, band) if already computed.
+        fraction (float): Band share when no band is given, as in dtw().
+
+    Returns:
+        float: A distance dtw() can't go below.
+    """
+    rows = row_bounds(q, r, band, fraction) if rows is None else rows
+    bound = float(np.sum(rows))
+    if len(q) == len(r):
+        bound = max(bound, float(np.sum(row_bounds(r, q, band, fraction))))
+    return bound
+
+
+def dtw_block(queries, references, max_costs=None, band=None, fraction=BAND_FRACTION):
+    """
+    DTW distances of every query against every reference, each pair over
+    their common length (the first min(n, m) frames, as the comparator
+    aligns them). Instead of pulling every reference through the cache
+    once per query, the references are cut into tiles of TILE_FRAMES
+    frames: one float64 matmul gives the cosine costs of a query against a
+    whole tile and one compiled call runs all the tile's DTWs from them
+    (distances only, no paths). Same costs as dtw() computes on the fly
+    (float64 products of the float32 frames), only summed in another
+    order, so distances agree to ~1e-12.
+
+    With max_costs, pairs are skipped on their lower bound or abandoned
+    early as in dtw(). The bounds come from each sequence's envelope over
+    its own band, at least as wide as any pair's, so a bit looser than
+    lower_bound() but computed once per sequence instead of per pair.
+
+    Args:
+        queries (list): Query frames (n x bins each), from normalize_frames.
+        references (list): Reference frames (m x bins each).
+        max_costs (np.ndarray, optional): Queries x references distance
+            limits, pairs at 0 or below aren't aligned.
+        band (int, optional): Band half-width, as in dtw().
+        fraction (float): Band share when no band is given, as in dtw().
+
+    Returns:
+        tuple: (distances, status), both queries x references. Distances
+        are inf unless status is COMPLETED (else ABANDONED or SKIPPED).
+    """
+    shape = (len(queries), len(references))
+    distances = np.full(shape, np.inf)
+    status = np.full(shape, SKIPPED, dtype=np.int8)
+    max_costs = np.full(shape, np.inf) if max_costs is None else np.asarray(max_costs, dtype=np.float64)
+    bounded = bool(np.isfinite(max_costs).any())
+
+    def envelope(x):
+        if not bounded:
+            return x  # Not read without limits
+        size = 2 * _band(len(x), len(x), band, fraction) + 1
+        return np.ascontiguousarray(maximum_filter1d(x, size=size, axis=0, mode='nearest'))
+
+    q_uppers = [envelope(q) for q in queries]
+    for start, stop in _tiles([len(r) for r in references]):
+        frames = np.ascontiguousarray(np.concatenate(references[start:stop]))
+        frames_t = frames.T.astype(np.float64)
+        uppers = np.ascontiguousarray(np.concatenate([envelope(r) for r in references[start:stop]]))
+        lengths = np.array([len(r) for r in references[start:stop]], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+        for index, q in enumerate(queries):
+            limits = max_costs[index, start:stop]
+            if not np.any(limits > 0):
+                continue
+            common = np.minimum(len(q), lengths)
+            bands = np.array([_band(k, k, band, fraction) for k in common], dtype=np.int64)
+            if len(q) * len(frames) > MAX_TILE_CELLS:
+                # Cost matrix too big (full tracks): one pair at a time, linear memory
+                for t in range(stop - start):
+                    r = references[start + t][:common[t]]
+                    distances[index, start + t], status[index, start + t] = _pair(
+                        q[:common[t]], r, limits[t], bands[t])
+                continue
+            dots = q.astype(np.float64) @ frames_t
+            _dtw_tile(q, q_uppers[index], dots, frames, uppers, offsets, common, bands, limits,
+                      distances[index, start:stop], status[index, start:stop])
+    return distances, status
+
+
+def _tiles(lengths):
+    """
+    (start, stop) ranges of consecutive sequences of about TILE_FRAMES frames.
+    """
+    start, frames = 0, 0
+    for stop, length in enumerate(lengths, 1):
+        frames += length
+        if frames >= TILE_FRAMES:
+            yield start, stop
+            start, frames = stop, 0
+    if start < len(lengths):
+        yield start, len(lengths)
+
+
+def _pair(q, r, max_cost, band):
+    """
+    One dtw_block() pair with costs on the fly: (distance, status).
+    """
+    if not max_cost > 0:
+        return np.inf, SKIPPED
+    rows = None
+    if np.isfinite(max_cost):
+        rows = row_bounds(q, r, band)
+        if lower_bound(q, r, band, rows) * (1 - 1e-6) > max_cost:
+            return np.inf, SKIPPED
+    distance = dtw_distance(q, r, max_cost, band, rows)
+    return distance, (COMPLETED if np.isfinite(distance) else ABANDONED)
+
+
+def _band(n, m, band, fraction=BAND_FRACTION):
+    if band is None:
+        band = int(np.ceil(fraction * max(n, m)))
+    # Wide enough that neighbouring rows' windows always connect
+    return max(int(band), int(np.ceil(m / max(n, 1))), 1)
+
+
+@njit(cache=True)
+def _window(i, n, m, band):
+    centre = (i * (m - 1)) // (n - 1) if n > 1 else 0
+    return max(0, centre - band), min(m - 1, centre + band)
+
+
+@njit(cache=True)
+def _cost(q, r, i, j):
+    # float64 products, like the matmul of dtw_block()
+    dot = 0.0
+    for k in range(q.shape[1]):
+        dot += np.float64(q[i, k]) * np.float64(r[j, k])
+    return max(1.0 - dot, 0.0) + 1e-9
+
+
+@njit(cache=True)
+def _dtw(q, r, max_cost, band, remaining):
+    n, m = q.shape[0], r.shape[0]
+    width = 2 * band + 1
+    directions = np.empty((n, min(width, m)), dtype=np.uint8)
+    previous = np.full(width, np.inf)
+    current = np.full(width, np.inf)
+    prev_lo, prev_hi = 0, -1
+    empty = np.empty(0, dtype=np.int64)
+
+    for i in range(n):
+        lo, hi = _window(i, n, m, band)
+        row_min = np.inf
+        for j in range(lo, hi + 1):
+            if i == 0 and j == 0:
+                best, move = 0.0, _DIAGONAL
+            else:
+                best, move = np.inf, _DIAGONAL
+                if i > 0 and j > 0 and prev_lo <= j - 1 <= prev_hi:
+                    best = previous[j - 1 - prev_lo]
+                if i > 0 and prev_lo <= j <= prev_hi and previous[j - prev_lo] < best:
+                    best, move = previous[j - prev_lo], _UP
+                if j > lo and current[j - 1 - lo] < best:
+                    best, move = current[j - 1 - lo], _LEFT
+            total = best + _cost(q, r, i, j)
+            current[j - lo] = total
+            directions[i, j - lo] = move
+            if total < row_min:
+                row_min = total
+        if row_min + remaining[i + 1] > max_cost:
+            return np.inf, -1, empty, empty, np.empty(0)
+        previous, current = current, previous
+        prev_lo, prev_hi = lo, hi
+
+    distance = previous[m - 1 - prev_lo]
+    if distance > max_cost:
+        return np.inf, -1, empty, empty, np.empty(0)
+
+    # Backtrack from the end (path comes out reversed)
+    path_i = np.empty(n + m, dtype=np.int64)
+    path_j = np.empty(n + m, dtype=np.int64)
+    costs = np.empty(n + m)
+    i, j, steps = n - 1, m - 1, 0
+    while True:
+        path_i[steps], path_j[steps] = i, j
+        costs[steps] = _cost(q, r, i, j)
+        steps += 1
+        if i == 0 and j == 0:
+            break
+        lo, _ = _window(i, n, m, band)
+        move = directions[i, j - lo]
+        if move == _DIAGONAL:
+            i, j = i - 1, j - 1
+        elif move == _UP:
+            i -= 1
+        else:
+            j -= 1
+    return distance, steps, path_i, path_j, costs
+
+
+@njit(cache=True)
+def _dtw_distance(q, r, max_cost, band, remaining):
+    # Distance only version of _dtw, costs on the fly
+    n, m = q.shape[0], r.shape[0]
+    width = 2 * band + 1
+    previous = np.full(width, np.inf)
+    current = np.full(width, np.inf)
+    prev_lo, prev_hi = 0, -1
+
+    for i in range(n):
+        lo, hi = _window(i, n, m, band)
+        row_min = np.inf
+        for j in range(lo, hi + 1):
+            if i == 0 and j == 0:
+                best = 0.0
+            else:
+                best = np.inf
+                if i > 0 and j > 0 and prev_lo <= j - 1 <= prev_hi:
+                    best = previous[j - 1 - prev_lo]
+                if i > 0 and prev_lo <= j <= prev_hi and previous[j - prev_lo] < best:
+                    best = previous[j - prev_lo]
+                if j > lo and current[j - 1 - lo] < best:
+                    best = current[j - 1 - lo]
+            total = best + _cost(q, r, i, j)
+            current[j - lo] = total
+            if total < row_min:
+                row_min = total
+        if row_min + remaining[i + 1] > max_cost:
+            return np.inf
+        previous, current = current, previous
+        prev_lo, prev_hi = lo, hi
+
+    distance = previous[m - 1 - prev_lo]
+    return distance if distance <= max_cost else np.inf
+
+
+@njit(cache=True)
+def _dtw_tile(q, q_upper, dots, frames, uppers, offsets, lengths, bands, max_costs,
+              distances, status):
+    # dots = q @ frames.T, pair t: q[:k] vs frames[offset:offset + k] (k = lengths[t])
+    for t in range(len(offsets)):
+        max_cost = max_costs[t]
+        if not max_cost > 0:
+            continue
+        k, offset = lengths[t], offsets[t]
+        remaining = np.zeros(k + 1)
+        if max_cost < np.inf:
+            # Envelope bounds of both sides, the query's rows also for abandoning
+            reverse = 0.0
+            for i in range(k - 1, -1, -1):
+                forward = 0.0
+                backward = 0.0
+                for b in range(q.shape[1]):
+                    forward += q[i, b] * uppers[offset + i, b]
+                    backward += frames[offset + i, b] * q_upper[i, b]
+                remaining[i] = remaining[i + 1] + max(1.0 - forward, 0.0) + 1e-9
+                reverse += max(1.0 - backward, 0.0) + 1e-9
+            if max(remaining[0], reverse) * (1 - 1e-6) > max_cost:
+                continue
+            for i in range(k + 1):
+                remaining[i] *= 1 - 1e-6
+        distance = _dtw_costs(dots, offset, k, bands[t], max_cost, remaining)
+        distances[t] = distance
+        status[t] = COMPLETED if distance < np.inf else ABANDONED
+
+
+@njit(cache=True)
+def _dtw_costs(dots, offset, n, band, max_cost, remaining):
+    # Distance only version of _dtw over precomputed dots (n x n pair at column offset)
+    width = 2 * band + 1
+    previous = np.full(width, np.inf)
+    current = np.full(width, np.inf)
+    prev_lo, prev_hi = 0, -1
+
+    for i in range(n):
+        lo, hi = _window(i, n, n, band)
+        row_min = np.inf
+        for j in range(lo, hi + 1):
+            if i == 0 and j == 0:
+                best = 0.0
+            else:
+                best = np.inf
+                if i > 0 and j > 0 and prev_lo <= j - 1 <= prev_hi:
+                    best = previous[j - 1 - prev_lo]
+                if i > 0 and prev_lo <= j <= prev_hi and previous[j - prev_lo] < best:
+                    best = previous[j - prev_lo]
+                if j > lo and current[j - 1 - lo] < best:
+                    best = current[j - 1 - lo]
+            total = best + max(1.0 - dots[i, offset + j], 0.0) + 1e-9
+            current[j - lo] = total
+            if total < row_min:
+                row_min = total
+        if row_min + remaining[i + 1] > max_cost:
+            return np.inf
+        previous, current = current, previous
+        prev_lo, prev_hi = lo, hi
+
+    distance = previous[n - 1 - prev_lo]
+    return distance if distance <= max_cost else np.inf
+
+
+def cost_profile(path_i, costs, n, segments=PROFILE_SEGMENTS):
+    """
+    Mean local cost along the path per segment of the query, e.g. for
+    spotting remasters that only match part of the original (edits,
+    extended versions). 0 = identical frames, 1 = unrelated.
+
+    Args:
+        path_i (np.ndarray): Query index of each path step.
+        costs (np.ndarray): Local cost of each path step.
+        n (int): Query length (frames).
+        segments (int): Profile length (fewer for very short queries).
+
+    Returns:
+        np.ndarray: float32 cost per segment.
+    """
+    segments = max(1, min(segments, n))
+    segment = np.minimum(path_i * segments // max(n, 1), segments - 1)
+    sums = np.bincount(segment, weights=costs, minlength=segments)
+    counts = np.bincount(segment, minlength=segments)
+    return (sums / np.maximum(counts, 1)).astype(np.float32)
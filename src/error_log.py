@@ -0,0 +1,120 @@
+class FileError:
+    """
+    Structured record of one file that failed during a run.
+    """
+    __slots__ = ('path', 'stage', 'exc_type', 'message', 'elapsed')
+
+    def __init__(self, path, stage, exc_type, message, elapsed=0.0):
+        """
+        Args:
+            path (str): The file that failed.
+            stage (str): Where it failed (read, decode, compute, compare,
+                timeout, crash, memory).
+            exc_type (str): Exception class name.
+            message (str): Error message.
+            elapsed (float): Seconds spent on the file before it failed.
+        """
+        self.path = path
+        self.stage = stage
+        self.exc_type = exc_type
+        self.message = message
+        self.elapsed = elapsed
+
+    def as_dict(self):
+        """
+        Plain dict version (for logs/exports).
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __str__(self):
+        return f"{self.path} [{self.stage}] {self.exc_type}: {self.message}"
+
+
+# never: run to the end, count: abort after N failed files,
+# rate: abort when the share of failed files gets over X
+ABORT_POLICIES = ('never', 'count', 'rate')
+
+
+class ErrorLog:
+    """
+    Per-run log of failed files + the policy deciding when a run with too
+    many failures isn't worth continuing (wrong folder, unmounted share...).
+    """
+
+    def __init__(self, policy='never', max_errors=50, max_error_rate=0.25, min_files=20):
+        """
+        Args:
+            policy (str): One of ABORT_POLICIES.
+            max_errors (int): Failed files allowed with the 'count' policy.
+            max_error_rate (float): Failed share (0-1) allowed with the 'rate' policy.
+            min_files (int): Files processed before the rate is trusted.
+        """
+        if policy not in ABORT_POLICIES:
+            raise ValueError(f"Unknown abort policy: {policy}")
+        self.policy = policy
+        self.max_errors = max_errors
+        self.max_error_rate = max_error_rate
+        self.min_files = min_files
+        self.errors = []
+        self.processed = 0
+
+    def __len__(self):
+        return len(self.errors)
+
+    def record(self, error):
+        """
+        Adds a failed file.
+
+        Args:
+            error (FileError): The failure.
+        """
+        self.errors.append(error)
+        self.processed += 1
+
+    def record_success(self):
+        """
+        Counts a file that went through fine (for the error rate).
+        """
+        self.processed += 1
+
+    @property
+    def error_rate(self):
+        return len(self.errors) / self.processed if self.processed else 0.0
+
+    def abort_reason(self):
+        """
+        Checks the abort policy.
+
+        Returns:
+            str: Why the run should stop, or None to keep going.
+        """
+        if self.policy == 'count' and len(self.errors) >= self.max_errors:
+            return f"{len(self.errors)} files failed (limit {self.max_errors})"
+        if (self.policy == 'rate' and self.processed >= self.min_files
+                and self.error_rate > self.max_error_rate):
+            return (f"{self.error_rate:.0%} of files failed "
+                    f"(limit {self.max_error_rate:.0%})")
+        return None
+
+    def by_stage(self):
+        """
+        Number of failures per stage, e.g. {'decode': 3, 'timeout': 1}.
+        """
+        counts = {}
+        for error in self.errors:
+            counts[error.stage] = counts.get(error.stage, 0) + 1
+        return counts
+
+    def save(self, path):
+        """
+        Writes the log as CSV.
+
+        Args:
+            path (str): Output file.
+        """
+        import csv
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=FileError.__slots__)
+            writer.writeheader()
+            for error in self.errors:
+                writer.writerow(error.as_dict())
@@ -0,0 +1,128 @@
+import os
+import numpy as np
+
+# Supported chroma storage precisions
+PRECISIONS = ('float32', 'float16', 'uint8')
+
+
+class CompactFeatures:
+    """
+    Compact storage of one file's features for the lifetime of a run.
+    Chroma is bounded in [0, 1] so it is stored as float16 or uint8
+    (quantized to 1/255), MFCC frames as float16. The comparator only uses
+    the MFCC mean, which is kept exactly in float32.
+
+    Behaves like the read-only features dict (features['chroma'], 'mfcc' in
+    features) so the comparator works unchanged, arrays are expanded back to
+    float32 on access.
+    """
+    __slots__ = ('_chroma', 'mfcc_mean', '_mfcc', '_rms', 'beat_scale', 'sync', 'quality', 'precision')
+
+    def __init__(self, features, precision='uint8', keep_mfcc_frames=False):
+        """
+        Args:
+            features (dict): Features from FeatureExtractor.
+            precision (str): Chroma precision, one of PRECISIONS.
+            keep_mfcc_frames (bool): Keep the MFCC frames (float16) instead of only their mean.
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown feature precision: {precision}")
+        self.precision = precision
+
+        chroma = features.get('chroma')
+        if chroma is None:
+            self._chroma = None
+        elif precision == 'uint8':
+            self._chroma = np.round(np.clip(chroma, 0.0, 1.0) * 255).astype(np.uint8)
+        else:
+            self._chroma = np.asarray(chroma, dtype=precision)
+
+        mfcc = features.get('mfcc')
+        self.mfcc_mean = None if mfcc is None else np.mean(mfcc, axis=1).astype(np.float32)
+        self._mfcc = mfcc.astype(np.float16) if mfcc is not None and keep_mfcc_frames else None
+
+        rms = features.get('rms')
+        self._rms = None if rms is None else np.asarray(rms, dtype=np.float16)
+        self.beat_scale = features.get('beat_scale')  # Beat-synchronous features only
+        self.sync = features.get('sync')  # 'frame' or 'beat' sequences
+        self.quality = features.get('quality')  # Loudness/dynamics/bandwidth measurements
+
+    @property
+    def stored_chroma(self):
+        """
+        The chroma as stored (quantized for uint8), without the float32 copy
+        of features['chroma']. For scale invariant uses (normalized frames).
+        """
+        return self._chroma
+
+    def __getitem__(self, name):
+        if name == 'chroma' and self._chroma is not None:
+            if self.precision == 'uint8':
+                return self._chroma.astype(np.float32) / 255.0
+            return self._chroma.astype(np.float32)
+        if name == 'mfcc' and self.mfcc_mean is not None:
+            if self._mfcc is not None:
+                return self._mfcc.astype(np.float32)
+            # Single column, np.mean(axis=1) gives back the exact mean
+            return self.mfcc_mean[:, np.newaxis]
+        if name == 'rms' and self._rms is not None:
+            return self._rms.astype(np.float32)
+        if name == 'beat_scale' and self.beat_scale is not None:
+            return self.beat_scale
+        if name == 'sync' and self.sync is not None:
+            return self.sync
+        if name == 'quality' and self.quality is not None:
+            return self.quality
+        raise KeyError(name)
+
+    def __contains__(self, name):
+        return name in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        """
+        Names of the stored features.
+        """
+        stored = (('chroma', self._chroma), ('mfcc', self.mfcc_mean), ('rms', self._rms),
+                  ('beat_scale', self.beat_scale), ('sync', self.sync), ('quality', self.quality))
+        return [name for name, value in stored if value is not None]
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    @property
+    def nbytes(self):
+        """
+        Memory used by the stored arrays.
+        """
+        arrays = (self._chroma, self.mfcc_mean, self._mfcc, self._rms)
+        return sum(a.nbytes for a in arrays if a is not None)
+
+
+class ReferenceRecord:
+    """
+    One loaded reference (original) file, replaces the nested per-reference dict.
+    """
+    __slots__ = ('features', 'full_duration', 'path', 'hash')
+
+    def __init__(self, features, full_duration, path, feature_hash=None):
+        """
+        Args:
+            features (CompactFeatures or dict): The reference features.
+            full_duration (float): Full file duration in seconds.
+            path (str): Path to the file.
+            feature_hash (str, optional): Content hash for the score cache.
+        """
+        self.features = features
+        self.full_duration = full_duration
+        self.path = path
+        self.hash = feature_hash
+
+    @property
+    def name(self):
+        """
+        File name shown for the reference (follows renames).
+        """
+        return os.path.basename(self.path)
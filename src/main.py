@@ -1,18 +1,30 @@
 import sys
 import os
+import multiprocessing
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                             QPushButton, QLabel, QFileDialog, QProgressBar, QTableWidget,
                             QTableWidgetItem, QHeaderView, QGroupBox, QButtonGroup, 
-                            QRadioButton, QMessageBox, QMenu, QInputDialog, QComboBox)
+                            QRadioButton, QMessageBox, QMenu, QInputDialog, QComboBox,
+                            QCheckBox, QSpinBox)
 
 from PyQt5.QtGui import QColor
 from PyQt5.QtCore import Qt
-from runner import Runner
+from runner import Runner, Warmup
+from progress import WorkProgress
+from warmup import configure_jit_cache
 
 class ComparisonGUI(QMainWindow):
     # Constant for col names
     COLUMN_NAMES = ["Remastered", "Original", "Confidence",
-                   "Remaster Duration", "Original Duration"]
+                   "Original Duration", "Remastered Duration",
+                   "Loudness Δ", "Range Δ", "Crest Δ", "Bandwidth Δ"]
+    # Results store sort key of each column
+    SORT_KEYS = ('remastered', 'original', 'confidence', 'orig_duration', 'rem_duration',
+                 'loudness_delta', 'range_delta', 'crest_delta', 'bandwidth_delta')
+    # Quality delta columns: (first column, unit and format of each)
+    QUALITY_COLUMNS = (5, (("LU", "{:+.1f}"), ("LU", "{:+.1f}"), ("dB", "{:+.1f}"), ("Hz", "{:+.0f}")))
+    # Rows shown at once, the rest stays in the results store
+    PAGE_SIZE = 2000
     # Constant for determining min confidence level before determining if a match
     CONFIDENCE_THRESHOLD = 0.4
     
@@ -29,13 +41,24 @@ class ComparisonGUI(QMainWindow):
         self.original_files = []
         self.remastered_files = []
         self.init_ui()
-        self.results = []
+        self.results = []  # Result entries of the page on screen
+        self.store = None  # ResultsStore with all results of the last run
+        self.page = 0
+        self.sort_col, self.sort_order = 0, Qt.AscendingOrder
+        self._signals_connected = False
+        self.error_log = None  # ErrorLog of the last run (files that failed)
         self.runner = None
 
         self.table.setContextMenuPolicy(Qt.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self.context_menu)
         self.rename_action = None
 
+        # Load/JIT the audio stack in the background while folders are picked
+        self.status_label.setText("Loading audio engine...")
+        self.warmup = Warmup()
+        self.warmup.warmed_up.connect(self.on_warmed_up)
+        self.warmup.start()
+
     def init_ui(self):
         """
         Initializes the UI.
@@ -62,6 +85,33 @@ class ComparisonGUI(QMainWindow):
         self.selection_group.addButton(self.folder_rb)
         rb_layout.addWidget(self.file_rb)
         rb_layout.addWidget(self.folder_rb)
+        # Stop two remasters from claiming the same original
+        self.one_to_one_cb = QCheckBox("One-to-one matching")
+        rb_layout.addWidget(self.one_to_one_cb)
+        # Whole track in blocks instead of the first minute (slower, more accurate)
+        self.full_track_cb = QCheckBox("Full-track analysis")
+        rb_layout.addWidget(self.full_track_cb)
+        # One feature column per beat, robust to sped up/slowed down transfers
+        self.beat_sync_cb = QCheckBox("Beat-synchronous")
+        rb_layout.addWidget(self.beat_sync_cb)
+        # Loudness/dynamics/bandwidth change of each remaster vs its original
+        self.quality_cb = QCheckBox("Quality report")
+        rb_layout.addWidget(self.quality_cb)
+        # Pitch/tape-speed corrected remasters (chroma shifted by semitones)
+        self.key_shift_cb = QCheckBox("Allow key shifts")
+        rb_layout.addWidget(self.key_shift_cb)
+        # Decode in worker processes so a bad file can't hang/crash the app
+        self.isolate_cb = QCheckBox("Isolate bad files")
+        self.isolate_cb.setChecked(True)
+        rb_layout.addWidget(self.isolate_cb)
+        # When to give up on a run with too many unreadable files
+        self.abort_combo = QComboBox()
+        self.abort_combo.addItems(["Never abort", "Abort after N errors", "Abort if error rate over %"])
+        self.abort_combo.currentIndexChanged.connect(self.on_abort_policy_changed)
+        self.abort_spin = QSpinBox()
+        self.abort_spin.setEnabled(False)
+        rb_layout.addWidget(self.abort_combo)
+        rb_layout.addWidget(self.abort_spin)
         file_layout.addLayout(rb_layout)
 
         # Original files
@@ -129,21 +179,39 @@ class ComparisonGUI(QMainWindow):
         print("Down:", arrow_down, "Exists:", os.path.exists(arrow_down))
 
         
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(["Original", "Remastered", "Confidence", "Original Duration", "Remastered Duration"])
+        self.table.setColumnCount(len(self.COLUMN_NAMES))
+        self.table.setHorizontalHeaderLabels(self.COLUMN_NAMES)
         self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
         self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
-        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeToContents)
-        self.table.horizontalHeader().setSectionResizeMode(4, QHeaderView.ResizeToContents)
-        # sort in table
-        self.table.setSortingEnabled(True)
+        for col in range(2, len(self.COLUMN_NAMES)):
+            self.table.horizontalHeader().setSectionResizeMode(col, QHeaderView.ResizeToContents)
+        # Quality columns only show for runs that measured it
+        self._show_quality_columns(False)
+        # sort in the results store (the header only shows/changes the indicator)
+        self.table.setSortingEnabled(False)
         self.table.horizontalHeader().setSortIndicatorShown(True)
         self.table.horizontalHeader().setSectionsClickable(True)
         self.table.horizontalHeader().sortIndicatorChanged.connect(self.update_sort_indicator)
 
         layout.addWidget(self.table)
 
+        # Failed files (non-modal, filled while the run goes on)
+        self.errors_group = QGroupBox("Errors")
+        errors_layout = QVBoxLayout()
+        self.errors_table = QTableWidget(0, 5)
+        self.errors_table.setHorizontalHeaderLabels(["File", "Stage", "Type", "Message", "Time"])
+        self.errors_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.errors_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
+        self.errors_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.errors_table.setMaximumHeight(150)
+        errors_layout.addWidget(self.errors_table)
+        self.save_errors_btn = QPushButton("Save Error Log")
+        self.save_errors_btn.clicked.connect(self.save_error_log)
+        errors_layout.addWidget(self.save_errors_btn)
+        self.errors_group.setLayout(errors_layout)
+        self.errors_group.setVisible(False)
+        layout.addWidget(self.errors_group)
+
         # Disable header interactions
         header = self.table.horizontalHeader()
         header.setHighlightSections(False)
@@ -167,8 +235,22 @@ class ComparisonGUI(QMainWindow):
         self.start_btn.clicked.connect(self.start_comparison)
         self.refresh_btn = QPushButton("Refresh Table")
         self.refresh_btn.clicked.connect(self.refresh_table)
+        self.export_btn = QPushButton("Export CSV")
+        self.export_btn.clicked.connect(self.export_results)
+        self.export_btn.setEnabled(False)
+        self.prev_btn = QPushButton("<")
+        self.prev_btn.clicked.connect(lambda: self.change_page(-1))
+        self.prev_btn.setEnabled(False)
+        self.page_label = QLabel("Page 1/1")
+        self.next_btn = QPushButton(">")
+        self.next_btn.clicked.connect(lambda: self.change_page(1))
+        self.next_btn.setEnabled(False)
         btn_layout.addWidget(self.start_btn)
         btn_layout.addWidget(self.refresh_btn)
+        btn_layout.addWidget(self.export_btn)
+        btn_layout.addWidget(self.prev_btn)
+        btn_layout.addWidget(self.page_label)
+        btn_layout.addWidget(self.next_btn)
         layout.addLayout(btn_layout)
         
         main_widget.setLayout(layout)
@@ -188,16 +270,75 @@ class ComparisonGUI(QMainWindow):
             
             self.match_action = menu.addAction("Match Name")
             self.match_action.triggered.connect(lambda: self.match_name(item))
+
+            # Alternatives kept by the comparator (no recomputation needed)
+            result = self._result_for_row(item.row())
+            if result and result.get('candidates'):
+                rematch_menu = menu.addMenu("Rematch")
+                for candidate in result['candidates']:
+                    action = rematch_menu.addAction(
+                        f"{candidate['name']} ({candidate['similarity']:.2f})")
+                    action.setCheckable(True)
+                    action.setChecked(candidate['reference'] == result.get('reference_id'))
+                    action.triggered.connect(
+                        lambda _, r=result, c=candidate: self.rematch(r, c))
             
         menu.exec_(self.table.viewport().mapToGlobal(pos))
 
+    def _result_for_row(self, row):
+        """
+        Finds the result entry shown in a table row.
+
+        Args:
+            row (int): The table row.
+
+        Returns:
+            dict: The matching result entry or None.
+        """
+        item = self.table.item(row, 0)
+        if not item or not item.data(Qt.UserRole) or self.store is None:
+            return None
+        return self.store.get_by_path(item.data(Qt.UserRole))
+
+    def rematch(self, result, candidate):
+        """
+        Replaces the match of a result with one of its other candidates.
+
+        Args:
+            result (dict): The result entry to update.
+            candidate (dict): The chosen candidate from result['candidates'].
+        """
+        result['match'] = candidate['name']
+        result['reference_id'] = candidate['reference']
+        result['confidence'] = candidate['similarity']
+        result['orig_path'] = candidate['orig_path']
+        result['orig_duration'] = candidate['orig_duration']
+        from quality import DELTA_KEYS
+        for key in DELTA_KEYS:
+            result[key] = candidate.get(key)
+        from comparator import PARTIAL_COVERAGE
+        result['coverage'] = candidate.get('coverage')
+        result['timeline'] = candidate.get('timeline')
+        result['partial'] = bool(result['coverage'] is not None and result['coverage'] < PARTIAL_COVERAGE)
+        # User picked it explicitly so it's no longer ambiguous (or the assignment's pick)
+        result['ambiguous'] = False
+        result['reassigned'] = False
+        if candidate['orig_path'] and os.path.exists(candidate['orig_path']):
+            result['orig_file_size'] = os.path.getsize(candidate['orig_path'])
+        self.store.update(result)
+
+        header = self.table.horizontalHeader()
+        self._refresh_full_table(header.sortIndicatorSection(), header.sortIndicatorOrder())
+
     def match_name(self, item):
         """
         Matches the name of the selected cell to the name of the other.
         """
         row = item.row()
         col = item.column()
-        result = self.results[row]
+        result = self._result_for_row(row)
+        if not result:
+            return
         
         # Check confidence threshold (fail for bad matches)
         if result['confidence'] < self.CONFIDENCE_THRESHOLD:
@@ -243,17 +384,13 @@ class ComparisonGUI(QMainWindow):
                 
                 # Update records
                 if col == 0:
-                    self.results[row]['path'] = new_path
-                    self.results[row]['display_name'] = source_base
-                    self.table.item(row, 0).setText(source_base)
+                    self.store.rename_remastered(target_path, new_path)
                 else:
-                    self.results[row]['orig_path'] = new_path
-                    # Update the comparator reference
-                    if self.runner and hasattr(self.runner, 'comparator') and self.runner.comparator:
-                        original_name = os.path.basename(new_path)
-                        if original_name in self.runner.comparator.reference_features:
-                            self.runner.comparator.reference_features[original_name]['path'] = new_path
+                    self.store.rename_original(target_path, new_path)
+                    self._rename_reference(target_path, new_path)
 
+                header = self.table.horizontalHeader()
+                self._refresh_full_table(header.sortIndicatorSection(), header.sortIndicatorOrder())
                 QMessageBox.information(self, "Success", "File name matched successfully!")
                 
             except Exception as e:
@@ -276,21 +413,20 @@ class ComparisonGUI(QMainWindow):
         
         # Get current file information using the table item data
         current_path = ""
-        old_name = ""
         
         # Find the correct result entry based on file path from the table item
         table_item = self.table.item(row, col)
         if col == 0:  # Remastered
             current_path = table_item.data(Qt.UserRole)
             # Find the matching result entry
-            result_entry = next((r for r in self.results if r['path'] == current_path), None)
+            result_entry = self.store.get_by_path(current_path)
             if not result_entry:
                 QMessageBox.warning(self, "Error", "Couldn't find matching file data!")
                 return
         elif col == 1:  # Original
             current_path = table_item.data(Qt.UserRole)
             # Find the matching result entry based on og file path
-            result_entry = next((r for r in self.results if r.get('orig_path', '') == current_path), None)
+            result_entry = next(iter(self.store.find(orig_path=current_path)), None)
             if not result_entry:
                 QMessageBox.warning(self, "Error", "Couldn't find matching file data!")
                 return
@@ -329,29 +465,11 @@ class ComparisonGUI(QMainWindow):
             # Update all relevant records
             if col == 0:  # Renaming remastered file
                 # Update the found result entry with new path and display name
-                result_entry['path'] = new_path
-                result_entry['display_name'] = os.path.basename(new_path)
+                self.store.rename_remastered(current_path, new_path)
             else:  # Renaming original file
-                new_base_name = os.path.basename(new_path)
-                old_name = os.path.basename(current_path)
-                
-                # Update all matches across the results
-                for result in self.results:
-                    if result.get('orig_path', '') == current_path:
-                        result['orig_path'] = new_path
-                    if result['match'] == old_name:
-                        result['match'] = new_base_name
-                        result['orig_path'] = new_path
-
-                # Update comparator refs
-                if self.runner and self.runner.comparator:
-                    comparator = self.runner.comparator
-                    if old_name in comparator.reference_features:
-                        # Update all ref features with new path
-                        ref_data = comparator.reference_features[old_name]
-                        ref_data['path'] = new_path
-                        comparator.reference_features[new_base_name] = ref_data
-                        del comparator.reference_features[old_name]
+                # Update all matches across the results (indexed)
+                self.store.rename_original(current_path, new_path)
+                self._rename_reference(current_path, new_path)
 
             # Full table refresh + sort preservation
             self._refresh_full_table(sort_col, sort_order)
@@ -372,11 +490,23 @@ class ComparisonGUI(QMainWindow):
             if not os.path.exists(current_path) and os.path.exists(new_path):
                 self.refresh_table()
 
+    def _rename_reference(self, old_path, new_path):
+        """
+        Points the running comparator's reference at a renamed original
+        (its reference id stays the same).
+        """
+        comparator = self.runner.comparator if self.runner else None
+        if comparator is None:
+            return
+        ref_id = comparator.references.by_path(old_path)
+        if ref_id is not None:
+            comparator.references.rename(ref_id, new_path)
+
     def _validate_table_integrity(self):
         """
         Helper to ensure table rows match the file data (names).
         """
-        for row in range(self.table.rowCount()):
+        for row in range(min(self.table.rowCount(), len(self.results))):
             table_name = self.table.item(row, 0).text()
             data_name = os.path.basename(self.results[row]['path'])
             if table_name != data_name:
@@ -388,33 +518,73 @@ class ComparisonGUI(QMainWindow):
     def _refresh_full_table(self, sort_col, sort_order):
         """
         Helper to complete refresh with sort preservation.
-        Handles the core table refresh logic.
+        Reloads the current page from the results store and restores the selection.
 
         Args:
             sort_col (int): The column to sort by.
             sort_order (Qt.SortOrder): The order to sort by.
         """
-        # Store current selection and initialize a selected item
-        selected_row = self.table.currentRow()
-        selected_item = None
-        if 0 <= selected_row < len(self.results):
-            # Store both remastered and original paths for the selected row
-            selected_item = {
-                'remastered': self.results[selected_row]['path'],
-                'original': self.results[selected_row].get('orig_path', ''),
-                'column': self.table.currentColumn()
-            }
-        
-        # Re-sort the data first
-        self._run_sort(sort_col, sort_order)
-        
-        # Clear and rebuild table to refresh and stay synced
-        self.table.setSortingEnabled(False)
-        self.table.setRowCount(len(self.results))
+        # Store current selection (by file path, rows move when sorted)
+        current_item = self.table.currentItem()
+        selected = None
+        if current_item and current_item.column() in (0, 1):
+            selected = (current_item.data(Qt.UserRole), current_item.column())
+
+        self.sort_col, self.sort_order = sort_col, sort_order
+        self._load_page()
+
+        if selected:
+            for row in range(self.table.rowCount()):
+                item = self.table.item(row, selected[1])
+                if item and item.data(Qt.UserRole) == selected[0]:
+                    self.table.setCurrentCell(row, selected[1])
+                    break
+
+        # Apply visual sort indicators without triggering another reload
+        header = self.table.horizontalHeader()
+        header.blockSignals(True)
+        header.setSortIndicator(sort_col, sort_order)
+        header.blockSignals(False)
         
-        for row, result in enumerate(self.results):
+        # Force immediate UI update
+        self.table.viewport().update()
+        
+        # Validate table integrity after refresh
+        self._validate_table_integrity()
+
+    def _load_page(self):
+        """
+        Loads the current page of results from the store (sorted by SQL, not in memory)
+        and fills the table with it.
+        """
+        if self.store is None:
+            self.results = []
+        else:
+            total = self.store.count()
+            pages = max(1, -(-total // self.PAGE_SIZE))
+            self.page = min(self.page, pages - 1)
+            self.results = self.store.page(
+                order=self.SORT_KEYS[self.sort_col],
+                descending=self.sort_order == Qt.DescendingOrder,
+                limit=self.PAGE_SIZE,
+                offset=self.page * self.PAGE_SIZE
+            )
+            self.page_label.setText(f"Page {self.page + 1}/{pages}")
+            self.prev_btn.setEnabled(self.page > 0)
+            self.next_btn.setEnabled(self.page < pages - 1)
+        self._fill_table(self.results)
+
+    def _fill_table(self, rows):
+        """
+        Puts result entries in the table, in order.
+
+        Args:
+            rows (list): Result entries.
+        """
+        self.table.setRowCount(len(rows))
+        for row, result in enumerate(rows):
             # Remastered name - uses display name
-            remastered_name = result.get('display_name', os.path.basename(result['path']))
+            remastered_name = result.get('display_name') or os.path.basename(result['path'])
             remastered_item = QTableWidgetItem(remastered_name)
             remastered_item.setData(Qt.UserRole, result['path'])
             self.table.setItem(row, 0, remastered_item)
@@ -426,35 +596,33 @@ class ComparisonGUI(QMainWindow):
             self.table.setItem(row, 1, original_item)
             
             # Confidence
-            conf_item = QTableWidgetItem(f"{result['confidence']:.2f}")
-            conf_item.setBackground(self.confidence_color(result['confidence']))
-            self.table.setItem(row, 2, conf_item)
+            self.table.setItem(row, 2, self._confidence_item(result))
             
             # Durations
             self.table.setItem(row, 3, QTableWidgetItem(self.format_duration(result['orig_duration'])))
-            orig_duration = self.format_duration(result['rem_duration']) if result['rem_duration'] > 0 else "N/A"
-            self.table.setItem(row, 4, QTableWidgetItem(orig_duration))
+            self.table.setItem(row, 4, QTableWidgetItem(self.format_duration(result['rem_duration'])))
 
-        # Restore selection based on file path
-        if selected_item:
-            path_to_find = selected_item['remastered'] if selected_item['column'] == 0 else selected_item['original']
-            column_to_check = 0 if selected_item['column'] == 0 else 1
-            
-            for row in range(self.table.rowCount()):
-                if self.table.item(row, column_to_check).data(Qt.UserRole) == path_to_find:
-                    self.table.setCurrentCell(row, selected_item['column'])
-                    break
+            # Quality deltas (remaster - original), blank when not measured
+            first, formats = self.QUALITY_COLUMNS
+            for offset, (key, (unit, fmt)) in enumerate(zip(self.SORT_KEYS[first:], formats)):
+                value = result.get(key)
+                text = f"{fmt.format(value)} {unit}" if value is not None else ""
+                self.table.setItem(row, first + offset, QTableWidgetItem(text))
 
-        # Apply visual sort indicators
-        self.table.setSortingEnabled(True)
-        self.table.horizontalHeader().setSortIndicator(sort_col, sort_order)
-        self.table.sortByColumn(sort_col, sort_order)
-        
-        # Force immediate UI update
-        self.table.viewport().update()
-        
-        # Validate table integrity after refresh
-        self._validate_table_integrity()
+    def _show_quality_columns(self, visible):
+        first, formats = self.QUALITY_COLUMNS
+        for col in range(first, first + len(formats)):
+            self.table.setColumnHidden(col, not visible)
+
+    def change_page(self, step):
+        """
+        Shows the previous/next page of results.
+
+        Args:
+            step (int): -1 or 1.
+        """
+        self.page = max(0, self.page + step)
+        self._load_page()
 
     def refresh_table(self):
         """
@@ -472,6 +640,7 @@ class ComparisonGUI(QMainWindow):
         missing_files = []
         
         # First pass: identify missing files and directories to scan
+        # (only the page on screen, other pages are checked when shown)
         for result in self.results:
             if not os.path.exists(result['path']):
                 dirs_to_scan.add(os.path.dirname(result['path']))
@@ -517,6 +686,9 @@ class ComparisonGUI(QMainWindow):
                         result['match'] = os.path.splitext(os.path.basename(new_path))[0]
                         updated_files = True
 
+        if updated_files:
+            self.store.update_many([result for _, result in missing_files])
+
         # Refresh the table with updated paths
         self._refresh_full_table(sort_col, sort_order)
 
@@ -528,28 +700,6 @@ class ComparisonGUI(QMainWindow):
             QMessageBox.information(self, "Refresh Complete", 
                                 "Table has been refreshed with current file states.")
 
-    def _run_sort(self, col, order):
-        """
-        Helper to sort the underlying results list using proper keys to
-        ensure table displays the correct, current data.
-
-        Args: 
-            col (int): The column to sort by.
-            order (Qt.SortOrder): The order to sort by (ascending or descending).
-        """
-        reverse = order == Qt.DescendingOrder
-        
-        if col == 0:  # Original
-            self.results.sort(key=lambda x: os.path.basename(x.get('orig_path', '')), reverse=reverse)
-        elif col == 1:  # Remastered
-            self.results.sort(key=lambda x: os.path.basename(x['path']), reverse=reverse)
-        elif col == 2:  # Confidence
-            self.results.sort(key=lambda x: x['confidence'], reverse=reverse)
-        elif col == 3:  # Original Duration
-            self.results.sort(key=lambda x: x['orig_duration'], reverse=reverse)
-        elif col == 4:  # Remastered Duration
-            self.results.sort(key=lambda x: x['rem_duration'], reverse=reverse)
-
     def select_files(self, is_original=True):
         """
         Selects files from selected files/folders to be used for comparison.
@@ -643,14 +793,68 @@ class ComparisonGUI(QMainWindow):
         self.progress.setValue(0)
         self.status_label.setText("Starting comparison...")
         self.table.setRowCount(0)
+        self.errors_table.setRowCount(0)
+        self.errors_group.setVisible(False)
         
-        self.runner = Runner(self.original_files, self.remastered_files)
+        self.results = []
+        self.export_btn.setEnabled(False)
+        # The run writes to a store of its own, the last run's goes
+        self._discard_store()
+        
+        policy = ('never', 'count', 'rate')[self.abort_combo.currentIndex()]
+        self.runner = Runner(self.original_files, self.remastered_files,
+                             one_to_one=self.one_to_one_cb.isChecked(),
+                             full_track=self.full_track_cb.isChecked(),
+                             isolate=self.isolate_cb.isChecked(),
+                             key_invariant=self.key_shift_cb.isChecked(),
+                             beat_sync=self.beat_sync_cb.isChecked(),
+                             quality=self.quality_cb.isChecked(),
+                             abort_policy=policy,
+                             max_errors=self.abort_spin.value(),
+                             max_error_rate=self.abort_spin.value() / 100)
+        self.error_log = self.runner.error_log
+        self._show_quality_columns(self.runner.quality)
+
+        # Offer to continue an interrupted run of the same files
+        if self.runner.job_checkpoint().exists():
+            reply = QMessageBox.question(
+                self,
+                "Resume Run",
+                "An unfinished run with these files was found.\n"
+                "Resume it and skip the files already processed?",
+                QMessageBox.Yes | QMessageBox.No
+            )
+            self.runner.resume = reply == QMessageBox.Yes
         self.runner.progress_updated.connect(self.update_progress)
+        self.runner.throughput_updated.connect(self.update_throughput)
         self.runner.matches_found.connect(self.show_results)
         self.runner.error_occurred.connect(self.show_error)
+        self.runner.file_failed.connect(self.on_file_failed)
         self.runner.finished.connect(self.on_runner_finished)
         self.runner.start()
 
+    def _discard_store(self):
+        """
+        Deletes the store of the results shown (new run, app closed).
+        """
+        if self.store is not None:
+            self.table.setRowCount(0)
+            self.results = []
+            self.store.delete()
+            self.store = None
+
+    def on_warmed_up(self, elapsed):
+        """
+        Marks the app ready once the background warm-up is done.
+
+        Args:
+            elapsed (float): Seconds the warm-up took (-1 if it failed).
+        """
+        if elapsed >= 0:
+            print(f"Audio engine warmed up in {elapsed:.2f}s")
+        if self.runner is None:
+            self.status_label.setText("Ready")
+
     def update_progress(self, value, message):
         """
         Updates the progress bar and status label.
@@ -662,16 +866,89 @@ class ComparisonGUI(QMainWindow):
         self.progress.setValue(value)
         self.status_label.setText(message)
 
+    def update_throughput(self, stats):
+        """
+        Shows the rates and time left per stage as the progress bar's tooltip.
+
+        Args:
+            stats (dict): WorkProgress.snapshot() of the runner.
+        """
+        lines = []
+        for name, stage in stats['stages'].items():
+            line = f"{name.capitalize()}: {stage['files_done']}/{stage['files_total']} files"
+            if stage['files_per_second'] is not None:
+                line += (f", {stage['files_per_second']:.1f} files/s, "
+                         f"{stage['audio_seconds_per_second']:.0f} s of audio/s")
+            if stage['seconds_left']:
+                line += f", {WorkProgress.format_time(stage['seconds_left'])} left"
+            lines.append(line)
+        lines.append(f"Elapsed: {WorkProgress.format_time(stats['elapsed'])}")
+        self.progress.setToolTip("\n".join(lines))
+
     def show_error(self, error_msg):
         """
-        Shows error message and stops the runner.
+        Shows a run-level error (the runner has already stopped).
+        Non-modal so results that came in stay usable.
 
         Args: 
             error_msg (str): The error message to display.
         """
-        QMessageBox.critical(self, "Error", error_msg)
-        if self.runner:
-            self.runner.stop()
+        box = QMessageBox(QMessageBox.Critical, "Error", error_msg, QMessageBox.Ok, self)
+        box.setModal(False)
+        box.show()
+        self.status_label.setText(error_msg.splitlines()[0])
+
+    def on_file_failed(self, error):
+        """
+        Adds a failed file to the error panel without interrupting the run.
+
+        Args:
+            error (FileError): What failed and where.
+        """
+        row = self.errors_table.rowCount()
+        self.errors_table.insertRow(row)
+        file_item = QTableWidgetItem(os.path.basename(error.path))
+        file_item.setToolTip(error.path)
+        self.errors_table.setItem(row, 0, file_item)
+        self.errors_table.setItem(row, 1, QTableWidgetItem(error.stage))
+        self.errors_table.setItem(row, 2, QTableWidgetItem(error.exc_type))
+        message_item = QTableWidgetItem(error.message)
+        message_item.setToolTip(error.message)
+        self.errors_table.setItem(row, 3, message_item)
+        self.errors_table.setItem(row, 4, QTableWidgetItem(f"{error.elapsed:.1f}s"))
+        self.errors_group.setTitle(f"Errors ({row + 1})")
+        self.errors_group.setVisible(True)
+
+    def on_abort_policy_changed(self, index):
+        """
+        Switches the abort value between an error count and a percentage.
+
+        Args:
+            index (int): 0 never, 1 after N errors, 2 error rate.
+        """
+        self.abort_spin.setEnabled(index != 0)
+        if index == 1:
+            self.abort_spin.setRange(1, 100000)
+            self.abort_spin.setSuffix(" errors")
+            self.abort_spin.setValue(50)
+        elif index == 2:
+            self.abort_spin.setRange(1, 100)
+            self.abort_spin.setSuffix(" %")
+            self.abort_spin.setValue(25)
+
+    def save_error_log(self):
+        """
+        Saves the failed files of the last run as CSV.
+        """
+        if not self.error_log or not len(self.error_log):
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Save Error Log", "errors.csv", "CSV Files (*.csv)")
+        if not path:
+            return
+        try:
+            self.error_log.save(path)
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Could not save the error log:\n{str(e)}")
 
     def on_runner_finished(self):
         """
@@ -682,132 +959,88 @@ class ComparisonGUI(QMainWindow):
         self.orig_btn.setEnabled(True)
         self.remastered_btn.setEnabled(True)
         self.refresh_btn.setEnabled(True)
+        if self.runner.results_store not in (None, self.store):
+            # Run failed before it had results to show
+            self.runner.results_store.delete()
         self.runner = None
 
-    def show_results(self, results):
+    def closeEvent(self, event):
+        """
+        Stops a running comparison and waits for the background threads
+        (runner, warm-up) so none is destroyed while it still runs, then
+        deletes the results stores (nothing shows them anymore).
+        """
+        if self.runner is not None:
+            self.runner.stop()
+            self.runner.wait()
+            if self.runner.results_store not in (None, self.store):
+                self.runner.results_store.delete()
+        if self.warmup.isRunning():
+            # JIT compilation can't be interrupted, it finishes in a few seconds
+            self.status_label.setText("Closing...")
+            self.warmup.wait()
+        self._discard_store()
+        super().closeEvent(event)
+
+    def show_results(self, store):
         """
         Show the results of the comparison in the table.
+        The runner wrote them to its results store, the table shows one
+        page of it at a time.
 
         Args: 
-            results (list): The results of the comparison.
+            store (ResultsStore): The run's results.
         """
-        # Store results and initialize table
-        self.results = results.copy()
-        self.table.setRowCount(len(self.results))
-        
-        # Temporarily disable sorting to populate data
-        self.table.setSortingEnabled(False)
-        
-        # Populate table data
-        for row, result in enumerate(self.results):
-            # Store file sizes for both original and remastered files
-            if result.get('orig_path') and os.path.exists(result['orig_path']):
-                result['orig_file_size'] = os.path.getsize(result['orig_path'])
-            if os.path.exists(result['path']):
-                result['file_size'] = os.path.getsize(result['path'])
-            
-            # Original name with file path reference
-            original_name = os.path.basename(result.get('orig_path', '')) if result.get('orig_path') else result['match']
-            original_item = QTableWidgetItem(original_name)
-            original_item.setData(Qt.UserRole, result.get('orig_path', ''))
-            self.table.setItem(row, 0, original_item)
-            
-            # Remastered match with file path reference
-            remastered_name = result.get('display_name', os.path.basename(result['path']))
-            remastered_item = QTableWidgetItem(remastered_name)
-            remastered_item.setData(Qt.UserRole, result['path'])
-            self.table.setItem(row, 1, remastered_item)
-            
-            # Confidence with color coding
-            conf_item = QTableWidgetItem(f"{result['confidence']:.2f}")
-            conf_item.setBackground(self.confidence_color(result['confidence']))
-            self.table.setItem(row, 2, conf_item)
-            
-            # Durations
-            orig_duration = self.format_duration(result['orig_duration']) if result['orig_duration'] > 0 else "N/A"
-            self.table.setItem(row, 3, QTableWidgetItem(orig_duration))
-            self.table.setItem(row, 4, QTableWidgetItem(self.format_duration(result['rem_duration'])))
+        self.store = store
 
-        # Re-enable sorting
-        self.table.setSortingEnabled(True)
+        # Default sort by Remastered (column 0) ascending
+        self.page = 0
+        self._refresh_full_table(0, Qt.AscendingOrder)
+        self.export_btn.setEnabled(bool(self.results))
         
-        # Set default sort by Original (column 0) ascending
-        self.table.horizontalHeader().setSortIndicator(0, Qt.AscendingOrder)
-        self.table.sortByColumn(0, Qt.AscendingOrder)
+        # Connect interaction signals (once)
+        if not self._signals_connected:
+            self.table.cellDoubleClicked.connect(self.on_cell_double_clicked)
+            self.table.cellClicked.connect(self.on_cell_clicked)
+            self._signals_connected = True
         
-        # Connect interaction signals
-        self.table.cellDoubleClicked.connect(self.on_cell_double_clicked)
-        self.table.cellClicked.connect(self.on_cell_clicked)
-        
-        # Update status
-        match_count = len([r for r in self.results if r['confidence'] > self.CONFIDENCE_THRESHOLD])
-        self.status_label.setText(f"Found {match_count} matches out of {len(results)} files")
+        # Update status (indexed counts, not a scan)
+        total = self.store.count() if self.store else 0
+        match_count = self.store.count(min_confidence=self.CONFIDENCE_THRESHOLD) if self.store else 0
+        ambiguous_count = self.store.count(ambiguous=True) if self.store else 0
+        status = f"Found {match_count} matches out of {total} files"
+        if ambiguous_count:
+            status += f" ({ambiguous_count} ambiguous)"
+        if self.error_log and len(self.error_log):
+            status += f", {len(self.error_log)} failed"
+        self.status_label.setText(status)
 
     def update_sort_indicator(self, index, order):
         """
-        Handles column sorting and updates the table display with refreshed, sorted data.
+        Handles column sorting: the store returns the rows in the new order.
 
         Args:
             index (int): The index of the column to sort by.
             order (Qt.SortOrder): The order to sort by (ascending or descending).
         """
-        # Run the sort
-        self._run_sort(index, order)
-
-        # Get current selection before refresh
-        current_item = self.table.currentItem()
-        current_path = None
-        if current_item and current_item.column() in (0, 1):
-            current_path = current_item.data(Qt.UserRole)
-
-        # Update the table display
-        self.table.blockSignals(True)
-        self.table.setSortingEnabled(False)
-        
-        # Store the sorted results order
-        sorted_results = self.results.copy()
-        
-        for row, result in enumerate(sorted_results):
-            # Update remastered col
-            remastered_name = result.get('display_name', os.path.basename(result['path']))
-            remastered_item = QTableWidgetItem(remastered_name)
-            remastered_item.setData(Qt.UserRole, result['path'])
-            self.table.setItem(row, 0, remastered_item)
-            
-            # Update original col
-            original_name = os.path.basename(result.get('orig_path', '')) if result.get('orig_path') else result['match']
-            original_item = QTableWidgetItem(original_name)
-            original_item.setData(Qt.UserRole, result.get('orig_path', ''))
-            self.table.setItem(row, 1, original_item)
-            
-            # Update confidence col
-            conf_item = QTableWidgetItem(f"{result['confidence']:.2f}")
-            conf_item.setBackground(self.confidence_color(result['confidence']))
-            self.table.setItem(row, 2, conf_item)
-            
-            # Update durations cols
-            self.table.setItem(row, 3, QTableWidgetItem(self.format_duration(result['orig_duration'])))
-            orig_duration = self.format_duration(result['rem_duration']) if result['rem_duration'] > 0 else "N/A"
-            self.table.setItem(row, 4, QTableWidgetItem(orig_duration))
-
-        # Update the results list to match the new sort order
-        self.results = sorted_results
+        self.page = 0
+        self._refresh_full_table(index, order)
 
-        # Restore selection if we had one
-        if current_path:
-            for row in range(self.table.rowCount()):
-                for col in (0, 1):
-                    item = self.table.item(row, col)
-                    if item and item.data(Qt.UserRole) == current_path:
-                        self.table.setCurrentCell(row, col)
-                        break
-        
-        self.table.setSortingEnabled(True)
-        self.table.horizontalHeader().setSortIndicator(index, order)
-        self.table.blockSignals(False)
-        
-        # Force an immediate UI update
-        self.table.viewport().update()
+    def export_results(self):
+        """
+        Exports all results (every page) as CSV.
+        """
+        if self.store is None or not self.store.count():
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Export Results", "results.csv", "CSV Files (*.csv)")
+        if not path:
+            return
+        try:
+            rows = self.store.export_csv(path, self.SORT_KEYS[self.sort_col],
+                                         self.sort_order == Qt.DescendingOrder)
+            self.status_label.setText(f"Exported {rows} results to {path}")
+        except Exception as e:
+            QMessageBox.warning(self, "Error", f"Could not export results:\n{str(e)}")
 
     def on_cell_clicked(self, row, col):
         """
@@ -874,6 +1107,40 @@ class ComparisonGUI(QMainWindow):
             QMessageBox.warning(None, "Open Error", 
                               f"Could not open file:\n{path}\nError: {str(e)}")
 
+    def _confidence_item(self, result):
+        """
+        Builds the color coded confidence cell, flagging ambiguous, partial and
+        reassigned (one-to-one) matches.
+
+        Args:
+            result (dict): The result entry.
+
+        Returns:
+            QTableWidgetItem: The confidence cell.
+        """
+        text = f"{result['confidence']:.2f}"
+        if result.get('ambiguous'):
+            text += " ?"
+        if result.get('partial'):
+            text += " ~"
+        if result.get('reassigned'):
+            text += " *"
+        conf_item = QTableWidgetItem(text)
+        conf_item.setBackground(self.confidence_color(result['confidence']))
+        tips = []
+        if result.get('ambiguous'):
+            tips.append(f"Ambiguous: only {result.get('margin', 0):.3f} ahead of the "
+                        "next candidate (right click -> Rematch)")
+        if result.get('partial'):
+            tips.append(f"Partial: only {result.get('coverage', 0):.0%} of the track matches "
+                        "the original (edit or extended version?)")
+        if result.get('reassigned'):
+            tips.append("Reassigned by the one-to-one assignment: its best match "
+                        "was given to another remaster")
+        if tips:
+            conf_item.setToolTip("\n".join(tips))
+        return conf_item
+
     # Color for different tiers of confidence
     def confidence_color(self, confidence):
         if confidence >= 0.7:
@@ -896,13 +1163,17 @@ class ComparisonGUI(QMainWindow):
         Returns:
             str: The duration in mm:ss format.
         """
-        if seconds <= 0:
+        if seconds is None or not seconds > 0:
             return "N/A"
         minutes = int(seconds // 60)
         seconds = int(seconds % 60)
         return f"{minutes:02d}:{seconds:02d}"
 
 if __name__ == '__main__':
+    # Worker processes re-enter the frozen exe, let them through
+    multiprocessing.freeze_support()
+    # Before anything imports numba (persistent JIT cache, also when frozen)
+    configure_jit_cache()
     app = QApplication(sys.argv)
     window = ComparisonGUI()
     window.show()
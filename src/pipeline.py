@@ -0,0 +1,190 @@
+import io
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Marks the end of the stream between stages
+_DONE = object()
+
+
+class AudioPipeline:
+    """
+    Bounded producer/consumer pipeline for audio analysis.
+    Overlaps disk/network reads with decoding and feature extraction so the
+    CPU isn't idle while the next file is read (slow network shares).
+
+    Stages (each connected by a bounded queue, order is preserved):
+        read    -> thread pool prefetching the raw bytes of upcoming files
+        decode  -> decode(path, source) turns the bytes into a payload
+        compute -> compute(path, payload) turns the payload into features
+
+    Iterating the pipeline yields one dict per input path:
+        {'path', 'features', 'full_duration', 'error', 'stage', 'exc_type', 'elapsed'}
+    """
+
+    def __init__(self, paths, decode, compute, prefetch=4, queue_size=2,
+                 io_workers=2, prefetch_limit=64 * 1024 * 1024):
+        """
+        Args:
+            paths (list): Audio file paths to process (in order).
+            decode (callable): decode(path, source) -> (payload, full_duration).
+                source is a BytesIO of the prefetched file, or None when
+                the file wasn't prefetched (too big/read failed).
+            compute (callable): compute(path, payload) -> features.
+            prefetch (int): Max number of files read ahead of the decoder.
+            queue_size (int): Max items waiting between decode and compute.
+            io_workers (int): Number of threads reading files.
+            prefetch_limit (int): Files bigger than this (bytes) aren't read
+                into memory, the decoder just reads them from the path.
+        """
+        self.paths = list(paths)
+        self.decode = decode
+        self.compute = compute
+        self.prefetch_limit = prefetch_limit
+
+        self._stop = threading.Event()
+        self._io_pool = ThreadPoolExecutor(max_workers=io_workers,
+                                           thread_name_prefix="audio-io")
+        self._raw = queue.Queue(maxsize=max(1, prefetch))
+        self._decoded = queue.Queue(maxsize=max(1, queue_size))
+        self._out = queue.Queue(maxsize=max(1, queue_size))
+        self._threads = [
+            threading.Thread(target=self._feed, daemon=True),
+            threading.Thread(target=self._decode_stage, daemon=True),
+            threading.Thread(target=self._compute_stage, daemon=True),
+        ]
+        self._started = False
+
+    def __iter__(self):
+        if not self._started:
+            self.start()
+        while True:
+            item = self._get(self._out)
+            if item is _DONE or item is None:
+                break
+            yield item
+
+    def __len__(self):
+        return len(self.paths)
+
+    def start(self):
+        """
+        Starts all the stage threads.
+        """
+        self._started = True
+        for thread in self._threads:
+            thread.start()
+
+    def close(self):
+        """
+        Stops all stages (used when the runner is stopped mid-way).
+        Pending reads are dropped, items in flight are discarded.
+        """
+        self._stop.set()
+        # Unblock any stage waiting on a full queue
+        for q in (self._raw, self._decoded, self._out):
+            try:
+                while True:
+                    q.get_nowait()
+            except queue.Empty:
+                pass
+        self._io_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _read(self, path):
+        """
+        I/O stage: read the raw file bytes into memory.
+
+        Returns:
+            BytesIO or None: The file contents, None if not prefetched.
+        """
+        if os.path.getsize(path) > self.prefetch_limit:
+            return None
+        with open(path, 'rb') as f:
+            return io.BytesIO(f.read())
+
+    def _feed(self):
+        """
+        Submits reads in order. The bounded raw queue limits read-ahead.
+        """
+        for path in self.paths:
+            if self._stop.is_set():
+                return
+            self._put(self._raw, (path, self._io_pool.submit(self._read, path)))
+        self._put(self._raw, _DONE)
+
+    def _decode_stage(self):
+        while not self._stop.is_set():
+            item = self._get(self._raw)
+            if item is _DONE or item is None:
+                self._put(self._decoded, _DONE)
+                return
+            path, future = item
+            try:
+                source = future.result()
+            except Exception as e:
+                # Unreadable bytes, let the decoder try the path directly
+                print(f"Prefetch failed for {path}: {str(e)}")
+                source = None
+            started = time.perf_counter()
+            try:
+                payload, full_duration = self.decode(path, source)
+                self._put(self._decoded, (path, payload, full_duration, None,
+                                          time.perf_counter() - started))
+            except Exception as e:
+                self._put(self._decoded, (path, None, 0, ('decode', e),
+                                          time.perf_counter() - started))
+            finally:
+                source = None
+
+    def _compute_stage(self):
+        while not self._stop.is_set():
+            item = self._get(self._decoded)
+            if item is _DONE or item is None:
+                self._put(self._out, _DONE)
+                return
+            path, payload, full_duration, failure, elapsed = item
+            result = {
+                'path': path,
+                'features': None,
+                'full_duration': full_duration,
+                'error': None,
+                'stage': None,
+                'exc_type': None,
+                'elapsed': elapsed
+            }
+            started = time.perf_counter()
+            if not failure:
+                try:
+                    result['features'] = self.compute(path, payload)
+                except Exception as e:
+                    failure = ('compute', e)
+            if failure:
+                result['stage'], result['error'] = failure[0], str(failure[1])
+                result['exc_type'] = type(failure[1]).__name__
+            result['elapsed'] += time.perf_counter() - started
+            payload = None
+            self._put(self._out, result)
+
+    def _put(self, q, item):
+        """
+        Blocking put that gives up once the pipeline is stopped.
+        """
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q):
+        """
+        Blocking get that gives up (returns None) once the pipeline is stopped.
+        """
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
@@ -0,0 +1,282 @@
+import sys
+import json
+import time
+from collections import deque
+
+# Rates are moving averages over the last this many finished files
+RATE_WINDOW = 32
+# ... and over at least this many seconds, files finishing in bursts (a
+# batch compared at once) are measured against the time before the burst
+RATE_MIN_SECONDS = 10.0
+# Files a stage needs before it has a rate (parallel workers finish in bursts)
+MIN_RATE_FILES = 4
+# Seconds between lines of the progress log (the last line is always written)
+LOG_INTERVAL = 1.0
+
+
+class Throughput:
+    """
+    Moving average throughput of one stage over its last RATE_WINDOW
+    finished files: files/s, audio seconds/s (analysed audio) and work/s
+    (estimated work, for projecting the time left). Measured from the
+    first finished file, so worker start-up isn't counted (from begin()
+    when that's called), up to now while the stage runs (a stall slows the
+    rates down) and up to its last file once it's over.
+    """
+
+    def __init__(self, window=RATE_WINDOW, min_seconds=RATE_MIN_SECONDS):
+        # Running totals (time, files, audio seconds, work) after each finished file
+        self._samples = deque()
+        self.window = window
+        self.min_seconds = min_seconds
+        self.files = 0
+        self.audio_seconds = 0.0
+        self.work = 0.0
+        self.running = True
+
+    def begin(self):
+        """
+        Measures from now instead of from the first finished file (stages
+        whose files only finish at the end of each batch).
+        """
+        if not self._samples:
+            self._samples.append((time.perf_counter(), self.files, self.audio_seconds, self.work))
+
+    def add(self, audio_seconds=0.0, work=0.0):
+        """
+        Records one finished file.
+        """
+        self.files += 1
+        self.audio_seconds += audio_seconds
+        self.work += work
+        now = time.perf_counter()
+        self._samples.append((now, self.files, self.audio_seconds, self.work))
+        # Drop the oldest while the window still holds enough files and time without it
+        while len(self._samples) > self.window + 1 and now - self._samples[1][0] >= self.min_seconds:
+            self._samples.popleft()
+
+    def rates(self):
+        """
+        Returns:
+            tuple: (files/s, audio seconds/s, work/s), None before
+            MIN_RATE_FILES files finished.
+        """
+        if self.files < MIN_RATE_FILES or len(self._samples) < 2:
+            return None
+        first, last = self._samples[0], self._samples[-1]
+        elapsed = max((time.perf_counter() if self.running else last[0]) - first[0], 1e-6)
+        return tuple((end - start) / elapsed for start, end in zip(first[1:], last[1:]))
+
+
+class _Stage:
+    __slots__ = ('work', 'files_total', 'files_done', 'resumed', 'finished', 'throughput')
+
+    def __init__(self, work, done_files):
+        self.work = work
+        self.files_total = done_files + len(work)
+        self.files_done = done_files
+        self.resumed = done_files  # Counted at the average work
+        self.finished = 0.0  # Work of the files finished in this run
+        self.throughput = Throughput()
+
+    @property
+    def done(self):
+        return self.finished + self.resumed * self.work.average()
+
+    @property
+    def total(self):
+        # Estimates still coming in (background probes) move it a little
+        return self.resumed * self.work.average() + self.work.total()
+
+
+class WorkProgress:
+    """
+    Progress of a run by estimated work instead of file count (one live
+    album counts for many singles). Stages (e.g. references, then
+    remasters) are weighted by their work instead of getting a fixed share
+    of the bar each. Keeps moving average throughput per stage and projects
+    the time left from the work still to do at those rates. Stages cost
+    different things per unit of work (remasters are also compared against
+    every reference), so a stage without a rate of its own leaves the time
+    left unknown instead of borrowing another stage's.
+    """
+
+    def __init__(self):
+        self.stages = {}  # Name -> stage, in run order
+        self.current = None
+        self.started = time.perf_counter()
+
+    def add_stage(self, name, work, done_files=0):
+        """
+        Args:
+            name (str): Stage name, e.g. 'references'.
+            work (scheduler.WorkEstimates): Estimated work of the files
+                still to do (probed in the background).
+            done_files (int): Files of the stage done earlier (resumed),
+                counted at the average work.
+        """
+        self.stages[name] = _Stage(work, done_files)
+        if self.current is None:
+            self.current = name
+
+    def start(self, name):
+        """
+        Makes name the stage finished files are counted in, the rates of
+        the one before stop and its rates are measured from now.
+        """
+        if self.current != name:
+            self.finish()
+        self.current = name
+        self.stages[name].throughput.begin()
+
+    def finish(self):
+        """
+        Stops the current stage's rates (nothing left to do in it).
+        """
+        if self.current in self.stages:
+            self.stages[self.current].throughput.running = False
+
+    def work(self, name):
+        """
+        WorkEstimates of the stage's files.
+        """
+        return self.stages[name].work
+
+    def close(self):
+        """
+        Stops the header probes still running for any stage.
+        """
+        for stage in self.stages.values():
+            stage.work.close()
+
+    def file_done(self, path, audio_seconds=0.0):
+        """
+        Records a finished (or failed) file of the current stage.
+
+        Args:
+            path (str): The file.
+            audio_seconds (float): Audio analysed (0 when it failed).
+        """
+        stage = self.stages[self.current]
+        work = stage.work.get(path, 0)
+        stage.files_done += 1
+        stage.finished += work
+        stage.throughput.add(audio_seconds, work)
+
+    def fraction(self, name=None):
+        """
+        Share of the work done (0-1), of the whole run or of one stage.
+        """
+        stages = [self.stages[name]] if name else self.stages.values()
+        total = sum(s.total for s in stages)
+        return min(1.0, sum(s.done for s in stages) / total) if total else 1.0
+
+    def time_left(self, name=None):
+        """
+        Seconds left for the run (or one stage), None while a stage with
+        work left has no rate of its own yet.
+        """
+        names = list(self.stages)
+        first = names.index(self.current) if self.current in names else 0
+        left = 0.0
+        for stage_name in (names[first:] if name is None else [name]):
+            stage = self.stages[stage_name]
+            rates = stage.throughput.rates()
+            remaining = max(0.0, stage.total - stage.done)
+            if not remaining:
+                continue
+            if not rates or rates[2] <= 0:
+                return None
+            left += remaining / rates[2]
+        return left
+
+    def describe(self):
+        """
+        E.g. " - 3.2 files/s, 190x realtime, about 2:05 left" for the current
+        stage, "about 0:40 left for references" while a later stage has no
+        rate yet, only the rates while not even the current stage's time is
+        known (e.g. no work estimates yet). Empty before it has a rate.
+        """
+        stage = self.stages.get(self.current)
+        rates = stage.throughput.rates() if stage else None
+        if rates is None:
+            return ""
+        description = f" - {rates[0]:.1f} files/s, {rates[1]:.0f}x realtime"
+        left = self.time_left()
+        if left is not None:
+            return f"{description}, about {self.format_time(left)} left"
+        left = self.time_left(self.current)
+        if left is not None:
+            return f"{description}, about {self.format_time(left)} left for {self.current}"
+        return description
+
+    def snapshot(self):
+        """
+        Machine readable state (e.g. a line of the progress log).
+
+        Returns:
+            dict: Overall and per stage progress, rates and time left.
+        """
+        def seconds(value):
+            return None if value is None else round(value, 1)
+
+        stages = {}
+        for name, stage in self.stages.items():
+            rates = stage.throughput.rates() or (None, None, None)
+            stages[name] = {
+                'files_done': stage.files_done,
+                'files_total': stage.files_total,
+                'percent': round(self.fraction(name) * 100, 1),
+                'files_per_second': None if rates[0] is None else round(rates[0], 3),
+                'audio_seconds_per_second': None if rates[1] is None else round(rates[1], 1),
+                'seconds_left': seconds(self.time_left(name)),
+            }
+        return {
+            'time': round(time.time(), 3),
+            'elapsed': seconds(time.perf_counter() - self.started),
+            'stage': self.current,
+            'percent': round(self.fraction() * 100, 1),
+            'seconds_left': seconds(self.time_left()),
+            'stages': stages,
+        }
+
+    @staticmethod
+    def format_time(seconds):
+        """
+        Seconds -> "m:ss" (or "h:mm:ss").
+        """
+        minutes, seconds = divmod(int(seconds + 0.5), 60)
+        hours, minutes = divmod(minutes, 60)
+        return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class ProgressLog:
+    """
+    Progress snapshots as JSON lines for headless runs (capacity planning,
+    monitoring), at most one per LOG_INTERVAL.
+    """
+
+    def __init__(self, path, interval=LOG_INTERVAL):
+        """
+        Args:
+            path (str): File to append to, '-' for stdout.
+            interval (float): Minimum seconds between lines.
+        """
+        self.interval = interval
+        self._file = sys.stdout if path == '-' else open(path, 'a', encoding='utf-8')
+        self._last = None
+
+    def write(self, snapshot, force=False):
+        """
+        Appends a snapshot unless the last one is too recent (force: always).
+        """
+        now = time.perf_counter()
+        if not force and self._last is not None and now - self._last < self.interval:
+            return
+        self._last = now
+        self._file.write(json.dumps(snapshot) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not sys.stdout:
+            self._file.close()
@@ -0,0 +1,247 @@
+import numpy as np
+from scipy.signal import lfilter
+
+# Seconds per energy segment, the gating blocks below are whole numbers of segments
+SEGMENT_SECONDS = 0.1
+# Integrated loudness: 400 ms blocks (75% overlap), absolute + relative gate (BS.1770)
+BLOCK_SEGMENTS = 4
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+# Loudness range: 3 s short-term windows, relative gate, 10th-95th percentile (EBU R128 LRA)
+SHORT_TERM_SEGMENTS = 30
+RANGE_RELATIVE_GATE = -20.0
+# Long-term spectrum level (dB below its peak) that counts as the upper band edge
+BANDWIDTH_FLOOR_DB = -60.0
+# Frame size of the native rate long-term spectrum (~11 Hz bins at 44.1 kHz)
+BANDWIDTH_N_FFT = 4096
+
+# Per-pair result fields (remaster minus original)
+DELTA_KEYS = ('loudness_delta', 'range_delta', 'crest_delta', 'bandwidth_delta')
+_DELTA_SOURCES = {'loudness_delta': 'loudness', 'range_delta': 'loudness_range',
+                  'crest_delta': 'crest_factor', 'bandwidth_delta': 'bandwidth'}
+
+
+def k_weighting(sr):
+    """
+    K-weighting pre-filter (high shelf) + RLB high-pass as two biquads for
+    any sample rate, from the analog prototypes of BS.1770 (matches the
+    published 48 kHz coefficients closely).
+
+    Returns:
+        list: (b, a) coefficient pairs, applied in order.
+    """
+    # High shelf, +4 dB above ~1.5 kHz (head effects)
+    A = 10 ** (4.0 / 40)
+    w0 = 2 * np.pi * 1500.0 / sr
+    alpha = np.sin(w0) / (2 * (1 / np.sqrt(2)))
+    cos = np.cos(w0)
+    shelf_b = [A * ((A + 1) + (A - 1) * cos + 2 * np.sqrt(A) * alpha),
+               -2 * A * ((A - 1) + (A + 1) * cos),
+               A * ((A + 1) + (A - 1) * cos - 2 * np.sqrt(A) * alpha)]
+    shelf_a = [(A + 1) - (A - 1) * cos + 2 * np.sqrt(A) * alpha,
+               2 * ((A - 1) - (A + 1) * cos),
+               (A + 1) - (A - 1) * cos - 2 * np.sqrt(A) * alpha]
+
+    # High-pass at 38 Hz
+    w0 = 2 * np.pi * 38.0 / sr
+    alpha = np.sin(w0) / (2 * 0.5)
+    cos = np.cos(w0)
+    highpass_b = [(1 + cos) / 2, -(1 + cos), (1 + cos) / 2]
+    highpass_a = [1 + alpha, -2 * cos, 1 - alpha]
+
+    return [(np.array(shelf_b) / shelf_a[0], np.array(shelf_a) / shelf_a[0]),
+            (np.array(highpass_b) / highpass_a[0], np.array(highpass_a) / highpass_a[0])]
+
+
+class LoudnessMeter:
+    """
+    LUFS-style loudness, loudness range and crest factor of a mono signal
+    fed in one or more blocks (streamed tracks). Only 100 ms K-weighted
+    energy sums are kept, the gated block measurements are computed from
+    them at the end.
+
+    Mono downmix at the analysis rate, so values are for comparing files
+    with each other, not a certified meter reading.
+    """
+
+    def __init__(self, sr):
+        """
+        Args:
+            sr (int): Sample rate of the fed audio.
+        """
+        self.sr = sr
+        self._filters = k_weighting(sr)
+        self._state = [np.zeros(2) for _ in self._filters]
+        self._segment = max(1, int(round(sr * SEGMENT_SECONDS)))
+        self._carry = np.zeros(0)  # Weighted squares of the unfinished segment
+        self._segments = []
+        self.peak = 0.0
+        self._sum_squares = 0.0
+        self._samples = 0
+
+    def feed(self, y):
+        """
+        Adds the next samples (at the file's original level, not normalized).
+        """
+        if not len(y):
+            return
+        x = np.asarray(y, dtype=np.float64)
+        self.peak = max(self.peak, max(float(x.max()), -float(x.min())))
+        self._sum_squares += float(np.dot(x, x))
+        self._samples += len(x)
+
+        for index, (b, a) in enumerate(self._filters):
+            x, self._state[index] = lfilter(b, a, x, zi=self._state[index])
+        squares = np.concatenate([self._carry, x * x])
+        n_full = len(squares) // self._segment * self._segment
+        if n_full:
+            self._segments.extend(squares[:n_full].reshape(-1, self._segment).sum(axis=1))
+        self._carry = squares[n_full:]
+
+    def loudness(self):
+        """
+        Gated integrated loudness.
+
+        Returns:
+            float: LUFS, None when nothing is above the gates.
+        """
+        power = self._gate(self._block_power(BLOCK_SEGMENTS), RELATIVE_GATE)
+        return float(self._lufs(np.mean(power))) if len(power) else None
+
+    def loudness_range(self):
+        """
+        Spread of the short-term loudness (10th to 95th percentile).
+
+        Returns:
+            float: LU, None for excerpts shorter than one window.
+        """
+        power = self._gate(self._block_power(SHORT_TERM_SEGMENTS), RANGE_RELATIVE_GATE)
+        if not len(power):
+            return None
+        levels = self._lufs(power)
+        return float(np.percentile(levels, 95) - np.percentile(levels, 10))
+
+    def crest_factor(self):
+        """
+        Peak to RMS ratio of the whole signal (dynamic range compression
+        lowers it).
+
+        Returns:
+            float: dB, None for silence.
+        """
+        if not self._samples or not self._sum_squares:
+            return None
+        rms = np.sqrt(self._sum_squares / self._samples)
+        return float(20 * np.log10(self.peak / rms))
+
+    def _block_power(self, segments):
+        """
+        Mean square of every window of `segments` segments (hop of one segment).
+        """
+        energy = np.asarray(self._segments)
+        if len(energy) < segments:
+            return np.zeros(0)
+        sums = np.concatenate([[0.0], np.cumsum(energy)])
+        return (sums[segments:] - sums[:-segments]) / (segments * self._segment)
+
+    def _gate(self, power, relative_gate):
+        """
+        Blocks above the absolute gate and the relative gate (below their mean).
+        """
+        power = power[power > self._power(ABSOLUTE_GATE)]
+        if len(power):
+            power = power[power > np.mean(power) * 10 ** (relative_gate / 10)]
+        return power
+
+    @staticmethod
+    def _lufs(power):
+        return -0.691 + 10 * np.log10(power)
+
+    @staticmethod
+    def _power(lufs):
+        return 10 ** ((lufs + 0.691) / 10)
+
+
+class BandwidthMeter:
+    """
+    Long-term power spectrum of a mono signal fed in one or more blocks,
+    meant for the decoder's native rate (the 16 kHz analysis audio can't
+    show anything above 8 kHz). Non-overlapping Hann frames, samples of an
+    unfinished frame are carried over to the next block.
+    """
+
+    def __init__(self, sr, n_fft=BANDWIDTH_N_FFT):
+        """
+        Args:
+            sr (int): Sample rate of the fed audio.
+            n_fft (int): Frame/FFT size.
+        """
+        self.sr = sr
+        self.n_fft = n_fft
+        self._window = np.hanning(n_fft)
+        self._carry = np.zeros(0)
+        self._sum = np.zeros(1 + n_fft // 2)
+        self._frames = 0
+
+    def feed(self, y):
+        """
+        Adds the next samples.
+        """
+        buf = np.concatenate([self._carry, np.asarray(y, dtype=np.float64)])
+        n_frames = len(buf) // self.n_fft
+        if n_frames:
+            frames = buf[:n_frames * self.n_fft].reshape(n_frames, self.n_fft) * self._window
+            self._sum += (np.abs(np.fft.rfft(frames, axis=1)) ** 2).sum(axis=0)
+            self._frames += n_frames
+        self._carry = buf[n_frames * self.n_fft:]
+
+    def bandwidth(self):
+        """
+        Upper band edge of everything fed so far (see bandwidth()).
+
+        Returns:
+            float: Hz, None for silence or less than one frame.
+        """
+        if not self._frames:
+            return None
+        return bandwidth(self._sum / self._frames, self.sr, self.n_fft)
+
+
+def bandwidth(mean_power, sr, n_fft):
+    """
+    Upper band edge of the long-term spectrum: the highest frequency still
+    within BANDWIDTH_FLOOR_DB of the spectrum's peak (at most sr / 2, so
+    measure at the native rate, see BandwidthMeter).
+
+    Args:
+        mean_power (np.ndarray): Mean power spectrum (1 + n_fft // 2 bins).
+        sr (int): Sample rate.
+        n_fft (int): FFT size of the spectrum.
+
+    Returns:
+        float: Hz, None for silence.
+    """
+    peak = float(np.max(mean_power)) if len(mean_power) else 0.0
+    if peak <= 0:
+        return None
+    above = np.flatnonzero(mean_power > peak * 10 ** (BANDWIDTH_FLOOR_DB / 10))
+    return float(above[-1] * sr / n_fft)
+
+
+def quality_deltas(remaster, original):
+    """
+    Remaster minus original for each measurement.
+
+    Args:
+        remaster (dict): Quality measurements of the remaster (or None).
+        original (dict): Quality measurements of the original (or None).
+
+    Returns:
+        dict: DELTA_KEYS -> float, None where either side wasn't measured.
+    """
+    deltas = {}
+    for key, source in _DELTA_SOURCES.items():
+        a = remaster.get(source) if remaster else None
+        b = original.get(source) if original else None
+        deltas[key] = float(a - b) if a is not None and b is not None else None
+    return deltas
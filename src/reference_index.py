@@ -0,0 +1,196 @@
+import numpy as np
+
+# Initial rows of the stacked matrices, doubled whenever they fill up
+INITIAL_CAPACITY = 64
+
+
+class ReferenceIndex:
+    """
+    Loaded references of a comparator, keyed by stable integer ids instead
+    of file names (two folders can hold the same name, and a rename must not
+    change the key). Add/remove/rename/update are O(1) (amortized for add),
+    so a long-lived comparator (GUI edits, match service) never rebuilds.
+
+    Records live in dense slots so derived per-reference arrays can be
+    stacked: removing swaps the last slot into the hole, and the arrays grow
+    by doubling. Currently kept in step:
+        unit_mfcc   (n x n_mfcc) unit length MFCC means, row i = slot i
+                    (the comparator's block matmul and MFCC bound)
+        ids         slot -> reference id
+
+    Iterates like a dict of id -> ReferenceRecord.
+    """
+
+    def __init__(self):
+        self._records = []  # Slot -> record
+        self._slot_ids = []  # Slot -> id
+        self._slots = {}  # Id -> slot
+        self._by_path = {}  # Path -> id
+        self._next_id = 1
+        self._mfcc = None  # Stacked unit MFCC means (capacity rows), allocated on first add
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(list(self._slot_ids))
+
+    def __contains__(self, ref_id):
+        return ref_id in self._slots
+
+    def __getitem__(self, ref_id):
+        return self._records[self._slots[ref_id]]
+
+    def get(self, ref_id, default=None):
+        slot = self._slots.get(ref_id)
+        return default if slot is None else self._records[slot]
+
+    def keys(self):
+        return list(self._slot_ids)
+
+    def values(self):
+        return list(self._records)
+
+    def items(self):
+        return list(zip(self._slot_ids, self._records))
+
+    def add(self, record, ref_id=None):
+        """
+        Adds a reference.
+
+        Args:
+            record (ReferenceRecord): The loaded reference.
+            ref_id (int, optional): Id to reuse (restoring a checkpoint),
+                a new one is assigned otherwise.
+
+        Returns:
+            int: The reference id.
+        """
+        if ref_id is None:
+            ref_id = self._next_id
+        elif ref_id in self._slots:
+            raise ValueError(f"Reference id {ref_id} already in use")
+        self._next_id = max(self._next_id, ref_id + 1)
+
+        slot = len(self._records)
+        self._records.append(record)
+        self._slot_ids.append(ref_id)
+        self._slots[ref_id] = slot
+        self._by_path[record.path] = ref_id
+        self._set_row(slot, record)
+        return ref_id
+
+    def remove(self, ref_id):
+        """
+        Removes a reference (swap-remove, the last slot fills the hole).
+
+        Returns:
+            ReferenceRecord: The removed record.
+
+        Raises:
+            KeyError: Unknown id.
+        """
+        slot = self._slots.pop(ref_id)
+        record = self._records[slot]
+        if self._by_path.get(record.path) == ref_id:
+            del self._by_path[record.path]
+
+        last = len(self._records) - 1
+        if slot != last:
+            moved_id = self._slot_ids[last]
+            self._records[slot] = self._records[last]
+            self._slot_ids[slot] = moved_id
+            self._slots[moved_id] = slot
+            if self._mfcc is not None:
+                self._mfcc[slot] = self._mfcc[last]
+        self._records.pop()
+        self._slot_ids.pop()
+        return record
+
+    def rename(self, ref_id, new_path):
+        """
+        Points a reference at its file's new path (id and features unchanged).
+        """
+        record = self[ref_id]
+        if self._by_path.get(record.path) == ref_id:
+            del self._by_path[record.path]
+        record.path = new_path
+        self._by_path[new_path] = ref_id
+
+    def update(self, ref_id, record):
+        """
+        Replaces the record of a reference (file re-analysed), keeping its id.
+        """
+        slot = self._slots[ref_id]
+        old = self._records[slot]
+        if self._by_path.get(old.path) == ref_id:
+            del self._by_path[old.path]
+        self._records[slot] = record
+        self._by_path[record.path] = ref_id
+        self._set_row(slot, record)
+
+    def by_path(self, path):
+        """
+        Id of the reference loaded from a path.
+
+        Returns:
+            int: The id, or None.
+        """
+        return self._by_path.get(path)
+
+    def clear(self):
+        self.__init__()
+
+    @property
+    def ids(self):
+        """
+        Reference ids in slot order (rows of the stacked arrays).
+        """
+        return np.asarray(self._slot_ids, dtype=np.int64)
+
+    def slots(self, ref_ids):
+        """
+        Rows of the stacked arrays for some references.
+
+        Returns:
+            np.ndarray: Slot of each id, in order.
+        """
+        return np.fromiter((self._slots[ref_id] for ref_id in ref_ids), dtype=np.int64, count=len(ref_ids))
+
+    @property
+    def unit_mfcc(self):
+        """
+        Stacked unit length MFCC means, (mean + 1e-9) / norm like the
+        comparator's cosine, float64 so block scores equal pairwise ones.
+        One row per slot, a view valid until the next change.
+        """
+        if self._mfcc is None:
+            return np.zeros((0, 0), dtype=np.float64)
+        return self._mfcc[:len(self._records)]
+
+    def _set_row(self, slot, record):
+        """
+        Writes the derived rows of one slot, growing the arrays when full.
+        """
+        mean = self._mfcc_mean(record.features)
+        if self._mfcc is None:
+            if mean is None:
+                return
+            self._mfcc = np.zeros((max(INITIAL_CAPACITY, slot + 1), len(mean)), dtype=np.float64)
+        elif slot >= len(self._mfcc):
+            grown = np.zeros((len(self._mfcc) * 2, self._mfcc.shape[1]), dtype=np.float64)
+            grown[:len(self._mfcc)] = self._mfcc
+            self._mfcc = grown
+        # No MFCC (failed feature) -> zero row, never a stale one from a removed slot
+        if mean is None:
+            self._mfcc[slot] = 0.0
+        else:
+            mean = np.asarray(mean, dtype=np.float64) + 1e-9
+            self._mfcc[slot] = mean / np.linalg.norm(mean)
+
+    @staticmethod
+    def _mfcc_mean(features):
+        mean = getattr(features, 'mfcc_mean', None)
+        if mean is None and 'mfcc' in features:
+            mean = np.mean(features['mfcc'], axis=1)
+        return mean
@@ -0,0 +1,421 @@
+import os
+import csv
+import glob
+import time
+import pickle
+import sqlite3
+import threading
+
+# Result keys stored in their own (queryable) columns, everything else
+# (candidates...) is pickled into the extra column
+COLUMNS = ('path', 'remastered', 'display_name', 'match', 'confidence', 'orig_path',
+           'rem_duration', 'orig_duration', 'margin', 'ambiguous', 'reassigned',
+           'file_size', 'orig_file_size',
+           'loudness_delta', 'range_delta', 'crest_delta', 'bandwidth_delta', 'coverage')
+# Columns typed REAL (converted from numpy floats)
+_REALS = ('confidence', 'margin', 'rem_duration', 'orig_duration',
+          'loudness_delta', 'range_delta', 'crest_delta', 'bandwidth_delta', 'coverage')
+
+# Sort keys -> ORDER BY expression
+ORDERS = {
+    'remastered': 'display_name',
+    'original': 'orig_name',
+    'confidence': 'confidence',
+    'orig_duration': 'orig_duration',
+    'rem_duration': 'rem_duration',
+    'loudness_delta': 'loudness_delta',
+    'range_delta': 'range_delta',
+    'crest_delta': 'crest_delta',
+    'bandwidth_delta': 'bandwidth_delta',
+    'coverage': 'coverage',
+}
+
+# Rows read per fetch when streaming (exports, iterate())
+_FETCH = 1000
+# Run stores nobody deleted (crashed app) are removed after this many days untouched
+STALE_DAYS = 30
+
+
+def run_store_path(job_id):
+    """
+    SQLite file for the results of one run, per job and process so app
+    instances running at the same time never share (or clear) a store.
+    Removes run stores left behind by crashes (untouched for STALE_DAYS).
+
+    Args:
+        job_id (str): The job's id (JobCheckpoint.job_id).
+
+    Returns:
+        str: The store path in the user cache dir.
+    """
+    from app_paths import user_cache_dir
+    root = user_cache_dir('results')
+    cutoff = time.time() - STALE_DAYS * 86400
+    for stale in glob.glob(os.path.join(root, '*.sqlite*')):
+        try:
+            if os.path.getmtime(stale) < cutoff:
+                os.remove(stale)
+        except OSError:
+            pass
+    return os.path.join(root, f"{job_id}-{os.getpid()}.sqlite")
+
+
+class ResultsStore:
+    """
+    Indexed SQLite store of the comparison results (one row per remaster).
+    The runner writes in batches as results come in, the GUI reads pages,
+    looks up rows by path and applies renames through indexed queries
+    instead of scanning a list, so result sets larger than memory can be
+    browsed and exported. One store per run (see run_store_path).
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): SQLite file, ':memory:' for a throwaway store.
+        """
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL UNIQUE,
+                remastered TEXT,
+                display_name TEXT,
+                match TEXT,
+                confidence REAL,
+                orig_path TEXT,
+                orig_name TEXT,
+                rem_duration REAL,
+                orig_duration REAL,
+                margin REAL,
+                ambiguous INTEGER,
+                reassigned INTEGER,
+                file_size INTEGER,
+                orig_file_size INTEGER,
+                loudness_delta REAL,
+                range_delta REAL,
+                crest_delta REAL,
+                bandwidth_delta REAL,
+                coverage REAL,
+                extra BLOB
+            )
+        """)
+        self._add_missing_columns()
+        for column in ('orig_path', 'match', 'confidence'):
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS results_{column} ON results({column})")
+        # Originals named in each result's (pickled) candidates, so renames find them
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS candidate_paths (
+                path TEXT NOT NULL,
+                orig_path TEXT NOT NULL
+            )
+        """)
+        for column in ('path', 'orig_path'):
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS candidate_paths_{column} ON candidate_paths({column})")
+        self._conn.commit()
+
+    def _add_missing_columns(self):
+        """
+        Stores created by an older version get the newer (nullable) columns.
+        """
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(results)")}
+        for name in COLUMNS:
+            if name not in existing:
+                kind = 'REAL' if name in _REALS else 'INTEGER'
+                self._conn.execute(f"ALTER TABLE results ADD COLUMN {name} {kind}")
+
+    def clear(self):
+        """
+        Removes all results (new run).
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+            self._conn.execute("DELETE FROM candidate_paths")
+            self._conn.commit()
+
+    def add_many(self, results):
+        """
+        Inserts (or replaces, by path) a batch of result entries in one transaction.
+
+        Args:
+            results (list): Result entries from the runner.
+        """
+        if not results:
+            return
+        names = COLUMNS + ('orig_name', 'extra')
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO results ({', '.join(names)}) "
+                f"VALUES ({', '.join('?' * len(names))})",
+                [self._to_row(result) for result in results])
+            self._set_candidate_paths(results)
+            self._conn.commit()
+
+    def update(self, result):
+        """
+        Writes back a changed entry (by its id when it came from the store, else by path).
+
+        Args:
+            result (dict): The result entry.
+        """
+        self.update_many([result])
+
+    def update_many(self, results):
+        """
+        Writes back changed entries in one transaction.
+
+        Args:
+            results (list): Result entries.
+        """
+        if not results:
+            return
+        with self._lock:
+            self._update_rows(results)
+            self._conn.commit()
+
+    def _update_rows(self, results):
+        names = COLUMNS + ('orig_name', 'extra')
+        assignments = ', '.join(f"{name} = ?" for name in names)
+        for result in results:
+            key, value = ('id', result['id']) if 'id' in result else ('path', result['path'])
+            self._conn.execute(f"UPDATE results SET {assignments} WHERE {key} = ?",
+                               self._to_row(result) + (value,))
+        self._set_candidate_paths(results)
+
+    def _set_candidate_paths(self, results):
+        """
+        Indexes the originals in the results' candidates (replacing what was there).
+        """
+        self._conn.executemany("DELETE FROM candidate_paths WHERE path = ?",
+                               [(result['path'],) for result in results])
+        self._conn.executemany(
+            "INSERT INTO candidate_paths (path, orig_path) VALUES (?, ?)",
+            [(result['path'], orig_path) for result in results
+             for orig_path in {c.get('orig_path') for c in result.get('candidates') or []} if orig_path])
+
+    def get_by_path(self, path):
+        """
+        Result of a remastered file.
+
+        Returns:
+            dict: The result entry or None.
+        """
+        rows = self._query("SELECT * FROM results WHERE path = ?", (path,))
+        return rows[0] if rows else None
+
+    def find(self, orig_path=None, match=None):
+        """
+        Results matched to an original (by path and/or reference name).
+
+        Returns:
+            list: Result entries.
+        """
+        clauses, args = [], []
+        if orig_path is not None:
+            clauses.append("orig_path = ?")
+            args.append(orig_path)
+        if match is not None:
+            clauses.append("match = ?")
+            args.append(match)
+        if not clauses:
+            return []
+        return self._query(f"SELECT * FROM results WHERE {' OR '.join(clauses)}", args)
+
+    def iterate(self, batch=_FETCH):
+        """
+        All results in insertion order, read batch rows at a time (by id,
+        so rows may be updated in between).
+
+        Yields:
+            dict: Result entries (with their 'id').
+        """
+        last = 0
+        while True:
+            rows = self._query("SELECT * FROM results WHERE id > ? ORDER BY id LIMIT ?", (last, batch))
+            yield from rows
+            if len(rows) < batch:
+                return
+            last = rows[-1]['id']
+
+    def count(self, min_confidence=None, ambiguous=None):
+        """
+        Number of results, optionally filtered.
+
+        Args:
+            min_confidence (float, optional): Only results above this confidence.
+            ambiguous (bool, optional): Only (non) ambiguous results.
+
+        Returns:
+            int: The count.
+        """
+        where, args = self._filters(min_confidence, ambiguous)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM results{where}", args).fetchone()[0]
+
+    def page(self, order='remastered', descending=False, limit=None, offset=0,
+             min_confidence=None, ambiguous=None):
+        """
+        One sorted page of results.
+
+        Args:
+            order (str): Sort key, one of ORDERS.
+            descending (bool): Sort direction.
+            limit (int, optional): Page size, None for everything.
+            offset (int): Rows to skip.
+            min_confidence (float, optional): Only results above this confidence.
+            ambiguous (bool, optional): Only (non) ambiguous results.
+
+        Returns:
+            list: Result entries (with their 'id').
+        """
+        where, args = self._filters(min_confidence, ambiguous)
+        direction = "DESC" if descending else "ASC"
+        sql = f"SELECT * FROM results{where} ORDER BY {ORDERS[order]} {direction}, id"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            args += [limit, offset]
+        return self._query(sql, args)
+
+    def rename_remastered(self, old_path, new_path):
+        """
+        Points the result of a renamed remastered file at its new path.
+        """
+        name = os.path.basename(new_path)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE results SET path = ?, remastered = ?, display_name = ? WHERE path = ?",
+                (new_path, name, name, old_path))
+            self._conn.execute("UPDATE candidate_paths SET path = ? WHERE path = ?", (new_path, old_path))
+            self._conn.commit()
+
+    def rename_original(self, old_path, new_path):
+        """
+        Points every result matched to a renamed original at its new path/name,
+        and every candidate naming it (so a later rematch doesn't bring the
+        old path back). Matched by path only, another folder may hold an
+        original of the same name.
+        """
+        new_name = os.path.basename(new_path)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE results SET match = ?, orig_path = ?, orig_name = ? WHERE orig_path = ?",
+                (new_name, new_path, new_name, old_path))
+            # Candidates are pickled, rewrite the rows that have one (indexed)
+            results = self._rows(
+                "SELECT * FROM results WHERE path IN "
+                "(SELECT path FROM candidate_paths WHERE orig_path = ?)", (old_path,))
+            for result in results:
+                for candidate in result.get('candidates') or []:
+                    if candidate.get('orig_path') == old_path:
+                        candidate['orig_path'] = new_path
+                        candidate['name'] = new_name
+            self._update_rows(results)
+            self._conn.commit()
+
+    def export_csv(self, path, order='remastered', descending=False):
+        """
+        Writes all results as CSV, streamed from the database.
+
+        Args:
+            path (str): Output file.
+            order (str): Sort key, one of ORDERS.
+            descending (bool): Sort direction.
+
+        Returns:
+            int: Number of rows written.
+        """
+        direction = "DESC" if descending else "ASC"
+        written = 0
+        with self._lock, open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            cursor = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM results ORDER BY {ORDERS[order]} {direction}, id")
+            while True:
+                rows = cursor.fetchmany(_FETCH)
+                if not rows:
+                    break
+                writer.writerows(rows)
+                written += len(rows)
+        return written
+
+    def close(self):
+        """
+        Closes the database.
+        """
+        with self._lock:
+            self._conn.close()
+
+    def delete(self):
+        """
+        Closes the database and removes its files (the run's results are no longer shown).
+        """
+        self.close()
+        if self.path == ':memory:':
+            return
+        for path in (self.path, f"{self.path}-wal", f"{self.path}-shm"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _filters(min_confidence, ambiguous):
+        clauses, args = [], []
+        if min_confidence is not None:
+            clauses.append("confidence > ?")
+            args.append(min_confidence)
+        if ambiguous is not None:
+            clauses.append("ambiguous = ?")
+            args.append(int(bool(ambiguous)))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), args
+
+    def _query(self, sql, args=()):
+        with self._lock:
+            return self._rows(sql, args)
+
+    def _rows(self, sql, args=()):
+        cursor = self._conn.execute(sql, args)
+        names = [d[0] for d in cursor.description]
+        return [self._to_result(dict(zip(names, row))) for row in cursor.fetchall()]
+
+    @staticmethod
+    def _to_row(result):
+        """
+        Result entry -> column values (+ original name, pickled extras).
+        """
+        values = []
+        for name in COLUMNS:
+            value = result.get(name)
+            if name in ('ambiguous', 'reassigned'):
+                value = int(bool(value))
+            elif name in _REALS and value is not None:
+                value = float(value)
+            values.append(value)
+        orig_path = result.get('orig_path')
+        orig_name = os.path.basename(orig_path) if orig_path else result.get('match')
+        extra = {k: v for k, v in result.items() if k not in COLUMNS and k != 'id'}
+        return tuple(values) + (orig_name, pickle.dumps(extra, protocol=pickle.HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def _to_result(row):
+        """
+        Database row -> result entry.
+        """
+        extra = row.pop('extra', None)
+        row.pop('orig_name', None)
+        result = pickle.loads(extra) if extra else {}
+        result.update(row)
+        result['ambiguous'] = bool(result.get('ambiguous'))
+        if not result.get('reassigned'):
+            result.pop('reassigned', None)
+        for name in ('file_size', 'orig_file_size'):
+            if result.get(name) is None:
+                result.pop(name, None)
+        return result
@@ -2,155 +2,737 @@ from PyQt5.QtCore import QThread, pyqtSignal, QMutex
 import traceback
 import os
 import gc
-from audio_processor import AudioLoader, FeatureExtractor
+import time
+
+# audio_processor (librosa/numba/scipy) is imported lazily so the window
+# shows before the scientific stack is loaded
 
 file_mutex = QMutex()
+# Reassigned results written back to the store per transaction
+WRITE_BATCH = 1000
+
+class Warmup(QThread):
+    """
+    Loads the scientific stack and JIT compiles the DSP path in the
+    background while the user picks folders.
+    """
+    warmed_up = pyqtSignal(float)
+
+    def run(self):
+        try:
+            from warmup import warm_up
+            self.warmed_up.emit(warm_up())
+        except Exception as e:
+            # Not fatal, the first file just pays the cost instead
+            print(f"Warm-up failed: {str(e)}")
+            self.warmed_up.emit(-1.0)
 
 class Runner(QThread):
     progress_updated = pyqtSignal(int, str)
-    matches_found = pyqtSignal(list)
+    matches_found = pyqtSignal(object)  # ResultsStore holding the run's results
     error_occurred = pyqtSignal(str)
+    file_failed = pyqtSignal(object)  # FileError of a single file, the run continues
+    throughput_updated = pyqtSignal(dict)  # WorkProgress.snapshot() after every file
     
-    def __init__(self, original_files, remastered_files, batch_size=5):
+    def __init__(self, original_files, remastered_files, batch_size=None, prefetch=4,
+                 one_to_one=False, full_track=False, use_score_cache=True,
+                 feature_precision='uint8', resume=False, checkpoint=True,
+                 isolate=False, workers=None, file_timeout=120,
+                 abort_policy='never', max_errors=50, max_error_rate=0.25,
+                 key_invariant=False, beat_sync=False, results_store=None, quality=False,
+                 memory_limit_mb=None, progress_log=None):
         super().__init__()
         self.original_files = original_files
         self.remastered_files = remastered_files
-        self.batch_size = batch_size
+        self.batch_size = batch_size  # Files per checkpoint/flush, None = adaptive
+        self.prefetch = prefetch  # Files read ahead of decoding
+        self.one_to_one = one_to_one  # Each original matched to at most one remaster
+        self.full_track = full_track  # Stream whole tracks instead of the first minute
+        self.beat_sync = beat_sync  # One feature column per beat (tempo changes)
+        self.quality = quality  # Loudness/dynamics/bandwidth deltas per matched pair
+        self.use_score_cache = use_score_cache  # Reuse pair scores from earlier runs
+        self.feature_precision = feature_precision  # Chroma storage of loaded references
+        self.key_invariant = key_invariant  # Match remasters transposed by semitones
+        self.resume = resume  # Continue from the last checkpoint of the same job
+        self.use_checkpoint = checkpoint  # Periodically save progress for crash recovery
+        self.isolate = isolate  # Decode/extract in supervised worker processes
+        self.workers = workers  # Worker processes when isolating, None = adaptive
+        self.memory_limit_mb = memory_limit_mb  # Memory ceiling of the run, None = share of RAM
+        self.scheduler = None
+        self.progress = None  # WorkProgress of the run (rates, time left)
+        self.remastered_done = 0  # Remasters compared or failed (progress)
+        self.progress_log = progress_log  # JSON lines progress file for headless runs, '-' = stdout
+        self._progress_log = None
+        self.file_timeout = file_timeout  # Seconds before a hung file's worker is killed
+        # Failed files + when to give up on the run (never/count/rate)
+        from error_log import ErrorLog
+        self.error_log = ErrorLog(abort_policy, max_errors, max_error_rate)
+        self.abort_reason = None
+        self.results_store = results_store  # ResultsStore written in batches, a per-run one when None
+        self.unstored = 0  # Results the store couldn't take (still in the checkpoint)
+        self.checkpoint = None
+        self.sandbox = None
         self.keep_running = True
         self.comparator = None
+        self.timings = {}  # Startup instrumentation (seconds since run start)
+        self._started_at = time.perf_counter()
     
     def run(self):
         """
         Runs the comparison process.
         """
+        self._started_at = time.perf_counter()
         try:
+            from warmup import configure_jit_cache
+            configure_jit_cache()
             from comparator import AudioComparator
-            self.comparator = AudioComparator()
+            self.comparator = AudioComparator(score_cache=self._open_score_cache(),
+                                              key_invariant=self.key_invariant)
+            from scheduler import AdaptiveScheduler
+            self.scheduler = AdaptiveScheduler(
+                self.memory_limit_mb, self.batch_size,
+                # One compute thread without isolation
+                workers=self.workers if self.isolate else 1,
+                initial_workers=max(1, min(4, (os.cpu_count() or 2) // 2)),
+                measure=self._memory_in_use)
+            state = self._open_checkpoint()
+            self._open_results_store()
+            self._plan_progress(state)
             
             # Process reference files in batches
             self.progress_updated.emit(0, "Loading reference files in batches...")
-            self._load_references()
+            self._load_references(state)
+            if self.abort_reason:
+                self._aborted()
+                return
             
-            if not self.comparator.reference_features:
+            if not self.comparator.references:
                 self.error_occurred.emit("No valid reference files loaded")
                 return
                 
             # Process remastered files in batches
-            self.progress_updated.emit(50, "Processing remastered files in batches...")
-            results = self._process_remastered()
+            self.progress.start('remastered')
+            self.progress_updated.emit(round(self.progress.fraction() * 100),
+                                       "Processing remastered files in batches...")
+            self._process_remastered(state)
+            if self.abort_reason:
+                # Partial results are still shown, the checkpoint is kept to resume
+                self.matches_found.emit(self.results_store)
+                self._aborted()
+                return
+
+            if self.one_to_one and self.keep_running:
+                self.progress_updated.emit(100, "Solving one-to-one assignment...")
+                self._assign_one_to_one()
             
-            self.matches_found.emit(results)
+            self.matches_found.emit(self.results_store)
+
+            if self.unstored:
+                # The checkpoint still has them, it's kept so a resume restores them
+                self.error_occurred.emit(
+                    f"{self.unstored} results could not be written to the results store"
+                    + (", resume the run to restore them." if self.checkpoint else "."))
+            elif self.checkpoint and self.keep_running:
+                # Finished, nothing left to resume
+                self.checkpoint.delete()
             
         except Exception as e:
             error_msg = f"Critical error:\n{str(e)}\n{traceback.format_exc()}"
             self.error_occurred.emit(error_msg)
+        finally:
+            if self.sandbox:
+                self.sandbox.close()
+                self.sandbox = None
+            if self.scheduler:
+                print(f"Scheduler: {self.scheduler.describe()}")
+            if self.progress:
+                self.progress.close()
+            if self._progress_log:
+                self.progress.finish()
+                self._progress_log.write(self.progress.snapshot(), force=True)
+                self._progress_log.close()
+                self._progress_log = None
+            if self.comparator:
+                stats = self.comparator.dtw_stats
+                if sum(stats.values()):
+                    print(f"DTW: {stats['completed']} completed, {stats['abandoned']} abandoned early, "
+                          f"{stats['skipped']} skipped by lower bounds")
+            cache = self.comparator.score_cache if self.comparator else None
+            if cache is not None:
+                print(f"Score cache: {cache.hits} hits, {cache.misses} misses")
+                cache.close()
     
-    def _load_references(self):
+    def _load_references(self, state=None):
         """
         Load reference files in smaller batches to manage memory.
+        Reading, decoding and extraction overlap in the pipeline stages.
+        References are kept as compact records (quantized chroma).
+
+        Args:
+            state (dict, optional): Checkpoint state, its references are
+                restored instead of being loaded again.
         """
-        total_loaded = 0
+        from feature_store import CompactFeatures, ReferenceRecord
+
+        references = self.comparator.references
+        skip = set()
+        if state:
+            # Same ids as before the restart, resumed results point at them
+            for ref_id, record in state['references'].items():
+                references.add(record, ref_id)
+            skip = {r.path for r in state['references'].values()} | set(state['failed_references'])
+        total_loaded = len(references)
+        batch_records, batch_failed = {}, []
+        paths = [p for p in self.original_files if p not in skip]
+        work = self.progress.work('references')
+        pipeline = self._make_pipeline(paths, work)
         
-        for i in range(0, len(self.original_files), self.batch_size):
-            if not self.keep_running:
-                return
-                
-            batch = self.original_files[i:i+self.batch_size]
-            loaded_in_batch = 0
-            
-            for path in batch:
+        try:
+            for item in pipeline:
                 if not self.keep_running:
                     return
                     
-                try:
-                    full_duration = AudioLoader.get_full_duration(path)
-                    y, sr = AudioLoader.load_audio(path)
-                    features = FeatureExtractor.extract_features(y, sr)
-                    self.comparator.reference_features[os.path.basename(path)] = {
-                        'features': features,
-                        'full_duration': full_duration,
-                        'path': path
-                    }
-                    loaded_in_batch += 1
+                path = item['path']
+                full_duration = 0 if item['error'] else item['full_duration']
+                if item['error']:
+                    self._file_failed(item)
+                    batch_failed.append(path)
+                else:
+                    record = ReferenceRecord(
+                        CompactFeatures(item['features'], self.feature_precision),
+                        item['full_duration'],
+                        path
+                    )
+                    batch_records[references.add(record)] = record
                     total_loaded += 1
-                except Exception as e:
-                    self.error_occurred.emit(f"Skipping {os.path.basename(path)}: {str(e)}")
+                    self.error_log.record_success()
+                    self._mark('first_reference')
+                item = None
                 
-                # Force garbage collection between each file
-                self._clear_memory()
+                # Update progress (by estimated work, references -> remastered)
+                self._file_progress(path, full_duration,
+                                    f"Loaded {total_loaded}/{len(self.original_files)} references")
                 
-                # Update progress
-                progress = int((total_loaded / len(self.original_files)) * 50)  # First half of progress -> then remastered
-                self.progress_updated.emit(progress, f"Loaded {total_loaded}/{len(self.original_files)} references")
-            
-            # Clear memory between batches
-            self._clear_memory()
+                # Clear memory + checkpoint between batches
+                if self._batch_done(work.get(path, 0)):
+                    self._save_references(batch_records, batch_failed)
+                    batch_records, batch_failed = {}, []
+                    self._clear_memory()
+        finally:
+            pipeline.close()
+            self._save_references(batch_records, batch_failed)
     
-    def _process_remastered(self):
+    def _process_remastered(self, state=None):
         """
         Process remastered files in batches.
-        Once process is finished, append them to the list of columns.
+        The analysed remasters of a batch are compared against the
+        references together (shared reference blocks), then written to
+        the results store and the checkpoint, nothing is kept after the
+        batch.
 
-        Returns: 
-            results: List of file details.
+        Args:
+            state (dict, optional): Checkpoint state, already finished
+                remasters are skipped and their results restored to the store.
         """
-        results = []
-        total_processed = 0
+        done = set(state['done']) if state else set()
+        self.remastered_done = len(done)
+        analysed = len(done)
+        if state:
+            self._restore_results()
+        unsaved, unsaved_done = [], []  # Not stored/checkpointed yet
+        batch = []  # Analysed remasters waiting for the batch's comparison
+        paths = [p for p in self.remastered_files if p not in done]
+        work = self.progress.work('remastered')
+        pipeline = self._make_pipeline(paths, work)
         
-        for i in range(0, len(self.remastered_files), self.batch_size):
-            if not self.keep_running:
-                break
-                
-            batch = self.remastered_files[i:i+self.batch_size]
-            
-            for path in batch:
+        try:
+            for item in pipeline:
                 if not self.keep_running:
                     break
                     
-                try:
-                    full_duration = AudioLoader.get_full_duration(path)
-                    match, details = self.comparator.compare(path)
-
-                    orig_path = ''
-                    if match:
-                        ref_data = self.comparator.reference_features.get(match['reference'], {})
-                        orig_path = ref_data.get('path', '')
-
-                    orig_duration = self.comparator.reference_features.get(
-                        match['reference'], {}
-                    ).get('full_duration', 0) if match else 0
-                    results.append({
-                        'remastered': os.path.basename(path),
-                        'match': match['reference'] if match else "No match",
-                        'confidence': match['similarity'] if match else 0.0,
-                        'orig_path': orig_path,
-                        'path': path, 
-                        'rem_duration': full_duration,  # Add duration
-                        'orig_duration': orig_duration,  # Add og duration
-                        'display_name': os.path.basename(path)
-                    })
-                except Exception as e:
-                    self.error_occurred.emit(f"Error processing {os.path.basename(path)}: {str(e)}")
-                
-                total_processed += 1
+                path = item['path']
+                analysed += 1
+                if item['error']:
+                    self._file_failed(item)
+                    unsaved_done.append(path)
+                    self._remaster_progress(path, 0)
+                else:
+                    # Counted once compared (see _compare_batch), only the status moves on
+                    batch.append(item)
+                    self.progress_updated.emit(
+                        round(self.progress.fraction() * 100),
+                        f"Analysed {analysed}/{len(self.remastered_files)} remastered"
+                        f"{self.progress.describe()}")
+                item = None
                 
-                self._clear_memory()
-                
-                # Update progress (second half)
-                progress = 50 + int((total_processed / len(self.remastered_files)) * 50)
-                self.progress_updated.emit(progress, f"Processed {total_processed}/{len(self.remastered_files)} remastered")
-            
-            # Clear memory between batches
-            self._clear_memory()
-        
-        return results
+                # Compare + clear memory + checkpoint between batches
+                if self._batch_done(work.get(path, 0)):
+                    self._compare_batch(batch, unsaved, unsaved_done)
+                    batch = []
+                    self._store_results(unsaved)
+                    self._save_results(unsaved, unsaved_done)
+                    unsaved, unsaved_done = [], []
+                    self._clear_memory()
+            if self.keep_running:
+                # Stopped runs leave the rest to resume
+                self._compare_batch(batch, unsaved, unsaved_done)
+        finally:
+            pipeline.close()
+            self._store_results(unsaved)
+            self._save_results(unsaved, unsaved_done)
+
+    def _compare_batch(self, items, unsaved, done):
+        """
+        Compares a batch of analysed remasters against the references in
+        one go (top_matches_many), so every reference is prepared and
+        pulled through the cache once per batch instead of once per file.
+
+        Args:
+            items (list): Pipeline items of the analysed remasters.
+            unsaved (list): Entries not stored/checkpointed yet, the batch's are appended.
+            done (list): Finished paths not checkpointed yet, the batch's are appended.
+        """
+        if not items:
+            return
+        started = time.perf_counter()
+        tops = self.comparator.top_matches_many([item['features'] for item in items])
+        # Comparison time per file, for the error log
+        elapsed = (time.perf_counter() - started) / len(items)
+        for item, top in zip(items, tops):
+            try:
+                unsaved.append(self._result_entry(item, top))
+                self.error_log.record_success()
+                self._mark('first_result')
+            except Exception as e:
+                item.update(stage='compare', exc_type=type(e).__name__, error=str(e))
+                item['elapsed'] += elapsed
+                self._file_failed(item)
+            done.append(item['path'])
+            self._remaster_progress(item['path'], item['full_duration'])
+
+    def _remaster_progress(self, path, full_duration):
+        """
+        Counts a remaster that is done (compared, or failed) in the progress
+        (by estimated work), so the rates and time left include the comparison.
+        """
+        self.remastered_done += 1
+        self._file_progress(path, full_duration,
+                            f"Processed {self.remastered_done}/{len(self.remastered_files)} remastered")
+
+    def _result_entry(self, item, top=None):
+        """
+        Compares one analysed remaster against the references.
+
+        Args:
+            item (dict): Pipeline item of the remastered file.
+            top (list, optional): Its top N from top_matches_many(),
+                compared here when not given.
+
+        Returns:
+            dict: The result entry shown in the table.
+        """
+        path = item['path']
+        full_duration = item['full_duration']
+        if top is None:
+            match, details = self.comparator.compare_features(item['features'], full_duration)
+        else:
+            match, details = self.comparator.summarize(top, full_duration)
+
+        orig_path = ''
+        orig_duration = 0
+        if match:
+            ref_data = self.comparator.references.get(match['reference'])
+            orig_path = ref_data.path if ref_data else ''
+            orig_duration = ref_data.full_duration if ref_data else 0
+
+        details = details if isinstance(details, dict) else {}
+        candidates = self._candidates(details.get('results', []), item['features'].get('quality'))
+        entry = {
+            'remastered': os.path.basename(path),
+            'match': match['name'] if match else "No match",
+            'reference_id': match['reference'] if match else None,
+            'confidence': match['similarity'] if match else 0.0,
+            'orig_path': orig_path,
+            'path': path, 
+            'rem_duration': full_duration,  # Add duration
+            'orig_duration': orig_duration,  # Add og duration
+            'display_name': os.path.basename(path),
+            # Alternatives for rematching without recomputing
+            'candidates': candidates,
+            'margin': details.get('margin', 0.0),
+            'ambiguous': details.get('ambiguous', False),
+            # Sizes let a refresh find renamed files again
+            'file_size': self._file_size(path),
+            'orig_file_size': self._file_size(orig_path)
+        }
+        self._copy_deltas(entry, candidates[0] if match else None)
+        self._copy_timeline(entry, candidates[0] if match else None)
+        return entry
+
+    def _assign_one_to_one(self):
+        """
+        Re-assigns matches so no two remasters claim the same original.
+        Works from each result's top N candidates (sparse assignment), read
+        from the results store. Only the candidate lists are held in memory,
+        changed results are written back in batches.
+        """
+        from assignment import solve_assignment
+
+        ids, candidate_lists = [], []
+        for result in self.results_store.iterate():
+            ids.append(result['id'])
+            candidate_lists.append(
+                [(c['reference'], c['similarity']) for c in result.get('candidates', [])])
+        assignment = dict(zip(ids, solve_assignment(candidate_lists, self.comparator.threshold)))
+        candidate_lists = None
+
+        changed = []
+        for result in self.results_store.iterate():
+            if result['id'] not in assignment or assignment[result['id']] == result.get('reference_id'):
+                continue
+            self._reassign(result, assignment[result['id']])
+            changed.append(result)
+            if len(changed) >= WRITE_BATCH:
+                self.results_store.update_many(changed)
+                changed = []
+        self.results_store.update_many(changed)
+
+    def _reassign(self, result, reference):
+        """
+        Points a result at another of its candidates (None: no match).
+        """
+        candidate = next((c for c in result['candidates'] if c['reference'] == reference), None)
+        result['match'] = candidate['name'] if candidate else "No match"
+        result['reference_id'] = reference if candidate else None
+        result['confidence'] = candidate['similarity'] if candidate else 0.0
+        result['orig_path'] = candidate['orig_path'] if candidate else ''
+        result['orig_duration'] = candidate['orig_duration'] if candidate else 0
+        result['orig_file_size'] = self._file_size(result['orig_path'])
+        self._copy_deltas(result, candidate)
+        self._copy_timeline(result, candidate)
+        result['reassigned'] = True
+
+    def _candidates(self, top_results, quality=None):
+        """
+        Top N comparator results as plain dicts with the original's path/duration,
+        the similarity timeline (and the quality deltas to each original when measured).
+        """
+        from quality import quality_deltas
+        candidates = []
+        for result in top_results:
+            ref_data = self.comparator.references.get(result['reference'])
+            candidate = {
+                'reference': result['reference'],
+                'name': result['name'],
+                'similarity': result['similarity'],
+                'orig_path': ref_data.path if ref_data else '',
+                'orig_duration': ref_data.full_duration if ref_data else 0,
+                'coverage': result.get('coverage'),
+                'timeline': result.get('timeline')
+            }
+            if quality and ref_data:
+                candidate.update(quality_deltas(quality, ref_data.features.get('quality')))
+            candidates.append(candidate)
+        return candidates
+
+    @staticmethod
+    def _copy_deltas(result, candidate):
+        """
+        Quality deltas of the chosen candidate onto the result (None if unmeasured).
+        """
+        from quality import DELTA_KEYS
+        for key in DELTA_KEYS:
+            result[key] = candidate.get(key) if candidate else None
+
+    @staticmethod
+    def _copy_timeline(result, candidate):
+        """
+        Similarity timeline/coverage of the chosen candidate onto the result,
+        flagged partial when it only matches part of the remaster.
+        """
+        from comparator import PARTIAL_COVERAGE
+        coverage = candidate.get('coverage') if candidate else None
+        result['coverage'] = coverage
+        result['timeline'] = candidate.get('timeline') if candidate else None
+        result['partial'] = bool(coverage is not None and coverage < PARTIAL_COVERAGE)
+
+    def _plan_progress(self, state=None):
+        """
+        Sets up the work estimates of both phases (file headers, probed in
+        the background while the run starts), so the progress bar splits
+        by work instead of half per phase.
+
+        Args:
+            state (dict, optional): Checkpoint state, its files are done already.
+        """
+        from scheduler import WorkEstimates
+        from progress import WorkProgress, ProgressLog
+        done_references, done_remastered = set(), set()
+        if state:
+            done_references = ({r.path for r in state['references'].values()}
+                               | set(state['failed_references']))
+            done_remastered = set(state['done'])
+        self.progress = WorkProgress()
+        for name, files, done in (('references', self.original_files, done_references),
+                                  ('remastered', self.remastered_files, done_remastered)):
+            paths = [p for p in files if p not in done]
+            self.progress.add_stage(name, WorkEstimates(paths, self.full_track), len(files) - len(paths))
+        if self.progress_log:
+            self._progress_log = ProgressLog(self.progress_log)
+
+    def _file_progress(self, path, full_duration, message):
+        """
+        Counts a finished (or failed) file and reports the progress, rates
+        and time left (signals + progress log).
+
+        Args:
+            path (str): The file.
+            full_duration (float): Its duration, 0 when it failed.
+            message (str): Status text, the rates are appended.
+        """
+        from scheduler import analysed_seconds
+        self.progress.file_done(path, analysed_seconds(full_duration, self.full_track))
+        self.progress_updated.emit(round(self.progress.fraction() * 100),
+                                   f"{message}{self.progress.describe()}")
+        snapshot = self.progress.snapshot()
+        self.throughput_updated.emit(snapshot)
+        if self._progress_log:
+            self._progress_log.write(snapshot)
+
+    def _make_pipeline(self, paths, work):
+        """
+        Builds the prefetch pipeline (read -> decode -> extract) for the paths.
+        When isolating, the work goes to supervised worker processes instead
+        (same items, completion order), longest files first so no worker is
+        left with a long file at the end. The pool is reused between phases.
+
+        Args:
+            paths (list): Files still to analyse.
+            work (WorkEstimates): Estimates of the paths, for the order.
+
+        Returns:
+            iterable: Pipeline items.
+        """
+        from scheduler import LongestFirst
+        if self.isolate:
+            from sandbox import SandboxPool
+            if self.sandbox is None:
+                self.sandbox = SandboxPool(workers=self.scheduler.workers, timeout=self.file_timeout,
+                                           full_track=self.full_track, beat_sync=self.beat_sync,
+                                           quality=self.quality)
+            return self.sandbox.imap(LongestFirst(paths, work))
+        from pipeline import AudioPipeline
+        return AudioPipeline(paths, self._decode, self._extract, prefetch=self.prefetch)
+
+    def _file_failed(self, item):
+        """
+        Records a failed file (pipeline item with an error) and reports it
+        without stopping the run, unless the abort policy says otherwise.
+        """
+        from error_log import FileError
+        error = FileError(item['path'], item['stage'], item.get('exc_type') or 'Error',
+                          item['error'], item.get('elapsed', 0.0))
+        print(f"Failed: {error}")
+        self.error_log.record(error)
+        self.file_failed.emit(error)
+
+        reason = self.error_log.abort_reason()
+        if reason and self.abort_reason is None:
+            self.abort_reason = reason
+            self.keep_running = False
+
+    def _aborted(self):
+        """
+        Reports a run stopped by the abort policy.
+        """
+        stages = ", ".join(f"{stage}: {count}" for stage, count in self.error_log.by_stage().items())
+        self.error_occurred.emit(f"Run aborted, {self.abort_reason}.\nFailures by stage: {stages}")
+
+    def _decode(self, path, source):
+        """
+        Pipeline decode stage: header duration + decoded/trimmed audio.
+        """
+        from audio_processor import AudioProcessor
+        return AudioProcessor.decode(path, source, self.full_track, self.quality)
+
+    def _extract(self, path, payload):
+        """
+        Pipeline compute stage: feature extraction.
+        """
+        from audio_processor import AudioProcessor
+        return AudioProcessor.extract(path, payload, self.full_track, self.beat_sync, self.quality)
     
+    def job_checkpoint(self):
+        """
+        Checkpoint of this job (same files + same feature settings).
+
+        Returns:
+            JobCheckpoint: The job's checkpoint (may not exist yet).
+        """
+        from checkpoint import JobCheckpoint
+        return JobCheckpoint(self.original_files, self.remastered_files, {
+            'full_track': self.full_track,
+            'beat_sync': self.beat_sync,
+            'quality': self.quality,
+            'feature_precision': self.feature_precision,
+            'key_invariant': self.key_invariant
+        })
+
+    def _open_checkpoint(self):
+        """
+        Loads the checkpoint when resuming, otherwise starts a fresh one.
+
+        Returns:
+            dict: Checkpoint state to resume from, or None.
+        """
+        if not self.use_checkpoint:
+            return None
+        try:
+            self.checkpoint = self.job_checkpoint()
+            state = self.checkpoint.load() if self.resume and self.checkpoint.exists() else None
+            if state is None:
+                self.checkpoint.start()
+            else:
+                print(f"Resuming job {self.checkpoint.job_id}: {len(state['references'])} references, "
+                      f"{len(state['done'])} remastered already done")
+            return state
+        except Exception as e:
+            # Run still works, just without crash recovery
+            print(f"Checkpointing disabled: {str(e)}")
+            self.checkpoint = None
+            return None
+
+    def _save_references(self, records, failed):
+        """
+        Checkpoints a batch of loaded references.
+        """
+        if self.checkpoint:
+            try:
+                self.checkpoint.save_references(records, failed)
+            except Exception as e:
+                print(f"Checkpoint failed: {str(e)}")
+
+    def _save_results(self, results, done):
+        """
+        Checkpoints a batch of completed results.
+        """
+        if self.checkpoint:
+            try:
+                self.checkpoint.save_results(results, done)
+            except Exception as e:
+                print(f"Checkpoint failed: {str(e)}")
+
+    def _store_results(self, results):
+        """
+        Writes a batch of results to the results store.
+        """
+        if not results:
+            return
+        try:
+            self.results_store.add_many(results)
+        except Exception as e:
+            # Not kept in memory, the checkpoint still has them (reported at the end)
+            self.unstored += len(results)
+            print(f"Results store write failed: {str(e)}")
+
+    def _restore_results(self):
+        """
+        Writes the results of a resumed job's checkpoint to the store, one
+        batch at a time.
+        """
+        try:
+            for results in self.checkpoint.results():
+                self._store_results(results)
+        except Exception as e:
+            print(f"Could not restore checkpointed results: {str(e)}")
+
+    def _open_results_store(self):
+        """
+        Opens a store for this run's results when none was given (in
+        memory if the cache dir can't be used).
+        """
+        if self.results_store is not None:
+            return
+        from results_store import ResultsStore, run_store_path
+        try:
+            self.results_store = ResultsStore(run_store_path(self.job_checkpoint().job_id))
+        except Exception as e:
+            print(f"Results store unavailable, keeping results in memory: {str(e)}")
+            self.results_store = ResultsStore(':memory:')
+
+    @staticmethod
+    def _file_size(path):
+        """
+        Size of a file in bytes, None if it can't be read.
+        """
+        try:
+            return os.path.getsize(path) if path else None
+        except OSError:
+            return None
+
+    def _open_score_cache(self):
+        """
+        Opens the persistent pair score cache (None if disabled/unavailable).
+        """
+        if not self.use_score_cache:
+            return None
+        try:
+            from score_cache import ScoreCache
+            return ScoreCache()
+        except Exception as e:
+            # Scores just get recomputed
+            print(f"Score cache unavailable: {str(e)}")
+            return None
+
+    def _mark(self, name):
+        """
+        Records (once) the time since the run started, e.g. time to first result.
+        """
+        if name not in self.timings:
+            self.timings[name] = time.perf_counter() - self._started_at
+            print(f"Time to {name.replace('_', ' ')}: {self.timings[name]:.2f}s")
+
+    def _batch_done(self, work):
+        """
+        Tells the scheduler a file is done and applies its worker count
+        (takes effect as workers go idle).
+
+        Args:
+            work (float): The file's estimated work, the scheduler tunes
+                the workers on work per second.
+
+        Returns:
+            bool: True at the end of a batch.
+        """
+        scheduler = self.scheduler
+        before = (scheduler.batch_size, scheduler.workers)
+        batch_done = scheduler.file_done(work)
+        if self.sandbox:
+            self.sandbox.resize(scheduler.workers)
+        if (scheduler.batch_size, scheduler.workers) != before:
+            print(f"Scheduler: {scheduler.describe()}")
+        return batch_done
+
+    def _memory_in_use(self):
+        """
+        Resident memory of this process + the sandbox workers (None if unknown).
+        """
+        from scheduler import process_rss
+        total = process_rss()
+        if total is None:
+            return None
+        for pid in (self.sandbox.pids() if self.sandbox else []):
+            total += process_rss(pid) or 0
+        return total
+
     def _clear_memory(self):
         """
         Aggressive memory cleanup between batches.
         Garbage collection so memory isnt used up during intensive audio processing.
         """
         gc.collect()
+        if self.scheduler:
+            self.scheduler.after_collect()
     
     # def load_reference(self, path):
     #     """test method for compatibility"""
@@ -195,4 +777,6 @@ class Runner(QThread):
         Stops the processing.
         """
         self.keep_running = False
+        if self.sandbox:
+            self.sandbox.cancel()
         self.wait(1000)  # Wait 1 sec for last thread to finish
\ No newline at end of file
@@ -0,0 +1,351 @@
+import os
+import time
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import wait
+
+# Worker gets killed when a file takes longer than this (hung decoder)
+DEFAULT_TIMEOUT = 120
+# Resident memory a worker may use before it's killed (runaway decoder), None to disable
+DEFAULT_MEMORY_LIMIT_MB = 4096
+# Seconds between checks of the workers' memory
+MEMORY_CHECK_INTERVAL = 0.5
+# Time a worker gets to import the audio stack and warm up
+STARTUP_TIMEOUT = 300
+# Workers dying this often in a row without finishing a file -> give up
+MAX_STARTUP_FAILURES = 3
+
+
+def _worker_main(conn, full_track, beat_sync, quality):
+    """
+    Worker process: decodes + extracts the paths it receives, one at a time.
+    Replies ('ok', path, features, full_duration, elapsed) or
+    ('error', path, stage, exc_type, message, elapsed).
+    """
+    from warmup import configure_jit_cache, warm_up
+    configure_jit_cache()
+    from audio_processor import AudioProcessor
+    try:
+        warm_up()
+    except Exception as e:
+        print(f"Worker warm-up failed: {str(e)}")
+    conn.send(('ready', os.getpid()))
+
+    while True:
+        try:
+            path = conn.recv()
+        except (EOFError, OSError):
+            return
+        if path is None:
+            return
+
+        started = time.perf_counter()
+        stage = 'decode'
+        try:
+            payload, full_duration = AudioProcessor.decode(path, None, full_track, quality)
+            stage = 'compute'
+            features = AudioProcessor.extract(path, payload, full_track, beat_sync, quality)
+            payload = None
+            conn.send(('ok', path, features, full_duration, time.perf_counter() - started))
+        except MemoryError as e:
+            payload = None
+            conn.send(('error', path, 'memory', type(e).__name__, str(e) or "Out of memory",
+                       time.perf_counter() - started))
+        except Exception as e:
+            payload = None
+            conn.send(('error', path, stage, type(e).__name__, str(e),
+                       time.perf_counter() - started))
+
+
+class _Worker:
+    """
+    Supervisor side of one worker process.
+    """
+    __slots__ = ('process', 'conn', 'ready', 'path', 'deadline', 'started')
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.ready = False
+        self.path = None  # File being processed, None when idle
+        self.deadline = time.monotonic() + STARTUP_TIMEOUT
+        self.started = 0.0
+
+
+class SandboxPool:
+    """
+    Supervised worker processes for decoding + feature extraction.
+    A file that hangs the decoder is killed after a timeout, a codec crash
+    or a runaway allocation only takes its worker down, and the worker is
+    restarted. Either way the file comes back as a per-file error and the
+    run continues.
+
+    imap() yields the same dicts as AudioPipeline, in completion order:
+        {'path', 'features', 'full_duration', 'error', 'stage', 'exc_type', 'elapsed'}
+    """
+
+    def __init__(self, workers=2, timeout=DEFAULT_TIMEOUT,
+                 memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB, full_track=False, beat_sync=False,
+                 quality=False):
+        """
+        Args:
+            workers (int): Number of worker processes.
+            timeout (float): Seconds a single file may take before its worker is killed.
+            memory_limit_mb (int): Resident memory a worker may use while
+                it processes a file before it's killed, None to disable.
+                Measured by the supervisor (RSS, not address space: the
+                JIT/BLAS arenas a worker reserves don't count).
+            full_track (bool): Stream whole tracks instead of the first minute.
+            beat_sync (bool): Beat-synchronous features.
+            quality (bool): Also measure loudness/dynamics/bandwidth.
+        """
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.full_track = full_track
+        self.beat_sync = beat_sync
+        self.quality = quality
+        self._context = multiprocessing.get_context('spawn')
+        self._pool = []
+        self._failures = 0  # Workers lost before finishing anything
+        self._cancelled = False
+        self._memory_checked = 0.0
+
+    def imap(self, paths):
+        """
+        Processes the paths in the workers.
+
+        Args:
+            paths (list): Audio file paths, or a queue with popleft()
+                (scheduler.LongestFirst) deciding the order as workers free up.
+
+        Yields:
+            dict: One result per path (pipeline item format).
+        """
+        self._cancelled = False
+        pending = paths if hasattr(paths, 'popleft') else deque(paths)
+        in_flight = 0
+
+        try:
+            while (pending or in_flight) and not self._cancelled:
+                self._fit_pool()
+                for worker in self._pool:
+                    if worker.ready and worker.path is None and pending:
+                        self._assign(worker, pending.popleft())
+                        in_flight += 1
+
+                for index, worker in enumerate(self._pool):
+                    if time.monotonic() < worker.deadline:
+                        continue
+                    if worker.path is None:
+                        # Stuck starting up
+                        self._failures += 1
+                        if self._failures >= MAX_STARTUP_FAILURES:
+                            raise RuntimeError("Analysis workers keep failing to start")
+                        self._replace(index)
+                        continue
+                    # Hung on this file, kill it
+                    in_flight -= 1
+                    item = self._failed(worker, 'timeout', 'TimeoutError',
+                                        f"No result after {self.timeout:.0f}s")
+                    self._replace(index)
+                    yield item
+
+                for index in self._over_memory():
+                    in_flight -= 1
+                    item = self._failed(self._pool[index], 'memory', 'MemoryError',
+                                        f"Worker used more than {self.memory_limit_mb} MB")
+                    self._replace(index)
+                    yield item
+
+                waitables = [w.conn for w in self._pool] + [w.process.sentinel for w in self._pool]
+                # Wake up for the next deadline, and regularly to notice cancel()
+                timeout = min([w.deadline for w in self._pool] + [time.monotonic() + 0.5])
+                ready = wait(waitables, max(0.0, timeout - time.monotonic()))
+
+                for index, worker in enumerate(self._pool):
+                    lost = False
+                    if worker.conn in ready:
+                        try:
+                            message = worker.conn.recv()
+                        except (EOFError, OSError):
+                            # Pipe closed: dying (or as good as dead), don't poll it again
+                            message, lost = None, True
+                        if message is not None:
+                            if message[0] == 'ready':
+                                worker.ready = True
+                                worker.deadline = float('inf')
+                                continue
+                            in_flight -= 1
+                            self._failures = 0
+                            yield self._result(worker, message)
+                            continue
+                    if lost or worker.process.sentinel in ready or not worker.process.is_alive():
+                        item = None
+                        if worker.path is not None:
+                            in_flight -= 1
+                            worker.process.join(1)
+                            exitcode = worker.process.exitcode
+                            item = self._failed(worker, 'crash', 'WorkerCrash',
+                                                "Worker closed its connection" if exitcode is None
+                                                else f"Worker exited with code {exitcode}")
+                        elif not worker.ready:
+                            self._failures += 1
+                            if self._failures >= MAX_STARTUP_FAILURES:
+                                raise RuntimeError("Analysis workers keep failing to start")
+                        self._replace(index)
+                        if item:
+                            yield item
+        finally:
+            # Stopped mid-way, results in flight would leak into the next imap().
+            # No replacements (they'd warm up during shutdown), the next imap() starts them
+            for worker in [w for w in self._pool if w.path is not None]:
+                self._pool.remove(worker)
+                self._kill(worker)
+
+    def cancel(self):
+        """
+        Makes a running imap() return early (runner stopped).
+        """
+        self._cancelled = True
+
+    def resize(self, workers):
+        """
+        Changes the number of workers, also while imap() runs: new ones are
+        started right away, surplus ones stop once they're idle.
+        """
+        self.workers = max(1, workers)
+
+    def pids(self):
+        """
+        Process ids of the running workers (e.g. to measure their memory).
+        """
+        return [worker.process.pid for worker in self._pool if worker.process.is_alive()]
+
+    def close(self):
+        """
+        Shuts all workers down.
+        """
+        for worker in self._pool:
+            try:
+                worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for worker in self._pool:
+            worker.process.join(2)
+            if worker.process.is_alive():
+                worker.process.kill()
+                worker.process.join()
+            worker.conn.close()
+        self._pool = []
+
+    def _fit_pool(self):
+        """
+        Starts or stops (idle) workers until there are self.workers.
+        """
+        while len(self._pool) < self.workers:
+            self._pool.append(self._spawn())
+        for worker in [w for w in self._pool if w.path is None]:
+            if len(self._pool) <= self.workers:
+                break
+            self._pool.remove(worker)
+            try:
+                worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+            worker.process.join(2)
+            if worker.process.is_alive():
+                worker.process.kill()
+                worker.process.join()
+            worker.conn.close()
+
+    def _spawn(self):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.full_track, self.beat_sync, self.quality),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def _replace(self, index):
+        """
+        Kills a worker (if still running) and starts a fresh one in its place.
+        """
+        self._kill(self._pool[index])
+        self._pool[index] = self._spawn()
+
+    @staticmethod
+    def _kill(worker):
+        """
+        Kills a worker (if still running) without waiting for its file.
+        """
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join()
+        worker.conn.close()
+
+    def _over_memory(self):
+        """
+        Busy workers above the memory limit (checked every MEMORY_CHECK_INTERVAL).
+
+        Returns:
+            list: Their indexes in the pool.
+        """
+        now = time.monotonic()
+        if not self.memory_limit_mb or now - self._memory_checked < MEMORY_CHECK_INTERVAL:
+            return []
+        self._memory_checked = now
+        from scheduler import process_rss
+        limit = int(self.memory_limit_mb) * 1024 * 1024
+        over = []
+        for index, worker in enumerate(self._pool):
+            if worker.path is not None and (process_rss(worker.process.pid) or 0) > limit:
+                over.append(index)
+        return over
+
+    def _assign(self, worker, path):
+        worker.conn.send(path)
+        worker.path = path
+        worker.started = time.perf_counter()
+        worker.deadline = time.monotonic() + self.timeout
+
+    @staticmethod
+    def _item(path, elapsed):
+        return {
+            'path': path,
+            'features': None,
+            'full_duration': 0,
+            'error': None,
+            'stage': None,
+            'exc_type': None,
+            'elapsed': elapsed
+        }
+
+    def _result(self, worker, message):
+        """
+        Pipeline item from a worker reply, the worker becomes idle again.
+        """
+        worker.path = None
+        worker.deadline = float('inf')
+        if message[0] == 'ok':
+            _, path, features, full_duration, elapsed = message
+            item = self._item(path, elapsed)
+            item['features'], item['full_duration'] = features, full_duration
+        else:
+            _, path, stage, exc_type, error, elapsed = message
+            item = self._item(path, elapsed)
+            item['stage'], item['exc_type'], item['error'] = stage, exc_type, error
+        return item
+
+    def _failed(self, worker, stage, exc_type, error):
+        """
+        Pipeline item for the file a worker was killed/died on.
+        """
+        item = self._item(worker.path, time.perf_counter() - worker.started)
+        item['stage'], item['exc_type'], item['error'] = stage, exc_type, error
+        print(f"Worker lost on {worker.path}: {error}")
+        worker.path = None
+        return item
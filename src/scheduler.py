@@ -0,0 +1,451 @@
+import os
+import time
+import heapq
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Memory ceiling (share of physical RAM) when none is configured
+DEFAULT_MEMORY_FRACTION = 0.5
+# Above this share of the ceiling batches shrink, workers are retired and garbage is collected
+HIGH_WATER = 0.85
+# Batch size bounds (files between checkpoints/flushes/garbage collections)
+INITIAL_BATCH = 4
+MIN_BATCH = 1
+MAX_BATCH = 64
+# Worker counts are judged over this many files per worker (at least MIN_WINDOW)
+WINDOW_PER_WORKER = 2
+MIN_WINDOW = 4
+# Added workers have to improve throughput by this much to be kept
+MIN_GAIN = 0.05
+# Windows to wait after a probe that didn't pay off before probing again
+PROBE_COOLDOWN = 4
+
+# Per-file work estimate (roughly seconds of one worker): fixed cost +
+# analysed audio * format decode factor + bytes read (higher bitrates)
+FILE_OVERHEAD = 0.3
+SECONDS_PER_AUDIO_SECOND = 0.002
+SECONDS_PER_MB = 0.005
+# Audio analysed per file without full track mode (AudioLoader loads the first minute)
+EXCERPT_SECONDS = 60
+FORMAT_FACTORS = {'.wav': 1.0, '.aiff': 1.0, '.aif': 1.0, '.flac': 1.3, '.mp3': 1.3,
+                  '.ogg': 1.5, '.opus': 1.5, '.m4a': 2.0, '.aac': 2.0, '.wma': 2.0}
+# Duration guess (kbit/s) when the header can't be read without decoding
+TYPICAL_BITRATES = {'.wav': 1411, '.aiff': 1411, '.aif': 1411, '.flac': 900, '.mp3': 256,
+                    '.ogg': 192, '.opus': 128, '.m4a': 256, '.aac': 256, '.wma': 192}
+# Threads probing file headers
+PROBE_THREADS = 8
+
+
+def process_rss(pid=None):
+    """
+    Resident memory of a process (psutil when installed, /proc on Linux).
+
+    Args:
+        pid (int, optional): Process id, defaults to this process.
+
+    Returns:
+        int: Bytes, None when it can't be measured.
+    """
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def physical_memory():
+    """
+    Total physical memory.
+
+    Returns:
+        int: Bytes, None when unknown.
+    """
+    try:
+        import psutil
+        return psutil.virtual_memory().total
+    except ImportError:
+        pass
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def probe_duration(path):
+    """
+    Duration from the file header (soundfile), without decoding.
+
+    Returns:
+        float: Seconds, None when the header can't tell (e.g. m4a).
+    """
+    try:
+        import soundfile as sf
+        info = sf.info(path)
+        return info.frames / info.samplerate if info.samplerate else None
+    except Exception:
+        return None
+
+
+def analysed_seconds(duration, full_track=False):
+    """
+    Audio a file of this duration gets analysed for (seconds).
+    """
+    return duration if full_track else min(duration, EXCERPT_SECONDS)
+
+
+def estimate_work(path, duration=None, full_track=False):
+    """
+    Estimated analysis cost of a file from its duration, format and size
+    (bitrate). Only the ratios between files matter, for ordering and
+    progress.
+
+    Args:
+        path (str): The audio file.
+        duration (float, optional): Header duration, guessed from the size
+            and a typical bitrate of the format when unknown.
+        full_track (bool): Whole track analysed instead of the first minute.
+
+    Returns:
+        float: Estimated work (roughly seconds of one worker).
+    """
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return FILE_OVERHEAD
+    if not duration:
+        duration = size * 8 / 1000 / TYPICAL_BITRATES.get(ext, 256)
+    analysed = analysed_seconds(duration, full_track)
+    read = size * (analysed / duration) if duration else size
+    return (FILE_OVERHEAD + analysed * SECONDS_PER_AUDIO_SECOND * FORMAT_FACTORS.get(ext, 1.5)
+            + read / 2**20 * SECONDS_PER_MB)
+
+
+class WorkEstimates:
+    """
+    Work estimates of a list of files, filled in by header probes running
+    in the background (PROBE_THREADS) so analysis starts right away instead
+    of after probing every header (minutes for a big network share).
+    Files not probed yet count at the average of the probed ones. A file
+    whose estimate is read before its probe came back keeps that guess, so
+    work counted as done never changes afterwards.
+    """
+
+    def __init__(self, paths, full_track=False, threads=PROBE_THREADS):
+        """
+        Args:
+            paths (list): Files to estimate.
+            full_track (bool): Whole tracks analysed instead of the first minute.
+            threads (int): Parallel header probes.
+        """
+        self.paths = list(paths)
+        self._path_set = set(self.paths)
+        self.full_track = full_track
+        self._work = {}  # Path -> estimate (probed or pinned guess)
+        self._sum = 0.0
+        self.probed = []  # Paths in the order their probes came back
+        self._lock = threading.Lock()
+        self._pool = None
+        if self.paths:
+            self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="probe")
+            for path in self.paths:
+                self._pool.submit(self._probe, path)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def _probe(self, path):
+        work = estimate_work(path, probe_duration(path), self.full_track)
+        with self._lock:
+            if path not in self._work:
+                self._set(path, work)
+                self.probed.append(path)
+
+    def _set(self, path, work):
+        self._work[path] = work
+        self._sum += work
+
+    def average(self):
+        """
+        Mean estimate of the files known so far (FILE_OVERHEAD before any).
+        """
+        with self._lock:
+            return self._sum / len(self._work) if self._work else FILE_OVERHEAD
+
+    def get(self, path, default=None):
+        """
+        Estimate of a file, the current average (kept from now on) when
+        its probe hasn't come back yet.
+        """
+        with self._lock:
+            work = self._work.get(path)
+            if work is None:
+                if path not in self._path_set:
+                    return default
+                work = self._sum / len(self._work) if self._work else FILE_OVERHEAD
+                self._set(path, work)
+            return work
+
+    def peek(self, path):
+        """
+        Probed estimate of a file, None while unknown (not pinned).
+        """
+        with self._lock:
+            return self._work.get(path)
+
+    def total(self):
+        """
+        Estimated work of all the files, the ones not probed yet at the average.
+        """
+        with self._lock:
+            unknown = len(self.paths) - len(self._work)
+            average = self._sum / len(self._work) if self._work else FILE_OVERHEAD
+            return self._sum + unknown * average
+
+    def done(self):
+        """
+        Whether every file has an estimate.
+        """
+        with self._lock:
+            return len(self._work) >= len(self.paths)
+
+    def close(self):
+        """
+        Drops the probes that haven't started (run over or cancelled).
+        """
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class LongestFirst:
+    """
+    Longest processing time first order: handing the biggest files out
+    first keeps several workers from idling behind one long file at the
+    end of a run (LPT scheduling). Decided as files are taken (popleft),
+    from the estimates probed by then, so dispatch doesn't wait for the
+    probes; files nobody has probed yet go in their listed order.
+    """
+
+    def __init__(self, paths, estimates):
+        """
+        Args:
+            paths (list): Files to hand out.
+            estimates (WorkEstimates): Their (background) estimates.
+        """
+        self._estimates = estimates
+        self._listed = deque(paths)
+        self._wanted = set(paths)
+        self._taken = set()
+        self._heap = []  # (-work, seq, path) of probed files not taken yet
+        self._seen = 0  # Entries of estimates.probed already on the heap
+
+    def __len__(self):
+        return len(self._wanted) - len(self._taken)
+
+    def popleft(self):
+        """
+        The next file to analyse.
+
+        Raises:
+            IndexError: Nothing left.
+        """
+        probed = self._estimates.probed
+        while self._seen < len(probed):
+            path = probed[self._seen]
+            self._seen += 1
+            if path in self._wanted and path not in self._taken:
+                heapq.heappush(self._heap, (-self._estimates.peek(path), self._seen, path))
+        while self._heap:
+            path = heapq.heappop(self._heap)[2]
+            if path not in self._taken:
+                return self._take(path)
+        while self._listed:
+            path = self._listed.popleft()
+            if path not in self._taken:
+                return self._take(path)
+        raise IndexError("pop from an empty LongestFirst")
+
+    def _take(self, path):
+        self._taken.add(path)
+        return path
+
+
+class AdaptiveScheduler:
+    """
+    Sizes batches and the number of analysis workers at runtime instead of
+    fixed numbers that only suit one machine. After every file it sees the
+    memory in use (this process + the sandbox workers):
+        batch size -> at the end of a batch, doubles while a batch twice
+                      as big still fits well under the ceiling (going by
+                      the memory a file grew it by), halves near it (fewer
+                      checkpoints/collections on big machines, earlier
+                      ones on small ones)
+        workers    -> hill climbing on work per second (the files'
+                      estimated work, see WorkEstimates), measured over a
+                      couple of files per worker: more workers (a quarter
+                      more at a time) while that helps and their memory
+                      fits, back off when it doesn't or memory gets tight.
+                      Not files per second: longest first dispatch makes
+                      that rise over a run by itself
+    Fixed values (batch_size/workers given) are kept as they are.
+    """
+
+    def __init__(self, memory_limit_mb=None, batch_size=None, workers=None, max_workers=None,
+                 initial_workers=None, measure=None):
+        """
+        Args:
+            memory_limit_mb (int, optional): Memory ceiling, defaults to
+                DEFAULT_MEMORY_FRACTION of physical RAM.
+            batch_size (int, optional): Fixed batch size, adaptive when None.
+            workers (int, optional): Fixed worker count, adaptive when None.
+            max_workers (int, optional): Upper bound of the adaptive worker
+                count, defaults to the CPU count.
+            initial_workers (int, optional): Adaptive starting point.
+            measure (callable, optional): Returns the memory in use (bytes),
+                defaults to this process' RSS.
+        """
+        if memory_limit_mb:
+            self.memory_limit = int(memory_limit_mb) * 1024 * 1024
+        else:
+            total = physical_memory()
+            self.memory_limit = int(total * DEFAULT_MEMORY_FRACTION) if total else None
+        self.adaptive_batch = batch_size is None
+        self.adaptive_workers = workers is None
+        self.batch_size = max(MIN_BATCH, batch_size or INITIAL_BATCH)
+        self.max_workers = max(1, max_workers or os.cpu_count() or 1)
+        self.workers = max(1, workers or initial_workers or 1)
+        if self.adaptive_workers:
+            self.workers = min(self.workers, self.max_workers)
+        self.measure = measure or process_rss
+
+        self.memory = self.measure()
+        self._batch_files = 0
+        self._batch_memory = self.memory
+        self._window_files = 0
+        self._window_work = 0.0
+        self._window_started = time.perf_counter()
+        self._baseline = None  # Throughput before the workers being probed were added
+        self._probe = 0  # Workers added by the running probe
+        self._settling = False
+        self._cooldown = 0
+        self.per_file = 0  # Memory growth per file (bytes, last batch)
+        self.per_worker = None  # Memory per worker (bytes), from the measurements
+
+    def file_done(self, work=1.0):
+        """
+        Records one finished file. self.workers may change on any file.
+
+        Args:
+            work (float): Its estimated work (WorkEstimates), the worker
+                count follows work per second (1 per file: files per second).
+
+        Returns:
+            bool: True at the end of a batch (time to checkpoint/flush/collect),
+            also early when memory gets close to the ceiling.
+        """
+        self._batch_files += 1
+        self._window_files += 1
+        self._window_work += work
+        self.memory = self.measure()
+        if self._window_files >= max(MIN_WINDOW, WINDOW_PER_WORKER * self.workers):
+            self._end_window()
+        if self._batch_files >= self.batch_size or self.under_pressure():
+            self._end_batch()
+            return True
+        return False
+
+    def under_pressure(self):
+        """
+        Whether the memory in use is close to the ceiling.
+        """
+        return bool(self.memory_limit and self.memory
+                    and self.memory > self.memory_limit * HIGH_WATER)
+
+    def after_collect(self):
+        """
+        Re-measures after the caller freed memory (e.g. gc.collect()) so
+        the next batch's growth isn't counted from before the collection.
+        """
+        self.memory = self._batch_memory = self.measure()
+
+    def set_workers(self, workers):
+        """
+        The workers actually running (e.g. a fixed pool), for the per-worker estimate.
+        """
+        self.workers = max(1, workers)
+
+    def _end_batch(self):
+        if self.memory is not None and self._batch_memory is not None:
+            self.per_file = max(0, (self.memory - self._batch_memory) // self._batch_files)
+        if self.adaptive_batch:
+            self._resize_batch()
+        self._batch_files = 0
+        self._batch_memory = self.memory
+
+    def _resize_batch(self):
+        if self.under_pressure():
+            self.batch_size = max(MIN_BATCH, self.batch_size // 2)
+        elif self.memory_limit is None or self.memory is None:
+            # Nothing to go by besides fewer pauses
+            self.batch_size = min(MAX_BATCH, self.batch_size * 2)
+        elif self.memory + self.per_file * self.batch_size * 2 < self.memory_limit * HIGH_WATER:
+            self.batch_size = min(MAX_BATCH, self.batch_size * 2)
+
+    def _end_window(self):
+        now = time.perf_counter()
+        throughput = self._window_work / max(now - self._window_started, 1e-6)
+        if self.memory is not None:
+            self.per_worker = self.memory // (self.workers + 1)  # Workers + this process
+        if self.adaptive_workers:
+            self._resize_workers(throughput)
+        self._window_files = 0
+        self._window_work = 0.0
+        self._window_started = now
+
+    def _resize_workers(self, throughput):
+        change = 0
+        if self.under_pressure():
+            change = -max(1, self.workers // 4)
+            self._baseline, self._settling = None, False
+        elif self._settling:
+            # The new workers started up during this window, judge the next one
+            self._settling = False
+        elif self._baseline is not None:
+            if throughput < self._baseline * (1 + MIN_GAIN):
+                # Didn't pay off: undo it, wait before probing again
+                change = -self._probe
+                self._cooldown = PROBE_COOLDOWN
+            self._baseline = None
+        elif self._cooldown:
+            self._cooldown -= 1
+        else:
+            change = self._probe = self._room_for_workers(max(1, self.workers // 4))
+            if change:
+                self._baseline, self._settling = throughput, True
+        self.workers = min(self.max_workers, max(1, self.workers + change))
+
+    def _room_for_workers(self, wanted):
+        """
+        How many of the wanted extra workers fit (CPU count, memory ceiling).
+        """
+        wanted = min(wanted, self.max_workers - self.workers)
+        if wanted <= 0 or self.memory_limit is None or self.memory is None or self.per_worker is None:
+            return max(0, wanted)
+        room = (self.memory_limit * HIGH_WATER - self.memory) // max(1, self.per_worker)
+        return int(max(0, min(wanted, room)))
+
+    def describe(self):
+        """
+        One line summary for the log.
+        """
+        memory = f"{self.memory / 2**20:.0f} MB" if self.memory else "unknown"
+        limit = f"{self.memory_limit / 2**20:.0f} MB" if self.memory_limit else "none"
+        return f"batch {self.batch_size}, workers {self.workers}, memory {memory} of {limit}"
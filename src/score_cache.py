@@ -0,0 +1,147 @@
+import os
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+
+# SQLite's default limit on bound variables is 999 on older builds
+_CHUNK = 500
+
+
+def feature_hash(features):
+    """
+    Content hash of a feature dict (names, dtypes, shapes and values).
+    Identical audio + extraction settings always give the same hash, so it
+    survives renames and reruns.
+
+    Args:
+        features (dict): Features from FeatureExtractor.
+
+    Returns:
+        str: Hex digest.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for name in sorted(features):
+        if name == 'quality':
+            continue  # Measurements only, they don't change the scores
+        value = np.ascontiguousarray(features[name])
+        digest.update(f"{name}:{value.dtype.str}:{value.shape};".encode())
+        digest.update(value.tobytes())
+    return digest.hexdigest()
+
+
+class ScoreCache:
+    """
+    Persistent pairwise similarity cache with size bounded LRU eviction.
+    Keyed by (query feature hash, reference feature hash, comparator
+    version/params) and stored in a local SQLite file, so reruns and
+    rematches skip the DTW for pairs that were already scored.
+    """
+
+    def __init__(self, path=None, max_entries=2_000_000):
+        """
+        Args:
+            path (str, optional): SQLite file. Defaults to the user cache dir.
+            max_entries (int): Least recently used pairs are evicted past this.
+        """
+        if path is None:
+            from app_paths import user_cache_dir
+            path = os.path.join(user_cache_dir(), 'scores.sqlite')
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS scores (
+                query TEXT NOT NULL,
+                reference TEXT NOT NULL,
+                params TEXT NOT NULL,
+                score REAL NOT NULL,
+                used INTEGER NOT NULL,
+                PRIMARY KEY (query, reference, params)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS scores_used ON scores(used)")
+        self._conn.commit()
+
+        self._clock = self._conn.execute("SELECT COALESCE(MAX(used), 0) FROM scores").fetchone()[0]
+        self._count = self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def get_many(self, query_hash, reference_hashes, params):
+        """
+        Looks up the cached scores of one query against many references.
+        Hits are marked as recently used.
+
+        Args:
+            query_hash (str): Hash of the query features.
+            reference_hashes (list): Hashes of the reference features.
+            params (str): Comparator version/params key.
+
+        Returns:
+            dict: Reference hash -> score for the pairs that were cached.
+        """
+        found = {}
+        with self._lock:
+            self._clock += 1
+            for i in range(0, len(reference_hashes), _CHUNK):
+                chunk = reference_hashes[i:i + _CHUNK]
+                marks = ','.join('?' * len(chunk))
+                args = [query_hash, params, *chunk]
+                found.update(self._conn.execute(
+                    f"SELECT reference, score FROM scores "
+                    f"WHERE query = ? AND params = ? AND reference IN ({marks})", args))
+                self._conn.execute(
+                    f"UPDATE scores SET used = {self._clock} "
+                    f"WHERE query = ? AND params = ? AND reference IN ({marks})", args)
+            self._conn.commit()
+        self.hits += len(found)
+        self.misses += len(reference_hashes) - len(found)
+        return found
+
+    def put_many(self, query_hash, scores, params):
+        """
+        Stores newly computed scores of one query, evicting old pairs if full.
+
+        Args:
+            query_hash (str): Hash of the query features.
+            scores (list): (reference hash, score) pairs.
+            params (str): Comparator version/params key.
+        """
+        if not scores:
+            return
+        with self._lock:
+            self._clock += 1
+            cursor = self._conn.executemany(
+                "INSERT OR REPLACE INTO scores (query, reference, params, score, used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(query_hash, ref_hash, params, float(score), self._clock)
+                 for ref_hash, score in scores])
+            self._count += max(cursor.rowcount, 0)
+            if self._count > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """
+        Drops the least recently used pairs, down to 90% of max_entries so
+        eviction is amortized over many inserts.
+        """
+        self._count = self._conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        excess = self._count - int(self.max_entries * 0.9)
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM scores WHERE (query, reference, params) IN "
+                "(SELECT query, reference, params FROM scores ORDER BY used LIMIT ?)", (excess,))
+            self._count -= excess
+
+    def close(self):
+        """
+        Closes the database.
+        """
+        with self._lock:
+            self._conn.close()
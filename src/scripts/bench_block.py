@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+# Run from anywhere, modules live in src/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_precision import scan, extract
+from comparator import AudioComparator
+from feature_store import ReferenceRecord
+
+
+def main(argv=None):
+    """
+    Checks block scoring on a corpus: scores every remaster against every
+    original pair by pair (_safe_similarity) and as one block
+    (score_block), then the top N of every remaster with top_matches()
+    and top_matches_many(). Reports the times and verifies both ways give
+    the same scores and top N.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('originals', help="Folder of original files")
+    parser.add_argument('remastered', help="Folder of remastered files")
+    parser.add_argument('--top-n', type=int, default=5, help="Candidates kept per query")
+    parser.add_argument('--key-invariant', action='store_true', help="Also try the best key shift")
+    args = parser.parse_args(argv)
+
+    references = extract(scan(args.originals))
+    queries = extract(scan(args.remastered))
+    if not references or not queries:
+        print("Nothing to compare")
+        return 1
+
+    def comparator():
+        c = AudioComparator(top_n=args.top_n, key_invariant=args.key_invariant)
+        for path, features in references.items():
+            c.references.add(ReferenceRecord(features, 0, path))
+        return c
+
+    query_features = list(queries.values())
+    pairwise, block = comparator(), comparator()
+    # Compile the DTW kernels before timing anything
+    first = next(iter(references.values()))
+    pairwise._safe_similarity(first, first)
+    block.score_block([first], block.references.keys()[:1])
+
+    started = time.perf_counter()
+    scores = np.array([[pairwise._safe_similarity(q, r.features) for r in pairwise.references.values()]
+                       for q in query_features], dtype=np.float64)
+    pairwise_time = time.perf_counter() - started
+    started = time.perf_counter()
+    _, block_scores = block.score_block(query_features)
+    block_time = time.perf_counter() - started
+    difference = float(np.nanmax(np.abs(scores - block_scores)))
+
+    one_by_one, many = comparator(), comparator()
+    started = time.perf_counter()
+    single = [one_by_one.top_matches(q) for q in query_features]
+    single_time = time.perf_counter() - started
+    started = time.perf_counter()
+    batched = many.top_matches_many(query_features)
+    many_time = time.perf_counter() - started
+
+    def same(a, b):
+        return ([r['reference'] for r in a] == [r['reference'] for r in b]
+                and np.allclose([r['similarity'] for r in a], [r['similarity'] for r in b], atol=1e-6)
+                and [r.get('timeline') for r in a] == [r.get('timeline') for r in b])
+
+    differing = [path for path, a, b in zip(queries, single, batched) if not same(a, b)]
+
+    print(f"{len(queries)} queries x {len(references)} references, top {args.top_n}"
+          + (", key invariant" if args.key_invariant else ""))
+    print(f"All pairs: {pairwise_time:.2f}s pair by pair, {block_time:.2f}s as a block "
+          f"({pairwise_time / max(block_time, 1e-9):.1f}x faster), largest score difference {difference:.1e}")
+    print(f"Top N: {single_time:.2f}s one query at a time, {many_time:.2f}s in blocks "
+          f"({single_time / max(many_time, 1e-9):.1f}x faster)")
+    print(f"DTWs one at a time: {one_by_one.dtw_stats}, in blocks: {many.dtw_stats}")
+    if difference > 1e-6 or differing:
+        print(f"Results differ ({len(differing)} queries): {', '.join(differing[:5])}")
+        return 1
+    print("Same scores and top N")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
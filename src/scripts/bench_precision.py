@@ -0,0 +1,74 @@
+import os
+import sys
+import glob
+
+# Run from anywhere, modules live in src/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_processor import AudioLoader, FeatureExtractor
+from comparator import AudioComparator
+from feature_store import CompactFeatures, PRECISIONS
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.flac', '.ogg', '.m4a')
+
+
+def scan(folder):
+    """
+    Audio files in a folder (recursive).
+    """
+    return sorted(p for p in glob.glob(os.path.join(folder, '**', '*'), recursive=True)
+                  if p.lower().endswith(AUDIO_EXTENSIONS))
+
+
+def extract(paths):
+    """
+    Full precision features for every readable file.
+    """
+    features = {}
+    for path in paths:
+        try:
+            y, sr, rms = AudioLoader.load_audio(path, with_energy=True)
+            features[path] = FeatureExtractor.extract_features(y, sr, energy=rms)
+        except Exception as e:
+            print(f"Skipping {path}: {str(e)}")
+    return features
+
+
+def main():
+    """
+    Verifies compact feature storage on a corpus: scores every remaster
+    against every original with full precision and with each compact
+    precision, then reports the largest score difference, changed best
+    matches and reference memory.
+    Usage: python scripts/bench_precision.py ORIGINALS_DIR REMASTERED_DIR
+    """
+    if len(sys.argv) != 3:
+        print(main.__doc__)
+        sys.exit(1)
+
+    references = extract(scan(sys.argv[1]))
+    queries = extract(scan(sys.argv[2]))
+    comparator = AudioComparator()
+
+    def score_all(ref_features):
+        return {q: {r: comparator._safe_similarity(qf, rf) for r, rf in ref_features.items()}
+                for q, qf in queries.items()}
+
+    baseline = score_all(references)
+    baseline_bytes = sum(sum(v.nbytes for v in f.values()) for f in references.values())
+    print(f"float32 dicts: {baseline_bytes / 1024:.1f} KiB for {len(references)} references")
+
+    for precision in PRECISIONS:
+        compact = {r: CompactFeatures(f, precision) for r, f in references.items()}
+        scores = score_all(compact)
+        max_diff = max((abs(scores[q][r] - baseline[q][r]) for q in scores for r in scores[q]),
+                       default=0.0)
+        changed = sum(max(scores[q], key=scores[q].get) != max(baseline[q], key=baseline[q].get)
+                      for q in scores if scores[q])
+        nbytes = sum(f.nbytes for f in compact.values())
+        print(f"{precision}: {nbytes / 1024:.1f} KiB ({baseline_bytes / max(nbytes, 1):.1f}x smaller), "
+              f"max score diff {max_diff:.2e}, best match changed for {changed}/{len(scores)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+import argparse
+
+# Run from anywhere, modules live in src/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_precision import scan, extract
+from comparator import AudioComparator
+from feature_store import ReferenceRecord
+
+
+def scan_all(comparator, queries):
+    """
+    Top N of every query + the time it took.
+    """
+    started = time.perf_counter()
+    results = {q: comparator.top_matches(qf) for q, qf in queries.items()}
+    return results, time.perf_counter() - started
+
+
+def main(argv=None):
+    """
+    Checks DTW pruning on a corpus: scans every remaster against the
+    originals exhaustively and with pruning, verifies both give the same
+    top N (ids, scores and timelines) and reports how many DTWs the lower
+    bounds and early abandoning avoided.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('originals', help="Folder of original files")
+    parser.add_argument('remastered', help="Folder of remastered files")
+    parser.add_argument('--top-n', type=int, default=5, help="Candidates kept per query")
+    parser.add_argument('--key-invariant', action='store_true', help="Also try the best key shift")
+    args = parser.parse_args(argv)
+
+    references = extract(scan(args.originals))
+    queries = extract(scan(args.remastered))
+    if not references or not queries:
+        print("Nothing to compare")
+        return 1
+
+    comparators = {}
+    for prune in (False, True):
+        comparator = AudioComparator(top_n=args.top_n, key_invariant=args.key_invariant, prune=prune)
+        for path, features in references.items():
+            comparator.references.add(ReferenceRecord(features, 0, path))
+        comparators[prune] = comparator
+
+    # Compile the DTW kernels before timing anything
+    first = next(iter(references.values()))
+    comparators[False]._safe_similarity(first, first)
+    comparators[False].dtw_stats.update(completed=0, abandoned=0, skipped=0)
+
+    exhaustive, exhaustive_time = scan_all(comparators[False], queries)
+    pruned, pruned_time = scan_all(comparators[True], queries)
+
+    def summary(results):
+        return [(r['reference'], r['similarity'], r.get('timeline')) for r in results]
+
+    differing = [q for q in queries if summary(exhaustive[q]) != summary(pruned[q])]
+
+    total = comparators[False].dtw_stats['completed']
+    stats = comparators[True].dtw_stats
+    print(f"{len(queries)} queries x {len(references)} references, top {args.top_n}"
+          + (", key invariant" if args.key_invariant else ""))
+    print(f"Exhaustive: {total} DTWs in {exhaustive_time:.2f}s")
+    print(f"Pruned: {stats['completed']} completed, {stats['abandoned']} abandoned early, "
+          f"{stats['skipped']} skipped in {pruned_time:.2f}s "
+          f"({exhaustive_time / max(pruned_time, 1e-9):.1f}x faster)")
+    print(f"DTWs avoided: {stats['skipped'] / max(total, 1):.1%} skipped, "
+          f"{(stats['skipped'] + stats['abandoned']) / max(total, 1):.1%} skipped or abandoned")
+    if differing:
+        print(f"Top N differs for {len(differing)} queries: {', '.join(differing[:5])}")
+        return 1
+    print("Top N identical to the exhaustive scan")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+import os
+import sys
+import json
+import statistics
+import tempfile
+import subprocess
+
+# Runs inside a fresh interpreter so every run is a cold start
+PROBE = r"""
+import sys, time, json
+start = time.perf_counter()
+from PyQt5.QtWidgets import QApplication
+app = QApplication(sys.argv)
+import main
+window = main.ComparisonGUI()
+window.show()
+app.processEvents()
+shown = time.perf_counter() - start
+ready = {}
+window.warmup.warmed_up.connect(lambda _: ready.setdefault('t', time.perf_counter() - start))
+window.warmup.warmed_up.connect(lambda _: app.quit())
+if window.warmup.isFinished():
+    ready.setdefault('t', time.perf_counter() - start)
+else:
+    app.exec_()
+print(json.dumps({'window_shown': shown, 'engine_ready': ready.get('t', -1)}))
+"""
+
+# Time to first comparison result on two tiny synthetic files
+FIRST_RESULT_PROBE = r"""
+import sys, os, time, json, tempfile
+import numpy as np, soundfile as sf
+from PyQt5.QtCore import QCoreApplication
+app = QCoreApplication(sys.argv)
+from runner import Runner
+tmp = tempfile.mkdtemp()
+sr = 22050
+t = np.arange(sr * 5) / sr
+paths = []
+for name in ('orig.wav', 'remaster.wav'):
+    paths.append(os.path.join(tmp, name))
+    sf.write(paths[-1], 0.5 * np.sin(2 * np.pi * 330 * t), sr)
+warmup = 0.0
+if sys.argv[-1] == 'warm':
+    from warmup import warm_up
+    warmup = warm_up()
+runner = Runner([paths[0]], [paths[1]])
+runner.run()
+runner.results_store.delete()
+print(json.dumps({'first_result': runner.timings.get('first_result', -1), 'warmup': warmup}))
+"""
+
+
+def run_probe(src_dir):
+    """
+    Starts the app once in a new process and times it.
+
+    Args:
+        src_dir (string): Path to src/ (where main.py lives).
+
+    Returns:
+        (dict): Seconds until the window was shown and until warm-up finished.
+    """
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=src_dir, env=env,
+                         capture_output=True, text=True, check=True)
+    # Last line is the JSON, the app prints debug lines before it
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run_first_result_probe(src_dir, numba_cache_dir=None, warm=False):
+    """
+    Runs one comparison in a new process and times the first result.
+
+    Args:
+        src_dir (string): Path to src/.
+        numba_cache_dir (string): NUMBA_CACHE_DIR to use (None = app default).
+        warm (boolean): Run the warm-up routine before starting the runner.
+
+    Returns:
+        (dict): Seconds to the first result (and the warm-up time).
+    """
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    env.pop("NUMBA_CACHE_DIR", None)
+    if numba_cache_dir:
+        env["NUMBA_CACHE_DIR"] = numba_cache_dir
+    out = subprocess.run([sys.executable, "-c", FIRST_RESULT_PROBE,
+                          "warm" if warm else "cold"], cwd=src_dir, env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def report(name, values):
+    """
+    Prints median/min/max of a list of timings.
+    """
+    print(f"{name}: median {statistics.median(values):.3f}s "
+          f"(min {min(values):.3f}s, max {max(values):.3f}s, {len(values)} runs)")
+
+
+def main():
+    """
+    Startup benchmark: median time to first window, to a warm audio engine
+    and to the first comparison result (with an empty JIT cache, with the
+    persistent JIT cache, and after the background warm-up).
+    Usage: python scripts/bench_startup.py [runs]
+    """
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    samples = [run_probe(src_dir) for _ in range(runs)]
+    for key in ('window_shown', 'engine_ready'):
+        report(key, [s[key] for s in samples])
+
+    # Fresh cache dir per run = what every launch of the one-file build paid
+    cold = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cold.append(run_first_result_probe(src_dir, cache_dir)['first_result'])
+    report("first_result (empty JIT cache)", cold)
+
+    run_first_result_probe(src_dir)  # Populate the persistent cache
+    report("first_result (persistent JIT cache)",
+           [run_first_result_probe(src_dir)['first_result'] for _ in range(runs)])
+
+    warm = [run_first_result_probe(src_dir, warm=True) for _ in range(runs)]
+    report("first_result (after warm-up)", [w['first_result'] for w in warm])
+    report("warm-up (in background)", [w['warmup'] for w in warm])
+
+
+if __name__ == "__main__":
+    main()
@@ -181,7 +181,11 @@ def cleanup_build():
 def main():
     """
     Main function to build the executable using PyInstaller.
+    Pass --onedir for a folder build that starts faster (no temp extraction).
     """
+    onedir = "--onedir" in sys.argv[1:]
+    os.environ["AUDIOMATCH_ONEDIR"] = "1" if onedir else "0"
+
     scripts_dir = os.path.dirname(os.path.abspath(__file__))
     src_dir = os.path.dirname(scripts_dir)
     spec_file = os.path.join(src_dir, "AudioMatch.spec")
@@ -205,7 +209,11 @@ def main():
     with open(version_file, 'r') as f:
         version = f.read().strip()
 
-    exe_path = os.path.join(src_dir, "dist", f"AudioMatch_{version}.exe")
+    if onedir:
+        exe_path = os.path.join(src_dir, "dist", f"AudioMatch_{version}",
+                                f"AudioMatch_{version}.exe")
+    else:
+        exe_path = os.path.join(src_dir, "dist", f"AudioMatch_{version}.exe")
     if os.path.exists(exe_path):
         print(f"Build successful! Executable created at: {exe_path}")
     else:
@@ -0,0 +1,502 @@
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlsplit
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.flac', '.ogg', '.m4a')
+
+# Finished jobs kept for GET /results (oldest dropped first)
+MAX_JOBS = 10000
+# Biggest request body accepted (JSON only, audio is read from paths)
+MAX_BODY = 1024 * 1024
+
+_REASONS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found',
+            405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class MatchService:
+    """
+    Long-running local matching service (HTTP + JSON on localhost).
+    Reference features and the AudioComparator are loaded once and kept in
+    memory, so an ingest system can ask for the best original of each new
+    remaster without starting the GUI or reloading the references.
+
+    Endpoints:
+        GET    /health                 status, reference count, queue size
+        POST   /match                  {"path": ..., "wait": true} -> result or job id
+        GET    /results                recent jobs
+        GET    /results/<id>           one job (status + result)
+        GET    /references             loaded references (id, name, path)
+        POST   /references             {"paths": [...]} add (or reload) references
+        DELETE /references/<id>        remove a reference
+
+    Match requests are batched: the files of a batch are analysed in
+    parallel on a bounded thread pool, then compared in one go on the
+    comparator thread. All comparator access (compare/add/remove) runs on
+    that single thread so references can change while matching.
+    """
+
+    def __init__(self, host='127.0.0.1', port=8765, workers=2, batch_size=8,
+                 batch_window=0.05, full_track=False, beat_sync=False,
+                 key_invariant=False, feature_precision='uint8', use_score_cache=True,
+                 quality=False):
+        """
+        Args:
+            host (str): Interface to listen on (keep it local).
+            port (int): Port to listen on, 0 picks a free one (see self.port).
+            workers (int): Threads decoding/analysing files.
+            batch_size (int): Max match requests handled together.
+            batch_window (float): Seconds to wait for more requests to fill a batch.
+            full_track (bool): Stream whole tracks instead of the first minute.
+            beat_sync (bool): Beat-synchronous features.
+            key_invariant (bool): Also match remasters transposed by semitones.
+            feature_precision (str): Chroma storage of the references.
+            use_score_cache (bool): Reuse pair scores from earlier runs.
+            quality (bool): Measure loudness/dynamics/bandwidth, results get
+                the remaster vs original deltas.
+        """
+        self.host = host
+        self.port = port
+        self.batch_size = max(1, batch_size)
+        self.batch_window = batch_window
+        self.full_track = full_track
+        self.beat_sync = beat_sync
+        self.key_invariant = key_invariant
+        self.feature_precision = feature_precision
+        self.use_score_cache = use_score_cache
+        self.quality = quality
+
+        self.comparator = None
+        self.jobs = OrderedDict()  # job id -> job dict
+        self._workers = ThreadPoolExecutor(max_workers=max(1, workers),
+                                           thread_name_prefix="match-worker")
+        self._compare_thread = ThreadPoolExecutor(max_workers=1,
+                                                  thread_name_prefix="match-compare")
+        self._queue = None
+        self._server = None
+        self._batcher = None
+        self._started_at = time.time()
+
+    async def start(self):
+        """
+        Loads the comparator and starts listening.
+        """
+        loop = asyncio.get_running_loop()
+        self.comparator = await loop.run_in_executor(self._compare_thread, self._make_comparator)
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._batch_loop())
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        print(f"Match service listening on http://{self.host}:{self.port}")
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def close(self):
+        """
+        Stops listening and shuts the pools down.
+        """
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._batcher:
+            self._batcher.cancel()
+        self._workers.shutdown(wait=False, cancel_futures=True)
+        cache = self.comparator.score_cache if self.comparator else None
+        if cache is not None:
+            self._compare_thread.submit(cache.close)
+        self._compare_thread.shutdown(wait=True)
+
+    async def add_references(self, paths):
+        """
+        Analyses files and adds them as references. A path that is already
+        loaded is re-analysed in place and keeps its reference id.
+
+        Args:
+            paths (list): Reference audio file paths.
+
+        Returns:
+            dict: 'added' {id, name, path} and 'failed' {path, error} entries.
+        """
+        loop = asyncio.get_running_loop()
+        analysed = await asyncio.gather(
+            *(loop.run_in_executor(self._workers, self._analyse, path) for path in paths))
+        records, failed = [], []
+        for path, (features, full_duration, error) in zip(paths, analysed):
+            if error:
+                failed.append({'path': path, 'error': error})
+            else:
+                records.append((features, full_duration, path))
+        added = await loop.run_in_executor(self._compare_thread, self._store_references, records)
+        return {'added': added, 'failed': failed}
+
+    async def remove_reference(self, ref_id):
+        """
+        Removes a reference by id.
+
+        Returns:
+            bool: Whether it was loaded.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._compare_thread, self._remove_reference, ref_id)
+
+    async def list_references(self):
+        """
+        Loaded references.
+
+        Returns:
+            list: {id, name, path} per reference.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._compare_thread,
+            lambda: [self._describe_reference(ref_id, record)
+                     for ref_id, record in self.comparator.references.items()])
+
+    async def submit(self, path):
+        """
+        Queues a match request.
+
+        Args:
+            path (str): Remastered file to match.
+
+        Returns:
+            dict: The job (status 'queued', later 'done'/'failed').
+        """
+        job = {
+            'id': uuid.uuid4().hex,
+            'path': path,
+            'status': 'queued',
+            'submitted': time.time(),
+            'result': None,
+            'error': None,
+        }
+        self.jobs[job['id']] = job
+        while len(self.jobs) > MAX_JOBS:
+            self.jobs.popitem(last=False)
+        job['_done'] = asyncio.get_running_loop().create_future()
+        await self._queue.put((job, job['_done']))
+        return job
+
+    async def _batch_loop(self):
+        """
+        Takes up to batch_size queued requests (waiting at most batch_window
+        for the batch to fill), analyses them in parallel and compares them
+        in one call on the comparator thread.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            for job, _ in batch:
+                job['status'] = 'running'
+            try:
+                analysed = await asyncio.gather(
+                    *(loop.run_in_executor(self._workers, self._analyse, job['path'])
+                      for job, _ in batch))
+                results = await loop.run_in_executor(self._compare_thread, self._compare_batch,
+                                                     [job['path'] for job, _ in batch], analysed)
+                for (job, done), (result, error) in zip(batch, results):
+                    self._finish(job, done, result, error)
+            except Exception as e:
+                for job, done in batch:
+                    self._finish(job, done, None, str(e))
+
+    @staticmethod
+    def _finish(job, done, result, error):
+        job['status'] = 'failed' if error else 'done'
+        job['result'], job['error'] = result, error
+        job['finished'] = time.time()
+        if not done.done():
+            done.set_result(job)
+
+    def _make_comparator(self):
+        """
+        Comparator thread: imports the audio stack and builds the comparator.
+        """
+        from warmup import configure_jit_cache
+        configure_jit_cache()
+        from comparator import AudioComparator
+        score_cache = None
+        if self.use_score_cache:
+            try:
+                from score_cache import ScoreCache
+                score_cache = ScoreCache()
+            except Exception as e:
+                print(f"Score cache unavailable: {str(e)}")
+        return AudioComparator(score_cache=score_cache, key_invariant=self.key_invariant)
+
+    def _analyse(self, path):
+        """
+        Worker thread: decode + feature extraction of one file.
+
+        Returns:
+            tuple: (features, full duration, error message or None).
+        """
+        try:
+            from audio_processor import AudioProcessor
+            payload, full_duration = AudioProcessor.decode(path, None, self.full_track, self.quality)
+            features = AudioProcessor.extract(path, payload, self.full_track, self.beat_sync,
+                                              self.quality)
+            return features, full_duration, None
+        except Exception as e:
+            return None, 0, str(e)
+
+    def _store_references(self, records):
+        """
+        Comparator thread: adds analysed references as compact records
+        (updates the ones already loaded from the same path).
+
+        Returns:
+            list: {id, name, path} per stored reference.
+        """
+        from feature_store import CompactFeatures, ReferenceRecord
+        references = self.comparator.references
+        stored = []
+        for features, full_duration, path in records:
+            record = ReferenceRecord(CompactFeatures(features, self.feature_precision),
+                                     full_duration, path)
+            ref_id = references.by_path(path)
+            if ref_id is None:
+                ref_id = references.add(record)
+            else:
+                references.update(ref_id, record)
+            stored.append(self._describe_reference(ref_id, record))
+        return stored
+
+    def _remove_reference(self, ref_id):
+        """
+        Comparator thread: removes a reference, False if it isn't loaded.
+        """
+        if ref_id not in self.comparator.references:
+            return False
+        self.comparator.references.remove(ref_id)
+        return True
+
+    @staticmethod
+    def _describe_reference(ref_id, record):
+        return {'id': ref_id, 'name': record.name, 'path': record.path}
+
+    def _compare_batch(self, paths, analysed):
+        """
+        Comparator thread: compares a batch of analysed files.
+
+        Returns:
+            list: (result dict or None, error or None) per file.
+        """
+        results = []
+        for path, (features, full_duration, error) in zip(paths, analysed):
+            if error:
+                results.append((None, error))
+                continue
+            try:
+                results.append((self._result(path, features, full_duration), None))
+            except Exception as e:
+                results.append((None, str(e)))
+        return results
+
+    def _result(self, path, features, full_duration):
+        """
+        Same fields as the runner's result entries (minus GUI bookkeeping).
+        """
+        from quality import DELTA_KEYS, quality_deltas
+        match, details = self.comparator.compare_features(features, full_duration)
+        details = details if isinstance(details, dict) else {}
+        references = self.comparator.references
+        quality = features.get('quality')
+
+        def describe(entry):
+            ref_data = references.get(entry['reference'])
+            described = {
+                'reference': entry['reference'],
+                'name': entry['name'],
+                'similarity': float(entry['similarity']),
+                'orig_path': ref_data.path if ref_data else '',
+                'orig_duration': ref_data.full_duration if ref_data else 0,
+                'coverage': entry.get('coverage'),
+                'timeline': entry.get('timeline')
+            }
+            if quality and ref_data:
+                described.update(quality_deltas(quality, ref_data.features.get('quality')))
+            return described
+
+        best = describe(match) if match else None
+        deltas = {key: best.get(key) if best else None for key in DELTA_KEYS}
+        return {
+            **deltas,
+            'path': path,
+            'match': best['name'] if best else "No match",
+            'reference_id': best['reference'] if best else None,
+            'confidence': best['similarity'] if best else 0.0,
+            'orig_path': best['orig_path'] if best else '',
+            'orig_duration': best['orig_duration'] if best else 0,
+            'rem_duration': full_duration,
+            'candidates': [describe(entry) for entry in details.get('results', [])],
+            'margin': details.get('margin', 0.0),
+            'ambiguous': details.get('ambiguous', False),
+            'coverage': best['coverage'] if best else None,
+            'partial': details.get('partial', False)
+        }
+
+    async def _handle(self, reader, writer):
+        """
+        One HTTP request per connection (Connection: close).
+        """
+        status, body = 500, {'error': 'Internal error'}
+        try:
+            request_line = (await reader.readline()).decode('latin-1').strip()
+            if not request_line:
+                return
+            method, target, _ = request_line.split(' ', 2)
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            length = int(headers.get('content-length', 0) or 0)
+            if length > MAX_BODY:
+                status, body = 413, {'error': 'Request body too large'}
+            else:
+                data = {}
+                if length:
+                    data = json.loads((await reader.readexactly(length)).decode('utf-8'))
+                status, body = await self._route(method.upper(), urlsplit(target).path, data)
+        except (ValueError, KeyError, TypeError) as e:
+            status, body = 400, {'error': f"Bad request: {str(e)}"}
+        except Exception as e:
+            status, body = 500, {'error': str(e)}
+        finally:
+            try:
+                payload = json.dumps(body, default=float).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: close\r\n\r\n".encode('latin-1') + payload)
+                await writer.drain()
+            except Exception:
+                pass
+            writer.close()
+
+    async def _route(self, method, path, data):
+        """
+        Dispatches a request.
+
+        Returns:
+            tuple: (HTTP status, JSON body).
+        """
+        parts = [unquote(p) for p in path.strip('/').split('/') if p]
+
+        if parts == ['health'] and method == 'GET':
+            return 200, {
+                'status': 'ok',
+                'references': len(self.comparator.references),
+                'queued': self._queue.qsize(),
+                'uptime': time.time() - self._started_at
+            }
+
+        if parts == ['match'] and method == 'POST':
+            job = await self.submit(data['path'])
+            if data.get('wait', True):
+                await job['_done']
+                return 200, self._public(job)
+            return 202, self._public(job)
+
+        if parts and parts[0] == 'results' and method == 'GET':
+            if len(parts) == 1:
+                return 200, {'jobs': [self._public(job) for job in self.jobs.values()]}
+            job = self.jobs.get(parts[1])
+            return (200, self._public(job)) if job else (404, {'error': 'Unknown job'})
+
+        if parts and parts[0] == 'references':
+            if len(parts) == 1 and method == 'GET':
+                return 200, {'references': await self.list_references()}
+            if len(parts) == 1 and method == 'POST':
+                paths = self._expand(data['paths'])
+                return 200, await self.add_references(paths)
+            if len(parts) == 2 and method == 'DELETE':
+                ref_id = int(parts[1]) if parts[1].isdigit() else None
+                if ref_id is not None and await self.remove_reference(ref_id):
+                    return 200, {'removed': ref_id}
+                return 404, {'error': 'Unknown reference'}
+            return 405, {'error': 'Method not allowed'}
+
+        return 404, {'error': 'Not found'}
+
+    @staticmethod
+    def _public(job):
+        return {k: v for k, v in job.items() if not k.startswith('_')}
+
+    @staticmethod
+    def _expand(paths):
+        """
+        Folders in the list are replaced by the audio files inside them.
+        """
+        expanded = []
+        for path in paths:
+            if os.path.isdir(path):
+                for root, _, files in os.walk(path):
+                    expanded.extend(os.path.join(root, f) for f in sorted(files)
+                                    if f.lower().endswith(AUDIO_EXTENSIONS))
+            else:
+                expanded.append(path)
+        return expanded
+
+
+async def _serve(args):
+    service = MatchService(port=args.port, workers=args.workers, batch_size=args.batch_size,
+                           full_track=args.full_track, beat_sync=args.beat_sync,
+                           key_invariant=args.key_shifts, quality=args.quality)
+    await service.start()
+    if args.references:
+        loaded = await service.add_references(MatchService._expand(args.references))
+        print(f"Loaded {len(loaded['added'])} references, {len(loaded['failed'])} failed")
+    try:
+        await service.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    """
+    Runs the match service until interrupted.
+    Usage: python service.py [--references DIR ...] [--port 8765]
+    """
+    parser = argparse.ArgumentParser(description="AudioMatch local match service")
+    parser.add_argument('--references', nargs='*', default=[],
+                        help="Reference files/folders to load at startup")
+    parser.add_argument('--port', type=int, default=8765, help="Port (0 = any free port)")
+    parser.add_argument('--workers', type=int, default=2, help="Analysis threads")
+    parser.add_argument('--batch-size', type=int, default=8, help="Match requests per batch")
+    parser.add_argument('--full-track', action='store_true', help="Analyse whole tracks")
+    parser.add_argument('--beat-sync', action='store_true', help="Beat-synchronous features")
+    parser.add_argument('--key-shifts', action='store_true', help="Allow key shifts")
+    parser.add_argument('--quality', action='store_true',
+                        help="Measure loudness/dynamics/bandwidth (deltas in the results)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,597 @@
+import os
+import sys
+import time
+import heapq
+import pickle
+import queue
+import argparse
+import threading
+import itertools
+import multiprocessing
+from multiprocessing.connection import Listener, Client
+
+# 2: references record their sequence mode (CompactFeatures.sync)
+PACK_FORMAT = 2
+# Remasters sent to the shards per round trip
+DEFAULT_BATCH_SIZE = 16
+# Seconds a worker keeps trying to reach the coordinator
+CONNECT_RETRY = 60
+
+
+def write_pack(path, records, options):
+    """
+    Writes a feature pack: analysed references that any node can load
+    without decoding audio again.
+
+    Args:
+        path (str): Pack file.
+        records (list): (reference id, ReferenceRecord) pairs.
+        options (dict): Feature settings the pack was analysed with
+            (full_track, beat_sync, feature_precision).
+    """
+    data = pickle.dumps({'format': PACK_FORMAT, 'options': options, 'records': records},
+                        protocol=pickle.HIGHEST_PROTOCOL)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_pack(path):
+    """
+    Loads a feature pack.
+
+    Returns:
+        dict: 'options' and 'records' ((reference id, ReferenceRecord) pairs).
+    """
+    with open(path, 'rb') as f:
+        data = pickle.load(f)
+    if data.get('format') != PACK_FORMAT:
+        raise ValueError(f"Unsupported feature pack format in {path}")
+    return data
+
+
+def build_pack(paths, pack_path, full_track=False, beat_sync=False, feature_precision='uint8',
+               progress_log=None, quality=False):
+    """
+    Analyses reference files into a feature pack.
+
+    Args:
+        paths (list): Reference audio files.
+        pack_path (str): Pack file to write.
+        full_track (bool): Analyse whole tracks.
+        beat_sync (bool): Beat-synchronous features.
+        feature_precision (str): Chroma storage precision.
+        progress_log (str, optional): JSON lines progress file, '-' = stdout.
+        quality (bool): Measure loudness/dynamics/bandwidth, runs against
+            the pack then report the remaster vs original deltas.
+
+    Returns:
+        list: FileError per reference that failed.
+    """
+    from feature_store import CompactFeatures, ReferenceRecord
+    options = {'full_track': full_track, 'beat_sync': beat_sync,
+               'feature_precision': feature_precision, 'quality': quality}
+    records, failed = [], []
+    progress = _progress('references', paths, options)
+    for item in _analyse(paths, options, progress, progress_log):
+        if item['error']:
+            failed.append(_file_error(item))
+            continue
+        record = ReferenceRecord(CompactFeatures(item['features'], feature_precision),
+                                 item['full_duration'], item['path'])
+        records.append((len(records) + 1, record))
+        if len(records) % 100 == 0:
+            print(f"Analysed {len(records)}/{len(paths)} references{progress.describe()}")
+    write_pack(pack_path, records, options)
+    print(f"Wrote {len(records)} references to {pack_path} ({len(failed)} failed)")
+    return failed
+
+
+def _progress(stage, paths, options):
+    """
+    WorkProgress of a single stage over the paths (rates, time left).
+    """
+    from progress import WorkProgress
+    from scheduler import WorkEstimates
+    progress = WorkProgress()
+    progress.add_stage(stage, WorkEstimates(paths, options.get('full_track', False)))
+    return progress
+
+
+def _analyse(paths, options, progress=None, progress_log=None):
+    """
+    Decode + extraction through the prefetch pipeline.
+
+    Args:
+        progress (WorkProgress, optional): Counts every file as it comes out.
+        progress_log (str, optional): JSON lines progress file, '-' = stdout.
+
+    Yields:
+        dict: Pipeline items.
+    """
+    from warmup import configure_jit_cache
+    configure_jit_cache()
+    from audio_processor import AudioProcessor
+    from pipeline import AudioPipeline
+    from progress import ProgressLog
+    from scheduler import analysed_seconds
+    full_track, beat_sync = options.get('full_track', False), options.get('beat_sync', False)
+    quality = options.get('quality', False)
+    pipeline = AudioPipeline(
+        paths,
+        lambda path, source: AudioProcessor.decode(path, source, full_track, quality),
+        lambda path, payload: AudioProcessor.extract(path, payload, full_track, beat_sync, quality))
+    log = ProgressLog(progress_log) if progress and progress_log else None
+    try:
+        for item in pipeline:
+            if progress:
+                duration = 0 if item['error'] else item['full_duration']
+                progress.file_done(item['path'], analysed_seconds(duration, full_track))
+                if log:
+                    log.write(progress.snapshot())
+            yield item
+    finally:
+        pipeline.close()
+        if progress:
+            progress.close()
+        if log:
+            progress.finish()
+            log.write(progress.snapshot(), force=True)
+            log.close()
+
+
+def _file_error(item):
+    from error_log import FileError
+    error = FileError(item['path'], item['stage'], item.get('exc_type') or 'Error',
+                      item['error'], item.get('elapsed', 0.0))
+    print(f"Failed: {error}")
+    return error
+
+
+def worker_main(address, authkey, pack_dir=None):
+    """
+    Shard worker (local process or another node): connects to the
+    coordinator, loads the shard pack it is given and scores the remasters
+    it receives against that shard only.
+
+    Messages from the coordinator:
+        ('load', pack path, settings)  -> ('ready', references loaded)
+        ('score', [(key, features)])   -> ('scores', [(key, top N results)])
+        ('close',)
+
+    Args:
+        address (tuple): Coordinator (host, port).
+        authkey (bytes): Shared secret of the coordinator.
+        pack_dir (str, optional): Where this node sees the shard packs, when
+            its mount point differs from the coordinator's.
+    """
+    conn = _connect(address, authkey)
+    from warmup import configure_jit_cache
+    configure_jit_cache()
+    comparator = None
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+            if message[0] == 'close':
+                return
+            try:
+                if message[0] == 'load':
+                    _, pack_path, settings = message
+                    if pack_dir:
+                        pack_path = os.path.join(pack_dir, os.path.basename(pack_path))
+                    comparator = _shard_comparator(read_pack(pack_path), settings)
+                    conn.send(('ready', len(comparator.references)))
+                elif message[0] == 'score':
+                    keys = [key for key, _ in message[1]]
+                    tops = comparator.top_matches_many([features for _, features in message[1]])
+                    conn.send(('scores', list(zip(keys, tops))))
+            except Exception as e:
+                conn.send(('error', f"{type(e).__name__}: {str(e)}"))
+    finally:
+        if comparator is not None and comparator.score_cache is not None:
+            comparator.score_cache.close()
+        conn.close()
+
+
+def _connect(address, authkey):
+    """
+    Connects to the coordinator, retrying while it isn't listening yet.
+    """
+    deadline = time.monotonic() + CONNECT_RETRY
+    while True:
+        try:
+            return Client(address, authkey=authkey)
+        except (ConnectionRefusedError, OSError):
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+
+
+def _shard_comparator(pack, settings):
+    """
+    Comparator holding one shard's references (global ids kept).
+    """
+    from comparator import AudioComparator
+    score_cache = None
+    if settings.get('use_score_cache'):
+        try:
+            from score_cache import ScoreCache
+            score_cache = ScoreCache()
+        except Exception as e:
+            print(f"Score cache unavailable: {str(e)}")
+    comparator = AudioComparator(threshold=settings['threshold'], top_n=settings['top_n'],
+                                 score_cache=score_cache,
+                                 key_invariant=settings['key_invariant'])
+    for ref_id, record in pack['records']:
+        comparator.references.add(record, ref_id)
+    return comparator
+
+
+class ShardCoordinator:
+    """
+    Sharded comparison for catalogs too big for one machine.
+    References (from a feature pack) are split into one shard pack per
+    worker; each worker loads only its shard. The coordinator analyses every
+    remaster once, sends the features to all shards, and merges the partial
+    top N lists (each sorted best first) into the final top N with a heap
+    merge, so the result is the same as one comparator over all references.
+
+    Workers connect over sockets (multiprocessing.connection): local worker
+    processes are started by the coordinator, other nodes run
+    `python sharding.py worker --connect HOST:PORT`.
+    """
+
+    def __init__(self, shards=2, address=('127.0.0.1', 0), authkey=None, local_workers=True,
+                 pack_dir=None, threshold=0.35, top_n=5, key_invariant=False,
+                 use_score_cache=False, batch_size=DEFAULT_BATCH_SIZE, progress_log=None):
+        """
+        Args:
+            shards (int): Number of shards (one worker each).
+            address (tuple): (host, port) to listen on, port 0 = any free port.
+            authkey (bytes, optional): Shared secret, required for remote workers.
+            local_workers (bool): Start the workers as local processes.
+            pack_dir (str, optional): Where shard packs are written (shared
+                storage for remote workers). Defaults to the user cache dir.
+            threshold (float): Minimum similarity of a match.
+            top_n (int): Candidates kept per remaster.
+            key_invariant (bool): Allow key shifts.
+            use_score_cache (bool): Workers reuse pair scores from the local cache.
+            batch_size (int): Remasters per round trip.
+            progress_log (str, optional): JSON lines progress file, '-' = stdout.
+        """
+        if authkey is None and not local_workers:
+            raise ValueError("Remote workers need an authkey")
+        self.shards = max(1, shards)
+        self.address = address
+        self.authkey = authkey or os.urandom(16)
+        self.local_workers = local_workers
+        if pack_dir is None:
+            from app_paths import user_cache_dir
+            pack_dir = user_cache_dir('shards')
+        self.pack_dir = pack_dir
+        self.threshold = threshold
+        self.top_n = max(1, top_n)
+        self.key_invariant = key_invariant
+        self.use_score_cache = use_score_cache
+        self.batch_size = max(1, batch_size)
+        self.progress_log = progress_log
+        self.error_log = None
+        self._conns = []
+        self._processes = []
+
+    def run(self, pack_path, remastered_files):
+        """
+        Matches the remasters against the references of the pack.
+
+        Args:
+            pack_path (str): Feature pack of all references.
+            remastered_files (list): Remastered audio files.
+
+        Returns:
+            list: Result entries (same fields as the runner's).
+        """
+        from error_log import ErrorLog
+        from comparator import AudioComparator
+        self.error_log = ErrorLog()
+        pack = read_pack(pack_path)
+        # Light id -> (path, duration, quality) map for the results, features stay in the shards
+        originals = {ref_id: (r.path, r.full_duration, r.features.get('quality'))
+                     for ref_id, r in pack['records']}
+        options = pack['options']  # Remasters are analysed like the references
+        shard_paths = self._write_shards(pack)
+        pack = None
+        merger = AudioComparator(threshold=self.threshold, top_n=self.top_n)
+
+        listener = Listener(self.address, authkey=self.authkey)
+        try:
+            print(f"Coordinator listening on {listener.address[0]}:{listener.address[1]}, "
+                  f"waiting for {len(shard_paths)} workers")
+            if self.local_workers:
+                self._start_local_workers(listener.address, len(shard_paths))
+            self._conns = self._accept(listener, len(shard_paths))
+            self._load_shards(shard_paths)
+
+            results = []
+            batch = []
+            progress = _progress('remastered', remastered_files, options)
+            for item in _analyse(remastered_files, options, progress, self.progress_log):
+                if item['error']:
+                    self.error_log.record(_file_error(item))
+                    continue
+                self.error_log.record_success()
+                batch.append(item)
+                if len(batch) == self.batch_size:
+                    results.extend(self._score_batch(batch, merger, originals))
+                    batch = []
+                    print(f"Matched {len(results)}/{len(remastered_files)} remastered"
+                          f"{progress.describe()}")
+            if batch:
+                results.extend(self._score_batch(batch, merger, originals))
+            print(f"Matched {len(results)}/{len(remastered_files)} remastered, "
+                  f"{len(self.error_log)} failed")
+            return results
+        finally:
+            self.close()
+            listener.close()
+
+    def close(self):
+        """
+        Tells the workers to exit and reaps the local processes.
+        """
+        for conn in self._conns:
+            try:
+                conn.send(('close',))
+                conn.close()
+            except (OSError, ValueError):
+                pass
+        for process in self._processes:
+            process.join(5)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        self._conns, self._processes = [], []
+
+    def _write_shards(self, pack):
+        """
+        Splits the references round-robin into shard packs.
+
+        Returns:
+            list: Shard pack paths.
+        """
+        records = pack['records']
+        count = max(1, min(self.shards, len(records)))
+        os.makedirs(self.pack_dir, exist_ok=True)
+        paths = []
+        for index in range(count):
+            path = os.path.join(self.pack_dir, f"shard-{index + 1:03d}-of-{count:03d}.pkl")
+            write_pack(path, records[index::count], pack['options'])
+            paths.append(path)
+        return paths
+
+    def _start_local_workers(self, address, count):
+        context = multiprocessing.get_context('spawn')
+        for _ in range(count):
+            process = context.Process(target=worker_main, args=(address, self.authkey),
+                                      daemon=True)
+            process.start()
+            self._processes.append(process)
+
+    def _accept(self, listener, count):
+        """
+        Waits for the workers to connect. Local workers that die before
+        connecting fail the run instead of blocking forever.
+        """
+        accepted = queue.Queue()
+
+        def accept():
+            for _ in range(count):
+                try:
+                    accepted.put(listener.accept())
+                except Exception as e:
+                    accepted.put(e)
+                    return
+
+        threading.Thread(target=accept, daemon=True).start()
+        conns = []
+        while len(conns) < count:
+            try:
+                conn = accepted.get(timeout=1.0)
+            except queue.Empty:
+                if self._processes and not any(p.is_alive() for p in self._processes):
+                    raise RuntimeError("Shard workers exited before connecting")
+                continue
+            if isinstance(conn, Exception):
+                raise conn
+            conns.append(conn)
+            print(f"Worker {len(conns)}/{count} connected")
+        return conns
+
+    def _load_shards(self, shard_paths):
+        settings = {'threshold': self.threshold, 'top_n': self.top_n,
+                    'key_invariant': self.key_invariant, 'use_score_cache': self.use_score_cache}
+        for conn, path in zip(self._conns, shard_paths):
+            conn.send(('load', path, settings))
+        for index, conn in enumerate(self._conns):
+            loaded = self._reply(conn, index, 'ready')
+            print(f"Shard {index + 1} loaded {loaded} references")
+
+    def _score_batch(self, items, merger, originals):
+        """
+        Scores a batch on every shard in parallel and merges the partial top N lists.
+        """
+        queries = [(index, item['features']) for index, item in enumerate(items)]
+        for conn in self._conns:
+            conn.send(('score', queries))
+        partials = [[] for _ in items]
+        for index, conn in enumerate(self._conns):
+            for key, top in self._reply(conn, index, 'scores'):
+                partials[key].append(top)
+
+        results = []
+        for item, lists in zip(items, partials):
+            merged = list(itertools.islice(
+                heapq.merge(*lists, key=lambda x: x['similarity'], reverse=True), self.top_n))
+            match, details = merger.summarize(merged, item['full_duration'])
+            results.append(self._result_entry(item, match, details, originals))
+        return results
+
+    @staticmethod
+    def _reply(conn, index, expected):
+        """
+        Waits for a worker's answer.
+        """
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            raise RuntimeError(f"Shard {index + 1} worker disconnected")
+        if message[0] == 'error':
+            raise RuntimeError(f"Shard {index + 1} failed: {message[1]}")
+        if message[0] != expected:
+            raise RuntimeError(f"Shard {index + 1} sent an unexpected '{message[0]}' message")
+        return message[1]
+
+    @staticmethod
+    def _result_entry(item, match, details, originals):
+        """
+        Result entry in the runner's format from a merged top N.
+        """
+        from quality import DELTA_KEYS, quality_deltas
+        path = item['path']
+        details = details if isinstance(details, dict) else {}
+        quality = item['features'].get('quality')
+
+        def candidate(entry):
+            orig_path, orig_duration, orig_quality = originals.get(entry['reference'], ('', 0, None))
+            described = {
+                'reference': entry['reference'],
+                'name': entry['name'],
+                'similarity': entry['similarity'],
+                'orig_path': orig_path,
+                'orig_duration': orig_duration,
+                'coverage': entry.get('coverage'),
+                'timeline': entry.get('timeline')
+            }
+            if quality and entry['reference'] in originals:
+                described.update(quality_deltas(quality, orig_quality))
+            return described
+
+        best = candidate(match) if match else None
+        deltas = {key: best.get(key) if best else None for key in DELTA_KEYS}
+        return {
+            **deltas,
+            'remastered': os.path.basename(path),
+            'match': best['name'] if best else "No match",
+            'reference_id': best['reference'] if best else None,
+            'confidence': best['similarity'] if best else 0.0,
+            'orig_path': best['orig_path'] if best else '',
+            'path': path,
+            'rem_duration': item['full_duration'],
+            'orig_duration': best['orig_duration'] if best else 0,
+            'display_name': os.path.basename(path),
+            'candidates': [candidate(entry) for entry in details.get('results', [])],
+            'margin': details.get('margin', 0.0),
+            'ambiguous': details.get('ambiguous', False),
+            'coverage': best['coverage'] if best else None,
+            'timeline': best['timeline'] if best else None,
+            'partial': details.get('partial', False)
+        }
+
+
+def _address(value):
+    host, _, port = value.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def _authkey(value):
+    value = value or os.environ.get('AUDIOMATCH_AUTHKEY')
+    return value.encode() if value else None
+
+
+def main(argv=None):
+    """
+    Sharded matching from the command line.
+    Usage:
+        python sharding.py pack --references DIR ... --pack refs.pkl
+        python sharding.py run --pack refs.pkl --remasters DIR ... --shards 4 --csv out.csv
+        python sharding.py worker --connect HOST:PORT --authkey KEY
+    """
+    from service import MatchService
+    parser = argparse.ArgumentParser(description="AudioMatch sharded comparison")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    pack = commands.add_parser('pack', help="Analyse references into a feature pack")
+    pack.add_argument('--references', nargs='+', required=True, help="Reference files/folders")
+    pack.add_argument('--pack', required=True, help="Pack file to write")
+    pack.add_argument('--full-track', action='store_true', help="Analyse whole tracks")
+    pack.add_argument('--beat-sync', action='store_true', help="Beat-synchronous features")
+    pack.add_argument('--precision', default='uint8', help="Chroma precision")
+    pack.add_argument('--quality', action='store_true',
+                      help="Measure loudness/dynamics/bandwidth (deltas in the results)")
+    pack.add_argument('--progress-log', help="Append progress as JSON lines ('-' = stdout)")
+
+    run = commands.add_parser('run', help="Coordinate a sharded run")
+    run.add_argument('--pack', required=True, help="Feature pack of the references")
+    run.add_argument('--references', nargs='*', default=[],
+                     help="Build the pack from these first (if it doesn't exist)")
+    run.add_argument('--quality', action='store_true',
+                     help="Measure quality when building the pack (runs follow the pack)")
+    run.add_argument('--remasters', nargs='+', required=True, help="Remastered files/folders")
+    run.add_argument('--shards', type=int, default=2, help="Number of shards/workers")
+    run.add_argument('--listen', default='127.0.0.1:0', help="HOST:PORT for workers")
+    run.add_argument('--remote', action='store_true',
+                     help="Don't start local workers, wait for remote ones")
+    run.add_argument('--pack-dir', help="Shared directory for the shard packs")
+    run.add_argument('--authkey', help="Shared secret (or AUDIOMATCH_AUTHKEY)")
+    run.add_argument('--key-shifts', action='store_true', help="Allow key shifts")
+    run.add_argument('--score-cache', action='store_true', help="Workers use the score cache")
+    run.add_argument('--csv', help="Export the results as CSV")
+    run.add_argument('--store', help="Results database (default: in memory)")
+    run.add_argument('--progress-log', help="Append progress as JSON lines ('-' = stdout)")
+
+    worker = commands.add_parser('worker', help="Serve one shard for a coordinator")
+    worker.add_argument('--connect', required=True, help="Coordinator HOST:PORT")
+    worker.add_argument('--authkey', help="Shared secret (or AUDIOMATCH_AUTHKEY)")
+    worker.add_argument('--pack-dir', help="Where this node sees the shard packs")
+
+    args = parser.parse_args(argv)
+    if args.command == 'pack':
+        build_pack(MatchService._expand(args.references), args.pack, args.full_track,
+                   args.beat_sync, args.precision, args.progress_log, args.quality)
+    elif args.command == 'worker':
+        authkey = _authkey(args.authkey)
+        if authkey is None:
+            parser.error("worker needs --authkey or AUDIOMATCH_AUTHKEY")
+        worker_main(_address(args.connect), authkey, args.pack_dir)
+    else:
+        if not os.path.exists(args.pack):
+            if not args.references:
+                parser.error(f"{args.pack} doesn't exist, pass --references to build it")
+            build_pack(MatchService._expand(args.references), args.pack,
+                       progress_log=args.progress_log, quality=args.quality)
+        coordinator = ShardCoordinator(
+            shards=args.shards, address=_address(args.listen), authkey=_authkey(args.authkey),
+            local_workers=not args.remote, pack_dir=args.pack_dir,
+            key_invariant=args.key_shifts, use_score_cache=args.score_cache,
+            progress_log=args.progress_log)
+        results = coordinator.run(args.pack, MatchService._expand(args.remasters))
+
+        from results_store import ResultsStore
+        store = ResultsStore(args.store or ':memory:')
+        try:
+            store.add_many(results)
+            if args.csv:
+                print(f"Exported {store.export_csv(args.csv)} results to {args.csv}")
+        finally:
+            store.close()
+        return 0 if results else 1
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
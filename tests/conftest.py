@@ -0,0 +1,90 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+# The app's modules are flat in src/ (run from there, frozen by PyInstaller)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'src'))
+
+SAMPLE_RATE = 22050
+SECONDS = 20
+NOTES_PER_SECOND = 4
+
+
+def _track(seed):
+    """
+    A made up melody + chord track, different for every seed.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(SAMPLE_RATE // NOTES_PER_SECOND) / SAMPLE_RATE
+    envelope = np.minimum(1.0, np.linspace(8.0, 0.0, len(t)))
+    notes = []
+    for pitch in rng.integers(48, 72, SECONDS * NOTES_PER_SECOND):
+        note = np.zeros(len(t))
+        for interval, level in ((0, 1.0), (4, 0.5), (7, 0.5), (12, 0.25)):
+            frequency = 440.0 * 2 ** ((pitch + interval - 69) / 12)
+            note += level * np.sin(2 * np.pi * frequency * t)
+        notes.append(note * envelope)
+    return 0.2 * np.concatenate(notes)
+
+
+def _remaster(y, seed):
+    """
+    Same recording, louder with a brighter top end and a little noise.
+    """
+    rng = np.random.default_rng(seed)
+    brighter = y + 0.3 * np.concatenate([[0.0], np.diff(y)])
+    return np.clip(1.6 * brighter + 0.002 * rng.standard_normal(len(y)), -1.0, 1.0)
+
+
+@pytest.fixture(autouse=True, scope='session')
+def cache_dir(tmp_path_factory):
+    """
+    Keeps score caches, result stores and shard packs out of the user's cache.
+    """
+    path = tmp_path_factory.mktemp('cache')
+    previous = os.environ.get('XDG_CACHE_HOME')
+    os.environ['XDG_CACHE_HOME'] = str(path)
+    yield path
+    if previous is None:
+        os.environ.pop('XDG_CACHE_HOME', None)
+    else:
+        os.environ['XDG_CACHE_HOME'] = previous
+
+
+@pytest.fixture(scope='session')
+def corpus(tmp_path_factory):
+    """
+    Eight originals and remasters of the first three.
+
+    Returns:
+        dict: 'originals' and 'remasters' (paths), 'expected' remaster -> original.
+    """
+    root = tmp_path_factory.mktemp('corpus')
+    originals, remasters, expected = [], [], {}
+    for seed in range(8):
+        y = _track(seed)
+        original = str(root / f"song{seed}.wav")
+        sf.write(original, y, SAMPLE_RATE)
+        originals.append(original)
+        if seed < 3:
+            remaster = str(root / f"song{seed}_remaster.flac")
+            sf.write(remaster, _remaster(y, 100 + seed), SAMPLE_RATE)
+            remasters.append(remaster)
+            expected[remaster] = original
+    return {'originals': originals, 'remasters': remasters, 'expected': expected}
+
+
+@pytest.fixture(scope='session')
+def features(corpus):
+    """
+    Analysed corpus: path -> (features, full duration).
+    """
+    from audio_processor import AudioProcessor
+    analysed = {}
+    for path in corpus['originals'] + corpus['remasters']:
+        payload, full_duration = AudioProcessor.decode(path)
+        analysed[path] = (AudioProcessor.extract(path, payload), full_duration)
+    return analysed
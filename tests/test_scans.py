@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+
+def _comparator(corpus, features, **kwargs):
+    from comparator import AudioComparator
+    from feature_store import CompactFeatures, ReferenceRecord
+    comparator = AudioComparator(top_n=3, **kwargs)
+    for path in corpus['originals']:
+        analysed, full_duration = features[path]
+        comparator.references.add(ReferenceRecord(CompactFeatures(analysed), full_duration, path))
+    return comparator
+
+
+def _summary(top):
+    return [(result['reference'], result['similarity']) for result in top]
+
+
+def _assert_same(a, b):
+    assert [ref_id for ref_id, _ in a] == [ref_id for ref_id, _ in b]
+    np.testing.assert_allclose([score for _, score in a], [score for _, score in b],
+                               rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize('key_invariant', [False, True])
+def test_pruned_scan_matches_exhaustive(corpus, features, key_invariant):
+    exhaustive = _comparator(corpus, features, prune=False, key_invariant=key_invariant)
+    pruned = _comparator(corpus, features, key_invariant=key_invariant)
+    for path in corpus['remasters']:
+        query = features[path][0]
+        _assert_same(_summary(pruned.top_matches(query)), _summary(exhaustive.top_matches(query)))
+    assert pruned.dtw_stats['abandoned'] + pruned.dtw_stats['skipped'] > 0
+    if not key_invariant:
+        # (Shifted alignments only have to beat the unshifted one, so those stop early anyway)
+        assert exhaustive.dtw_stats['abandoned'] == exhaustive.dtw_stats['skipped'] == 0
+
+
+def test_block_scan_matches_exhaustive(corpus, features):
+    exhaustive = _comparator(corpus, features, prune=False)
+    block = _comparator(corpus, features)
+    queries = [features[path][0] for path in corpus['remasters']]
+    for query, top in zip(queries, block.top_matches_many(queries)):
+        _assert_same(_summary(top), _summary(exhaustive.top_matches(query)))
+
+
+def test_block_scores_match_pairwise(corpus, features):
+    comparator = _comparator(corpus, features)
+    queries = [features[path][0] for path in corpus['remasters']]
+    ref_ids, scores = comparator.score_block(queries)
+    pairwise = [[comparator._safe_similarity(query, comparator.references[ref_id].features)
+                 for ref_id in ref_ids] for query in queries]
+    np.testing.assert_allclose(scores, pairwise, rtol=0, atol=1e-12)
+
+
+def test_remasters_match_their_originals(corpus, features):
+    comparator = _comparator(corpus, features)
+    for path in corpus['remasters']:
+        match, details = comparator.compare_features(*features[path])
+        assert match is not None
+        assert comparator.references[match['reference']].path == corpus['expected'][path]
+        assert not details['ambiguous']
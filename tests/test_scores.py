@@ -0,0 +1,23 @@
+import numpy as np
+
+
+def _streamed(chroma, mfcc):
+    # Full track features as StreamingFeatureExtractor gives them
+    return {'chroma': chroma.astype(np.float32), 'mfcc': mfcc[:, np.newaxis], 'sync': 'frame'}
+
+
+def test_full_track_score_does_not_depend_on_length():
+    from comparator import AudioComparator
+    rng = np.random.default_rng(0)
+    frames = 3000  # About 13 minutes of streamed chroma
+    chroma = rng.random((12, frames)) ** 4
+    copy = chroma + 0.2 * rng.random((12, frames))
+    mfcc = rng.standard_normal(20)
+
+    comparator = AudioComparator()
+    scores = [comparator._safe_similarity(_streamed(copy[:, :query], mfcc),
+                                          _streamed(chroma[:, :reference], mfcc))
+              for query, reference in ((frames, frames), (frames, 400), (250, frames))]
+    assert min(scores) > comparator.threshold
+    # Same copy, same mean cost per frame: long or short, it scores the same
+    np.testing.assert_allclose(scores, scores[0], rtol=0, atol=0.01)
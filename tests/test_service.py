@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+
+async def _request(port, method, path, body=None):
+    """
+    One HTTP request to the local service.
+
+    Returns:
+        tuple: (status, JSON body).
+    """
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    payload = json.dumps(body).encode('utf-8') if body is not None else b''
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+                 f"Content-Length: {len(payload)}\r\n\r\n".encode('latin-1') + payload)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, data = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(data)
+
+
+def _run(corpus, scenario):
+    from service import MatchService
+
+    async def main():
+        service = MatchService(port=0, workers=2, batch_size=4, use_score_cache=False)
+        await service.start()
+        try:
+            return await scenario(service, service.port)
+        finally:
+            await service.close()
+
+    return asyncio.run(main())
+
+
+def test_service_matches_over_http(corpus):
+    async def scenario(service, port):
+        status, loaded = await _request(port, 'POST', '/references', {'paths': corpus['originals']})
+        assert status == 200
+        assert len(loaded['added']) == len(corpus['originals']) and not loaded['failed']
+
+        status, health = await _request(port, 'GET', '/health')
+        assert status == 200 and health['references'] == len(corpus['originals'])
+
+        # Sent together, so they are analysed and compared as one batch
+        answers = await asyncio.gather(*(_request(port, 'POST', '/match', {'path': path})
+                                         for path in corpus['remasters']))
+        for path, (status, job) in zip(corpus['remasters'], answers):
+            assert status == 200 and job['status'] == 'done'
+            assert job['result']['orig_path'] == corpus['expected'][path]
+            assert job['result']['candidates'][0]['reference'] == job['result']['reference_id']
+
+        status, results = await _request(port, 'GET', '/results')
+        assert status == 200 and len(results['jobs']) == len(corpus['remasters'])
+        status, job = await _request(port, 'GET', f"/results/{answers[0][1]['id']}")
+        assert status == 200 and job['path'] == corpus['remasters'][0]
+
+    _run(corpus, scenario)
+
+
+def test_service_reference_changes_apply_to_later_matches(corpus):
+    remaster = corpus['remasters'][0]
+    original = corpus['expected'][remaster]
+
+    async def scenario(service, port):
+        _, loaded = await _request(port, 'POST', '/references', {'paths': corpus['originals']})
+        ref_id = next(r['id'] for r in loaded['added'] if r['path'] == original)
+
+        status, _ = await _request(port, 'DELETE', f"/references/{ref_id}")
+        assert status == 200
+        status, _ = await _request(port, 'DELETE', f"/references/{ref_id}")
+        assert status == 404
+        _, job = await _request(port, 'POST', '/match', {'path': remaster})
+        assert job['result']['orig_path'] != original
+
+        # Added again: a new id, matched again
+        _, loaded = await _request(port, 'POST', '/references', {'paths': [original]})
+        _, job = await _request(port, 'POST', '/match', {'path': remaster})
+        assert job['result']['reference_id'] == loaded['added'][0]['id']
+
+    _run(corpus, scenario)
+
+
+def test_service_reports_bad_requests_and_failures(corpus, tmp_path):
+    async def scenario(service, port):
+        status, body = await _request(port, 'POST', '/match', {'wait': True})
+        assert status == 400 and 'error' in body
+        status, _ = await _request(port, 'GET', '/nothing')
+        assert status == 404
+
+        broken = tmp_path / "broken.wav"
+        broken.write_bytes(b"not audio")
+        status, job = await _request(port, 'POST', '/match', {'path': str(broken)})
+        assert status == 200 and job['status'] == 'failed' and job['error']
+
+        status, job = await _request(port, 'POST', '/match', {'path': corpus['remasters'][0], 'wait': False})
+        assert status == 202 and job['status'] in ('queued', 'running', 'done')
+
+    _run(corpus, scenario)
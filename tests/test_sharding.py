@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope='module')
+def pack(corpus, tmp_path_factory):
+    import sharding
+    path = str(tmp_path_factory.mktemp('pack') / "refs.pkl")
+    assert sharding.build_pack(corpus['originals'], path) == []
+    return path
+
+
+def _single_comparator(pack, top_n):
+    """
+    One comparator over all the pack's references (what the shards must add up to).
+    """
+    import sharding
+    settings = {'threshold': 0.35, 'top_n': top_n, 'key_invariant': False}
+    return sharding._shard_comparator(sharding.read_pack(pack), settings)
+
+
+def _candidates(result):
+    return [(c['reference'], c['similarity']) for c in result['candidates']]
+
+
+@pytest.mark.parametrize('shards', [1, 3])
+def test_sharded_run_matches_one_comparator(corpus, features, pack, tmp_path, shards):
+    import sharding
+    coordinator = sharding.ShardCoordinator(shards=shards, pack_dir=str(tmp_path), top_n=3)
+    results = coordinator.run(pack, corpus['remasters'])
+    assert [r['path'] for r in results] == corpus['remasters']
+
+    comparator = _single_comparator(pack, 3)
+    for result in results:
+        top = comparator.top_matches(features[result['path']][0])
+        expected = [(t['reference'], t['similarity']) for t in top]
+        assert [ref_id for ref_id, _ in _candidates(result)] == [ref_id for ref_id, _ in expected]
+        np.testing.assert_allclose([s for _, s in _candidates(result)], [s for _, s in expected],
+                                   rtol=0, atol=1e-9)
+        assert result['orig_path'] == corpus['expected'][result['path']]
+        assert result['reference_id'] == result['candidates'][0]['reference']
+
+
+class _FakeShard:
+    """
+    Connection of a shard worker that answers every batch with a fixed top N.
+    """
+
+    def __init__(self, top):
+        self.top = top
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+
+    def recv(self):
+        return ('scores', [(0, self.top)])
+
+
+def test_merge_keeps_the_global_top_n():
+    import sharding
+    from comparator import AudioComparator
+
+    def entry(ref_id, similarity):
+        return {'reference': ref_id, 'name': f"song{ref_id}.wav", 'similarity': similarity}
+
+    # Partial top N lists of three shards, each best first
+    coordinator = sharding.ShardCoordinator(shards=3, pack_dir='unused', top_n=3)
+    coordinator._conns = [_FakeShard([entry(1, 0.9), entry(4, 0.5)]),
+                          _FakeShard([entry(2, 0.8), entry(5, 0.7)]),
+                          _FakeShard([entry(3, 0.6)])]
+    originals = {ref_id: (f"/refs/song{ref_id}.wav", 200.0, None) for ref_id in range(1, 6)}
+    item = {'path': '/rem/song1_remaster.flac', 'full_duration': 200.0, 'features': {}}
+
+    [result] = coordinator._score_batch([item], AudioComparator(top_n=3), originals)
+    assert [c['reference'] for c in result['candidates']] == [1, 2, 5]
+    assert result['reference_id'] == 1 and result['orig_path'] == "/refs/song1.wav"
+    assert result['margin'] == pytest.approx(0.1)
+    assert all(conn.sent[0][0] == 'score' for conn in coordinator._conns)
+
+
+def test_sharded_run_reports_failed_remasters(corpus, pack, tmp_path):
+    import sharding
+    broken = tmp_path / "broken.wav"
+    broken.write_bytes(b"not audio")
+    coordinator = sharding.ShardCoordinator(shards=2, pack_dir=str(tmp_path / "shards"))
+    results = coordinator.run(pack, [str(broken), corpus['remasters'][0]])
+    assert [r['path'] for r in results] == [corpus['remasters'][0]]
+    assert len(coordinator.error_log) == 1
+
+
+def test_pack_round_trip(corpus, pack):
+    import sharding
+    data = sharding.read_pack(pack)
+    assert [record.path for _, record in data['records']] == corpus['originals']
+    assert [ref_id for ref_id, _ in data['records']] == list(range(1, len(corpus['originals']) + 1))